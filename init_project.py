@@ -18,6 +18,21 @@ USER_ID=<OWNER ID>
 TZ=Europe/Moscow
 GIGACHAT_CREDENTIALS=<YOUR TOKEN>
 SALUT_CREDENTIALS=<YOUR TOKEN>
+# Несколько экземпляров WebUI через запятую
+# SD_URLS=http://sd_webui_back:7860,http://sd_webui_back_2:7860
+# PROGRESS_INSTANCE каждого WebUI, если он не совпадает с именем хоста в SD_URLS
+# SD_PROGRESS_INSTANCES=http://sd_webui_back:7860=sd_webui_back
+# Имя экземпляра бота для очереди заданий (по умолчанию имя хоста)
+# JOB_INSTANCE=sd_webui_bot
+# Порт /metrics для Prometheus (0 - отключить)
+# METRICS_PORT=9100
+# Количество кадров цепочки img2img
+# VARIATION_ITERATIONS=500
+# Адреса API Sber (например, эмуляторы из benchmarks)
+# SALUT_TOKEN_URL=https://ngw.devices.sberbank.ru:9443/api/v2/oauth
+# SALUT_TTS_URL=https://smartspeech.sber.ru/rest/v1/text:synthesize
+# GIGACHAT_AUTH_URL=https://ngw.devices.sberbank.ru:9443/api/v2/oauth
+# GIGACHAT_BASE_URL=https://gigachat.devices.sberbank.ru/api/v1
 """
 
 
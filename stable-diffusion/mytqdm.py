@@ -2,6 +2,8 @@ import time
 from loguru import logger
 from typing import Optional, Iterable, Union, Dict, Any
 
+from progress_channel import publish
+
 
 class SilentTqdm:
     def __init__(
@@ -44,6 +46,7 @@ class SilentTqdm:
         self._start_time = time.time()
         self._last_log_time = self._start_time
         self._last_log_n = 0
+        self._publish("start")
 
         for obj in self.iterable:
             yield obj
@@ -72,6 +75,13 @@ class SilentTqdm:
             self._log_progress()
         self._last_log_n = self._n
         self._last_log_time = current_time
+        self._publish("step")
+
+    def _publish(self, kind: str):
+        """Отправить событие прогресса в канал"""
+        elapsed = time.time() - self._start_time
+        rate = self._n / elapsed if elapsed > 0 else 0.0
+        publish(self.desc or "tqdm", kind, self._n, self.total or 0, rate)
 
     def set_description(self, desc: Optional[str] = None):
         """Установить описание прогресса"""
@@ -113,6 +123,7 @@ class SilentTqdm:
         """Завершить прогресс-бар (вывести финальное сообщение)"""
         if not self._closed:
             self._log_progress()
+            self._publish("end")
             self._closed = True
 
     def __enter__(self):
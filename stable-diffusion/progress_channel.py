@@ -0,0 +1,100 @@
+"""
+Канал публикации прогресса генерации
+
+Отправляет события прогресса JSON-датаграммами по UDP на адрес из
+переменной окружения PROGRESS_TARGET (host:port). Если переменная не задана,
+публикация отключена. Отправка не блокирует генерацию, ошибки сети игнорируются.
+"""
+
+import json
+import os
+import socket
+import time
+from typing import Optional, Tuple
+
+from loguru import logger
+
+MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", 0.2))
+RESOLVE_INTERVAL = 30.0
+INSTANCE = os.getenv("PROGRESS_INSTANCE") or socket.gethostname()
+
+
+class ProgressChannel:
+    def __init__(self, target: Optional[str] = None):
+        self.target = target if target is not None else os.getenv("PROGRESS_TARGET", "")
+        self._address: Optional[Tuple[str, int]] = None
+        self._resolved_at = 0.0
+        self._socket: Optional[socket.socket] = None
+        self._last_sent = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.target)
+
+    def _resolve(self) -> Optional[Tuple[str, int]]:
+        now = time.monotonic()
+        if self._address is None or now - self._resolved_at > RESOLVE_INTERVAL:
+            host, _, port = self.target.rpartition(":")
+            try:
+                self._address = (socket.gethostbyname(host), int(port))
+            except (OSError, ValueError) as exc:
+                logger.debug(f"Progress target {self.target} is unavailable: {exc}")
+                self._address = None
+            self._resolved_at = now
+        return self._address
+
+    def publish(self, source: str, kind: str, step: int = 0, total: int = 0, rate: float = 0.0) -> None:
+        """Отправляет событие прогресса.
+
+        События kind="step" от одного источника отправляются не чаще
+        MIN_INTERVAL секунд, события start/end отправляются всегда.
+        """
+        if not self.enabled:
+            return
+
+        now = time.monotonic()
+        if kind == "step" and step < total and now - self._last_sent.get(source, 0.0) < MIN_INTERVAL:
+            return
+        self._last_sent[source] = now
+
+        address = self._resolve()
+        if address is None:
+            return
+
+        remaining = total - step
+        event = {
+            "instance": INSTANCE,
+            "source": source,
+            "kind": kind,
+            "job": _current_job(),
+            "step": step,
+            "total": total,
+            "rate": round(rate, 3),
+            "eta": round(remaining / rate, 1) if rate > 0 and remaining > 0 else 0.0,
+            "ts": time.time(),
+        }
+
+        try:
+            if self._socket is None:
+                self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self._socket.setblocking(False)
+            self._socket.sendto(json.dumps(event).encode("utf-8"), address)
+        except OSError:
+            # Получатель может быть не запущен, прогресс при этом не важен
+            pass
+
+
+def _current_job() -> str:
+    # Id задачи API (force_task_id из запроса), иначе метка времени задания
+    try:
+        from modules import progress, shared
+        return str(progress.current_task or shared.state.job_timestamp or "")
+    except Exception:
+        return ""
+
+
+channel = ProgressChannel()
+
+
+def publish(source: str, kind: str, step: int = 0, total: int = 0, rate: float = 0.0) -> None:
+    channel.publish(source, kind, step, total, rate)
@@ -1,7 +1,10 @@
 import math
+import time
 from loguru import logger
 from modules import shared
 
+from progress_channel import publish
+
 
 class TotalTQDM:
     def __init__(self):
@@ -12,6 +15,7 @@ class TotalTQDM:
         self.total = 0
         self.last_logged_percent = -1
         self.completed = False
+        self.started = time.time()
 
     def _should_log(self):
         return True
@@ -33,10 +37,16 @@ class TotalTQDM:
 
             self.last_logged_percent = current_percent
 
+    def _publish(self, kind):
+        elapsed = time.time() - self.started
+        rate = self.current / elapsed if elapsed > 0 else 0.0
+        publish("total", kind, self.current, self.total, rate)
+
     def reset(self):
         self.reset_state()
         self.total = shared.state.job_count * shared.state.sampling_steps
         self._log_progress(force=True)
+        self._publish("start")
 
     def update(self):
         if not self._should_log() and not self.completed:
@@ -44,6 +54,7 @@ class TotalTQDM:
 
         self.current += 1
         self._log_progress()
+        self._publish("step")
 
         if self.current >= self.total:
             self.completed = True
@@ -51,9 +62,12 @@ class TotalTQDM:
     def updateTotal(self, new_total):
         self.total = new_total
         self._log_progress(force=True)
+        self._publish("step")
 
     def clear(self):
         if not self.completed and self.current > 0:
             self._log_progress(force=True)
             logger.debug("Operation interrupted")
+        if self.total > 0:
+            self._publish("end")
         self.reset_state()
\ No newline at end of file
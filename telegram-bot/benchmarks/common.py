@@ -0,0 +1,116 @@
+"""
+Модуль общих функций бенчмарков
+
+Содержит:
+- Определение коммита, на котором выполнен прогон
+- Имена и поиск файлов результатов в benchmarks/results
+- Временный рабочий каталог для прогонов
+- Печать сравнения двух результатов с подсветкой регрессий
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+REGRESSION_THRESHOLD = 10.0
+
+# (метрика, базовое значение, новое значение, больше значит лучше)
+MetricRow = Tuple[str, float, float, bool]
+
+
+def git_revision(ref: str = "HEAD") -> Tuple[str, bool]:
+    """Короткий хеш коммита и признак незакоммиченных изменений в рабочем дереве."""
+    sha = subprocess.run(
+        ["git", "rev-parse", "--short=10", ref],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    ).stdout.strip()
+    if ref != "HEAD":
+        return sha, False
+    status = subprocess.run(
+        ["git", "status", "--porcelain", "--untracked-files=no"],
+        cwd=PROJECT_DIR, capture_output=True, text=True
+    ).stdout
+    return sha, bool(status.strip())
+
+
+@contextmanager
+def scratch_dir(keep: bool = False) -> Iterator[Path]:
+    """Временный текущий каталог: пайплайн пишет в относительный output/ и ищет fonts/."""
+    workdir = Path(tempfile.mkdtemp(prefix="bench_"))
+    if (PROJECT_DIR / "fonts").is_dir():
+        (workdir / "fonts").symlink_to(PROJECT_DIR / "fonts", target_is_directory=True)
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        yield workdir
+    finally:
+        os.chdir(previous_cwd)
+        if keep:
+            logger.info("Рабочий каталог сохранен: {}", workdir)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def result_name(result: Dict[str, Any], label: Optional[str] = None, prefix: str = "") -> str:
+    """Имя файла результата без расширения: метка или хеш коммита."""
+    if label:
+        return label
+    return f"{prefix}{result['commit']}{'-dirty' if result['dirty'] else ''}"
+
+
+def save_json(name: str, data: Dict[str, Any]) -> Path:
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = RESULTS_DIR / f"{name}.json"
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
+
+
+def result_path(ref: str, prefix: str = "") -> Path:
+    """Путь к результату по пути к файлу, хешу или любой ссылке git."""
+    path = Path(ref)
+    if path.suffix == ".json" and path.exists():
+        return path
+    sha, _ = git_revision(ref)
+    candidates = [RESULTS_DIR / f"{prefix}{sha}.json"]
+    if ref == "HEAD":
+        candidates.insert(0, RESULTS_DIR / f"{prefix}{sha}-dirty.json")
+    for candidate in candidates:
+        if candidate.exists():
+            return candidate
+    raise FileNotFoundError(f"Нет результата бенчмарка для {ref} ({sha}) в {RESULTS_DIR}")
+
+
+def load_result(ref: str, prefix: str = "") -> Dict[str, Any]:
+    return json.loads(result_path(ref, prefix).read_text(encoding="utf-8"))
+
+
+def print_comparison(
+    rows: Sequence[MetricRow],
+    base_name: str,
+    new_name: str,
+    threshold: float = REGRESSION_THRESHOLD
+) -> List[str]:
+    """Печатает таблицу изменений и возвращает метрики, ухудшившиеся больше threshold процентов."""
+    width = max([34] + [len(name) + 2 for name, *_ in rows])
+    print(f"{'метрика':<{width}}{base_name:>14}{new_name:>14}{'Δ':>9}")
+    regressions = []
+    for name, old, current, higher_is_better in rows:
+        change = (current - old) / old * 100 if old else 0.0
+        worse = -change if higher_is_better else change
+        mark = ""
+        if worse > threshold:
+            mark = " ❌"
+            regressions.append(name)
+        elif worse < -threshold:
+            mark = " ✅"
+        print(f"{name:<{width}}{old:>14.2f}{current:>14.2f}{change:>+8.1f}%{mark}")
+    return regressions
@@ -0,0 +1,556 @@
+"""
+Модуль локальных эмуляторов внешних сервисов для бенчмарков
+
+Содержит:
+- Эмулятор Stable Diffusion WebUI (txt2img, img2img, progress, memory и справочники)
+  с детерминированными синтетическими изображениями и настраиваемой задержкой
+- Эмулятор SaluteSpeech: выдача токена и синтез речи в wav16
+- Эмулятор GigaChat: выдача токена и chat/completions
+- Запуск всех эмуляторов в отдельном потоке со своим циклом событий
+- Запуск эмуляторов в отдельном процессе, чтобы их память не смешивалась с памятью пайплайна
+
+Эмуляторы отвечают в формате настоящих API, поэтому пайплайн работает
+с ними без изменений кода: достаточно задать адреса через переменные
+окружения (см. EmulatorStack.environ).
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import resource
+import subprocess
+import sys
+import threading
+import time
+import wave
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from aiohttp import web
+from PIL import Image
+
+SAMPLE_RATE = 24000
+CHARS_PER_SECOND = 14.0
+
+SAMPLERS = ["Euler a", "Euler", "DPM++ 2M Karras", "DDIM"]
+
+VOICEOVER_SENTENCES = [
+    "Камера медленно опускается к сияющему городу, где неоновые огни отражаются в мокром асфальте.",
+    "Постепенно из тумана проступают очертания башен, опутанных светящимися проводами.",
+    "В то время как дроны прочерчивают небо, внизу оживают голографические вывески.",
+    "По мере того как свет становится ярче, улицы наполняются мерцающими силуэтами.",
+    "Вслед за этим камера скользит вдоль стеклянных фасадов, отражающих бескрайнее небо.",
+    "Тем временем на переднем плане возникает фигура путника в плаще из тонких нитей света.",
+    "Однако он не спешит, разглядывая узоры, которые медленно меняются под его шагами.",
+    "Затем пространство вокруг начинает вращаться, превращая город в спираль огней.",
+]
+
+TITLES = [
+    "«Город будущего: 5 тайн неона» 🌃🚀",
+    "«Как ИИ видит мечту?» 🔮✨",
+    "«Шок! Мир через 100 лет» 🤯🌍",
+]
+
+
+def _digest(*parts: Any) -> int:
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    return int.from_bytes(hashlib.sha256(payload).digest()[:8], "little")
+
+
+def _encode_png(array: np.ndarray) -> str:
+    buffer = io.BytesIO()
+    Image.fromarray(array).save(buffer, format="PNG", compress_level=1)
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def synthetic_image(seed: int, width: int, height: int) -> np.ndarray:
+    """Детерминированное изображение: цветной градиент с шумом, зависящее от seed."""
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+    x = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :]
+    phase = rng.uniform(0, 2 * np.pi, 3).astype(np.float32)
+    channels = [
+        127.5 + 100.0 * np.sin(2 * np.pi * (x * (1 + c) + y * (2 - c)) + phase[c])
+        for c in range(3)
+    ]
+    image = np.stack(channels, axis=-1)
+    image += rng.normal(0, 12, image.shape).astype(np.float32)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def synthetic_variation(init_image: bytes, seed: int, strength: float, width: int, height: int) -> np.ndarray:
+    """Детерминированная вариация исходного кадра: сдвиг, смешивание с шумом."""
+    with Image.open(io.BytesIO(init_image)) as img:
+        source = img.convert("RGB")
+        if source.size != (width, height):
+            source = source.resize((width, height))
+        base = np.asarray(source, dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    shifted = np.roll(base, shift=(int(rng.integers(-4, 5)), int(rng.integers(-4, 5))), axis=(0, 1))
+    noise = synthetic_image(seed, width, height).astype(np.float32)
+    return np.clip(shifted * (1 - strength * 0.2) + noise * strength * 0.2, 0, 255).astype(np.uint8)
+
+
+def synthetic_speech(text: str, sample_rate: int = SAMPLE_RATE, duration: Optional[float] = None) -> bytes:
+    """WAV 16 бит моно: по тону на слово. Без duration длительность пропорциональна длине текста."""
+    words = text.split() or ["..."]
+    total = duration or max(len(text) / CHARS_PER_SECOND, 0.5)
+    per_word = total / len(words)
+    t = np.arange(int(per_word * sample_rate), dtype=np.float32) / sample_rate
+    envelope = np.minimum(1.0, np.minimum(t, t[::-1]) * 40.0) if len(t) else t
+    chunks = [
+        (0.3 * np.sin(2 * np.pi * (140 + _digest(word) % 160) * t) * envelope * 32767).astype("<i2")
+        for word in words
+    ]
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(np.concatenate(chunks).tobytes())
+    return buffer.getvalue()
+
+
+class SDWebUIEmulator:
+    """Эмулятор Stable Diffusion WebUI.
+
+    Как и настоящий WebUI, выполняет генерации по одной. Время генерации
+    складывается из latency и step_latency * steps. При seed=-1 seed берется
+    из счетчика запросов, поэтому повторный прогон дает те же кадры.
+
+    Args:
+        latency: Фиксированная задержка генерации (секунды)
+        step_latency: Задержка на один шаг сэмплера (секунды)
+    """
+
+    def __init__(self, latency: float = 0.05, step_latency: float = 0.0):
+        self.latency = latency
+        self.step_latency = step_latency
+        self.requests = 0
+        self._queue = 0
+        self._lock: Optional[asyncio.Lock] = None
+        self._job: Dict[str, Any] = {}
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=256 * 2 ** 20)
+        app.router.add_post("/sdapi/v1/txt2img", self.txt2img)
+        app.router.add_post("/sdapi/v1/img2img", self.img2img)
+        app.router.add_get("/sdapi/v1/progress", self.progress)
+        app.router.add_get("/sdapi/v1/memory", self.memory)
+        app.router.add_get("/sdapi/v1/options", self.options)
+        app.router.add_get("/sdapi/v1/cmd-flags", self.cmd_flags)
+        app.router.add_get("/sdapi/v1/samplers", self.samplers)
+        app.router.add_get("/sdapi/v1/sd-models", self.sd_models)
+        # Остальные справочники initialize() в эмуляторе пустые
+        app.router.add_get("/sdapi/v1/{name}", self.empty_list)
+        return app
+
+    async def txt2img(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        return await self._generate(payload, None)
+
+    async def img2img(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        init_images = payload.get("init_images") or []
+        if not init_images:
+            raise web.HTTPUnprocessableEntity(text="init_images is required")
+        return await self._generate(payload, base64.b64decode(init_images[0]))
+
+    async def _generate(self, payload: Dict[str, Any], init_image: Optional[bytes]) -> web.Response:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        self._queue += 1
+        try:
+            async with self._lock:
+                self.requests += 1
+                seed = payload.get("seed", -1)
+                if seed is None or seed < 0:
+                    seed = self.requests
+                width, height = int(payload.get("width", 512)), int(payload.get("height", 512))
+                steps = int(payload.get("steps", 20))
+                duration = self.latency + self.step_latency * steps
+                self._job = {"started": time.monotonic(), "duration": duration, "steps": steps}
+
+                key = _digest(payload.get("prompt", ""), seed)
+                if init_image is None:
+                    render = lambda: _encode_png(synthetic_image(key, width, height))
+                else:
+                    strength = float(payload.get("denoising_strength", 0.5))
+                    render = lambda: _encode_png(synthetic_variation(init_image, key, strength, width, height))
+
+                started = time.monotonic()
+                image = await asyncio.get_running_loop().run_in_executor(None, render)
+                await asyncio.sleep(max(0.0, duration - (time.monotonic() - started)))
+                self._job = {}
+        finally:
+            self._queue -= 1
+
+        parameters = {k: v for k, v in payload.items() if k != "init_images"}
+        info = json.dumps({"seed": seed, "all_seeds": [seed], "width": width, "height": height})
+        return web.json_response({"images": [image], "parameters": parameters, "info": info})
+
+    async def progress(self, request: web.Request) -> web.Response:
+        job = self._job
+        fraction = eta = 0.0
+        step = 0
+        if job:
+            elapsed = time.monotonic() - job["started"]
+            fraction = min(0.99, elapsed / job["duration"]) if job["duration"] else 0.99
+            eta = max(0.0, job["duration"] - elapsed)
+            step = int(fraction * job["steps"])
+        return web.json_response({
+            "progress": fraction,
+            "eta_relative": eta,
+            "state": {
+                "job_count": self._queue,
+                "sampling_step": step,
+                "sampling_steps": job.get("steps", 0),
+            },
+            "current_image": None,
+            "textinfo": None,
+        })
+
+    async def memory(self, request: web.Request) -> web.Response:
+        total = 24 * 2 ** 30
+        used = (6 + min(self._queue, 4) * 2) * 2 ** 30
+        return web.json_response({
+            "ram": {"free": 32 * 2 ** 30, "used": 8 * 2 ** 30, "total": 40 * 2 ** 30},
+            "cuda": {"system": {"free": total - used, "used": used, "total": total}},
+        })
+
+    async def options(self, request: web.Request) -> web.Response:
+        return web.json_response({"sd_model_checkpoint": "emulator.safetensors", "sd_checkpoint_hash": "emulator"})
+
+    async def cmd_flags(self, request: web.Request) -> web.Response:
+        return web.json_response({"port": 7860, "xformers": False, "medvram": False, "lowvram": False})
+
+    async def samplers(self, request: web.Request) -> web.Response:
+        return web.json_response([{"name": name, "aliases": [], "options": {}} for name in SAMPLERS])
+
+    async def sd_models(self, request: web.Request) -> web.Response:
+        return web.json_response([{
+            "title": "emulator.safetensors [emulator]",
+            "model_name": "emulator",
+            "hash": "emulator",
+            "filename": "emulator.safetensors",
+        }])
+
+    async def empty_list(self, request: web.Request) -> web.Response:
+        return web.json_response([])
+
+
+def _token_response() -> Dict[str, Any]:
+    return {"access_token": "emulator-token", "expires_at": int((time.time() + 1800) * 1000)}
+
+
+def _check_bearer(request: web.Request) -> None:
+    if not request.headers.get("Authorization", "").startswith("Bearer "):
+        raise web.HTTPUnauthorized(text="Bearer token required")
+
+
+class SalutEmulator:
+    """Эмулятор SaluteSpeech: OAuth-токен и синтез речи в wav16.
+
+    Args:
+        latency: Задержка синтеза (секунды)
+    """
+
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/v2/oauth", self.token)
+        app.router.add_post("/rest/v1/text:synthesize", self.synthesize)
+        return app
+
+    async def token(self, request: web.Request) -> web.Response:
+        return web.json_response(_token_response())
+
+    async def synthesize(self, request: web.Request) -> web.Response:
+        _check_bearer(request)
+        if request.query.get("format", "wav16") != "wav16":
+            raise web.HTTPBadRequest(text="only wav16 is emulated")
+        text = await request.text()
+        self.requests += 1
+        started = time.monotonic()
+        audio = await asyncio.get_running_loop().run_in_executor(None, synthetic_speech, text)
+        await asyncio.sleep(max(0.0, self.latency - (time.monotonic() - started)))
+        return web.Response(body=audio, content_type="audio/x-wav")
+
+
+class GigaChatEmulator:
+    """Эмулятор GigaChat: OAuth-токен и chat/completions.
+
+    Ответ выбирается детерминированно по тексту запроса: на запрос
+    заголовка ("Создать заголовок для: ...") возвращается короткий заголовок с эмодзи, на остальные -
+    связный текст для озвучки.
+
+    Args:
+        latency: Задержка ответа (секунды)
+        sentences: Количество предложений в тексте озвучки
+    """
+
+    def __init__(self, latency: float = 0.3, sentences: int = 10):
+        self.latency = latency
+        self.sentences = sentences
+        self.requests = 0
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/api/v2/oauth", self.token)
+        app.router.add_post("/api/v1/chat/completions", self.completions)
+        app.router.add_get("/api/v1/models", self.models)
+        return app
+
+    async def token(self, request: web.Request) -> web.Response:
+        return web.json_response(_token_response())
+
+    async def models(self, request: web.Request) -> web.Response:
+        return web.json_response({"data": [{"id": "GigaChat", "object": "model", "owned_by": "emulator"}], "object": "list"})
+
+    def answer(self, messages: List[Dict[str, str]]) -> str:
+        text = "\n".join(message.get("content", "") for message in messages)
+        seed = _digest(text)
+        last = messages[-1].get("content", "") if messages else ""
+        if "заголовок для" in last.lower():
+            return TITLES[seed % len(TITLES)]
+        return " ".join(
+            VOICEOVER_SENTENCES[(seed + index) % len(VOICEOVER_SENTENCES)]
+            for index in range(self.sentences)
+        )
+
+    async def completions(self, request: web.Request) -> web.Response:
+        _check_bearer(request)
+        payload = await request.json()
+        self.requests += 1
+        messages = payload.get("messages") or []
+        content = self.answer(messages)
+        await asyncio.sleep(self.latency)
+
+        prompt_tokens = sum(len(message.get("content", "").split()) for message in messages)
+        completion_tokens = len(content.split())
+        return web.json_response({
+            "choices": [{"message": {"role": "assistant", "content": content}, "index": 0, "finish_reason": "stop"}],
+            "created": int(time.time()),
+            "model": payload.get("model") or "GigaChat",
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+            "object": "chat.completion",
+        })
+
+
+class EmulatorStack:
+    """Запускает эмуляторы SD, SaluteSpeech и GigaChat в отдельном потоке.
+
+    Пайплайн вызывает asyncio.run в своих потоках, поэтому эмуляторам нужен
+    собственный постоянно работающий цикл событий.
+
+    Args:
+        sd: Эмулятор Stable Diffusion WebUI
+        salut: Эмулятор SaluteSpeech
+        gigachat: Эмулятор GigaChat
+        host: Адрес, на котором слушают эмуляторы
+        ports: Порты {"sd": ..., "salut": ..., "gigachat": ...}, 0 - любой свободный
+    """
+
+    def __init__(
+        self,
+        sd: Optional[SDWebUIEmulator] = None,
+        salut: Optional[SalutEmulator] = None,
+        gigachat: Optional[GigaChatEmulator] = None,
+        host: str = "127.0.0.1",
+        ports: Optional[Dict[str, int]] = None
+    ):
+        self.emulators = {
+            "sd": sd or SDWebUIEmulator(),
+            "salut": salut or SalutEmulator(),
+            "gigachat": gigachat or GigaChatEmulator(),
+        }
+        self.host = host
+        self.ports = {name: 0 for name in self.emulators}
+        self.ports.update(ports or {})
+        self.urls: Dict[str, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._runners: List[web.AppRunner] = []
+
+    def start(self) -> "EmulatorStack":
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name="emulators", daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start_servers(), self._loop).result(timeout=30)
+        return self
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._stop_servers(), self._loop).result(timeout=30)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self) -> "EmulatorStack":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def environ(self) -> Dict[str, str]:
+        """Переменные окружения, направляющие пайплайн на эмуляторы."""
+        return {
+            "SD_URLS": self.urls["sd"],
+            "SALUT_TOKEN_URL": f"{self.urls['salut']}/api/v2/oauth",
+            "SALUT_TTS_URL": f"{self.urls['salut']}/rest/v1/text:synthesize",
+            "SALUT_CREDENTIALS": "emulator",
+            "GIGACHAT_AUTH_URL": f"{self.urls['gigachat']}/api/v2/oauth",
+            "GIGACHAT_BASE_URL": f"{self.urls['gigachat']}/api/v1",
+            "GIGACHAT_CREDENTIALS": "emulator",
+            "GIGACHAT_MODEL": "GigaChat",
+        }
+
+    async def _start_servers(self) -> None:
+        for name, emulator in self.emulators.items():
+            runner = web.AppRunner(emulator.app(), access_log=None)
+            await runner.setup()
+            site = web.TCPSite(runner, self.host, self.ports[name])
+            await site.start()
+            self._runners.append(runner)
+            port = runner.addresses[0][1]
+            self.ports[name] = port
+            self.urls[name] = f"http://{self.host}:{port}"
+
+    async def _stop_servers(self) -> None:
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners.clear()
+
+
+class EmulatorProcess:
+    """Запускает EmulatorStack в дочернем процессе (python -m benchmarks.emulators --control).
+
+    Синтез PNG и WAV в эмуляторах расходует память, которая иначе попала бы
+    в пиковый RSS процесса бенчмарка. Процесс сообщает адреса при старте,
+    а после закрытия stdin - количество запросов и свой пиковый RSS.
+
+    Args:
+        sd_latency: Задержка генерации SD (с)
+        sd_step_latency: Задержка на шаг сэмплера (с)
+        tts_latency: Задержка синтеза речи (с)
+        llm_latency: Задержка ответа GigaChat (с)
+        host: Адрес, на котором слушают эмуляторы
+    """
+
+    def __init__(
+        self,
+        sd_latency: float = 0.05,
+        sd_step_latency: float = 0.0,
+        tts_latency: float = 0.2,
+        llm_latency: float = 0.3,
+        host: str = "127.0.0.1"
+    ):
+        self.args = [
+            "--host", host, "--sd-port", "0", "--salut-port", "0", "--gigachat-port", "0",
+            "--sd-latency", str(sd_latency), "--sd-step-latency", str(sd_step_latency),
+            "--tts-latency", str(tts_latency), "--llm-latency", str(llm_latency),
+        ]
+        self.urls: Dict[str, str] = {}
+        self.requests: Dict[str, int] = {}
+        self.peak_rss_mb = 0.0
+        self._environ: Dict[str, str] = {}
+        self._process: Optional[subprocess.Popen] = None
+
+    def start(self) -> "EmulatorProcess":
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.emulators", "--control", *self.args],
+            cwd=Path(__file__).resolve().parent.parent,
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        line = self._process.stdout.readline()
+        if not line:
+            self._process.wait(timeout=30)
+            raise RuntimeError(f"Эмуляторы не запустились (код {self._process.returncode})")
+        started = json.loads(line)
+        self.urls, self._environ = started["urls"], started["environ"]
+        return self
+
+    def stop(self) -> None:
+        if self._process is None:
+            return
+        try:
+            stdout, _ = self._process.communicate(input="", timeout=30)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            stdout, _ = self._process.communicate()
+        lines = stdout.strip().splitlines()
+        if lines:
+            stats = json.loads(lines[-1])
+            self.requests, self.peak_rss_mb = stats["requests"], stats["peak_rss_mb"]
+        self._process = None
+
+    def __enter__(self) -> "EmulatorProcess":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def environ(self) -> Dict[str, str]:
+        """Переменные окружения, направляющие пайплайн на эмуляторы."""
+        return dict(self._environ)
+
+
+def _serve_control(stack: EmulatorStack) -> None:
+    """Режим --control: JSON с адресами в stdout, работа до закрытия stdin, JSON со статистикой."""
+    print(json.dumps({"urls": stack.urls, "environ": stack.environ()}), flush=True)
+    sys.stdin.read()
+    requests = {name: emulator.requests for name, emulator in stack.emulators.items()}
+    # ru_maxrss на Linux в килобайтах
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"requests": requests, "peak_rss_mb": peak_rss_mb}), flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Локальные эмуляторы SD WebUI, SaluteSpeech и GigaChat")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--sd-port", type=int, default=7860)
+    parser.add_argument("--salut-port", type=int, default=9441)
+    parser.add_argument("--gigachat-port", type=int, default=9442)
+    parser.add_argument("--sd-latency", type=float, default=0.05)
+    parser.add_argument("--sd-step-latency", type=float, default=0.0)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--control", action="store_true", help="Управление через stdin/stdout (EmulatorProcess)")
+    args = parser.parse_args()
+
+    stack = EmulatorStack(
+        sd=SDWebUIEmulator(args.sd_latency, args.sd_step_latency),
+        salut=SalutEmulator(args.tts_latency),
+        gigachat=GigaChatEmulator(args.llm_latency),
+        host=args.host,
+        ports={"sd": args.sd_port, "salut": args.salut_port, "gigachat": args.gigachat_port},
+    )
+    with stack:
+        if args.control:
+            _serve_control(stack)
+            return
+        for name, value in stack.environ().items():
+            print(f"{name}={value}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
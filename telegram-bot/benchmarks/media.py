@@ -0,0 +1,289 @@
+"""
+Модуль микро-бенчмарков CPU-этапов обработки медиа
+
+Содержит:
+- Фиксированные синтетические входные данные: кадры 512x768, озвучку из 100 фраз, WAV на 60 секунд
+- Замер задержки вызова (min/медиана/среднее), CPU-времени и аллокаций (tracemalloc)
+- Масштабирование compile_video и save_images по числу кадров
+- Сохранение результатов в benchmarks/results/media-<commit>.json и сравнение между коммитами
+
+Запуск из каталога telegram-bot:
+    python -m benchmarks.media run
+    python -m benchmarks.media run --only compile_video --repeat 3
+    python -m benchmarks.media compare HEAD~1 HEAD
+
+tracemalloc видит аллокации Python и NumPy, но не буферы Pillow и ffmpeg,
+поэтому alloc_peak_mb - нижняя оценка памяти этапа.
+"""
+
+import argparse
+import asyncio
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from PIL import Image
+
+from benchmarks.common import (REGRESSION_THRESHOLD, MetricRow, git_revision, load_result, print_comparison,
+                               result_name, save_json, scratch_dir)
+from benchmarks.emulators import VOICEOVER_SENTENCES, synthetic_image, synthetic_speech
+
+RESULT_PREFIX = "media-"
+FRAME_WIDTH, FRAME_HEIGHT = 512, 768
+PHRASES = 100
+AUDIO_SECONDS = 60.0
+FRAME_COUNTS = (25, 100, 250)
+TITLE = "Город будущего: 5 тайн неона"
+
+
+class Inputs:
+    """Синтетические входные данные, создаваемые один раз в рабочем каталоге."""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.frames_dir = directory / "frames"
+        self.frames_dir.mkdir(parents=True, exist_ok=True)
+        self._frames: List[str] = []
+        self._frame_bytes: List[bytes] = []
+        self._wav: Optional[str] = None
+        self._video: Optional[str] = None
+        self._saves = 0
+
+    def frames(self, count: int) -> List[str]:
+        """Пути к count кадрам PNG (кадр i всегда одинаковый)."""
+        while len(self._frames) < count:
+            index = len(self._frames)
+            path = self.frames_dir / f"frame_{index:04d}.png"
+            Image.fromarray(synthetic_image(index, FRAME_WIDTH, FRAME_HEIGHT)).save(path)
+            self._frames.append(str(path))
+            self._frame_bytes.append(path.read_bytes())
+        return self._frames[:count]
+
+    def frame_bytes(self, count: int) -> List[bytes]:
+        self.frames(count)
+        return self._frame_bytes[:count]
+
+    @property
+    def narration(self) -> str:
+        """Текст, который split_into_short_phrases делит ровно на PHRASES фраз по 3 слова."""
+        words = [
+            word.strip(".,!?;:")
+            for sentence in VOICEOVER_SENTENCES
+            for word in sentence.split()
+        ]
+        words = [word for word in words if word]
+        return " ".join(words[index % len(words)] for index in range(PHRASES * 3))
+
+    @property
+    def wav(self) -> str:
+        if self._wav is None:
+            path = self.directory / "narration.wav"
+            path.write_bytes(synthetic_speech(self.narration, duration=AUDIO_SECONDS))
+            self._wav = str(path)
+        return self._wav
+
+    @property
+    def video(self) -> str:
+        """Видео из FRAME_COUNTS[0] кадров с озвучкой, вход для субтитров."""
+        if self._video is None:
+            from videogeneration.video_maker import compile_video
+
+            frames = self.frames(FRAME_COUNTS[0] + 1)
+            self._video = compile_video(frames[0], frames[1:], self.wav)
+        return self._video
+
+    def save_dir(self) -> str:
+        # Каждый вызов save_images пишет в пустой каталог, как в начале прогона
+        self._saves += 1
+        path = self.directory / "saved" / str(self._saves)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return str(path)
+
+
+def measure(func: Callable[[], Any], repeat: int, warmup: int = 1, items: int = 1) -> Dict[str, float]:
+    """Замеряет func: задержку по repeat вызовам и аллокации отдельным вызовом под tracemalloc.
+
+    Args:
+        func: Замеряемый вызов без аргументов
+        repeat: Количество замеряемых вызовов
+        warmup: Количество прогревочных вызовов (кэши шрифтов, эмодзи, импорт модулей)
+        items: Количество элементов за вызов для расчета времени на элемент
+    """
+    for _ in range(warmup):
+        func()
+
+    wall: List[float] = []
+    cpu: List[float] = []
+    for _ in range(repeat):
+        cpu_started = time.process_time()
+        started = time.perf_counter()
+        func()
+        wall.append(time.perf_counter() - started)
+        cpu.append(time.process_time() - cpu_started)
+
+    tracemalloc.start()
+    try:
+        func()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    median = statistics.median(wall)
+    return {
+        "calls": repeat,
+        "items": items,
+        "min": min(wall),
+        "median": median,
+        "mean": statistics.fmean(wall),
+        "stdev": statistics.stdev(wall) if len(wall) > 1 else 0.0,
+        "cpu_median": statistics.median(cpu),
+        "per_item": median / items,
+        "alloc_peak_mb": peak / 2 ** 20,
+        "alloc_retained_mb": retained / 2 ** 20,
+    }
+
+
+def build_cases(inputs: Inputs) -> List[Tuple[str, Callable[[], Any], int, int]]:
+    """Список (имя, вызов, элементов за вызов, повторов по умолчанию)."""
+    from videogeneration.firstpage import CoverGeneratorEnhanced
+    from videogeneration.sdapi_cleared import save_images
+    from videogeneration.sound_generation import convert_wav_to_ogg
+    from videogeneration.subtitles import add_subtitles_from_text, create_text_image, split_into_short_phrases
+    from videogeneration.video_maker import compile_video
+
+    cover_generator = CoverGeneratorEnhanced()
+    phrases = split_into_short_phrases(inputs.narration)
+    max_width, max_height = int(FRAME_WIDTH * 0.9), int(FRAME_HEIGHT * 0.15)
+
+    cases = [
+        ("generate_cover", lambda: cover_generator.generate_cover(inputs.frames(1)[0], TITLE, "✨"), 1, 10),
+        ("create_text_image", lambda: [create_text_image(p, max_width, max_height, 36) for p in phrases],
+         len(phrases), 5),
+        ("add_subtitles_from_text", lambda: add_subtitles_from_text(inputs.video, inputs.narration), 1, 2),
+        ("convert_wav_to_ogg", lambda: convert_wav_to_ogg(inputs.wav), 1, 5),
+    ]
+    for count in FRAME_COUNTS:
+        cases.append((
+            f"compile_video[{count}]",
+            lambda count=count: compile_video(inputs.frames(1)[0], inputs.frames(count + 1)[1:], inputs.wav),
+            count, 2,
+        ))
+    for count in FRAME_COUNTS:
+        cases.append((
+            f"save_images[{count}]",
+            lambda count=count: asyncio.run(save_images(inputs.frame_bytes(count), inputs.save_dir())),
+            count, 5,
+        ))
+    return cases
+
+
+def run_benchmarks(only: Sequence[str] = (), repeat: Optional[int] = None, keep_workdir: bool = False) -> Dict[str, Any]:
+    """Выполняет выбранные бенчмарки и возвращает результат для сохранения."""
+    results: Dict[str, Dict[str, float]] = {}
+    with scratch_dir(keep_workdir) as workdir:
+        inputs = Inputs(workdir / "inputs")
+        for name, func, items, default_repeat in build_cases(inputs):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            print(f"{name}...", file=sys.stderr)
+            results[name] = measure(func, repeat or default_repeat, items=items)
+            _print_case(name, results[name])
+
+    sha, dirty = git_revision()
+    return {
+        "commit": sha,
+        "dirty": dirty,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "frame_size": [FRAME_WIDTH, FRAME_HEIGHT],
+            "phrases": PHRASES,
+            "audio_seconds": AUDIO_SECONDS,
+            "frame_counts": list(FRAME_COUNTS),
+        },
+        "benchmarks": results,
+    }
+
+
+def _print_case(name: str, stats: Dict[str, float]) -> None:
+    per_item = f", {stats['per_item'] * 1000:.2f} мс/элемент" if stats["items"] > 1 else ""
+    print(
+        f"{name:<28} медиана {stats['median'] * 1000:>9.1f} мс (min {stats['min'] * 1000:.1f}, "
+        f"±{stats['stdev'] * 1000:.1f}){per_item}, CPU {stats['cpu_median'] * 1000:.0f} мс, "
+        f"аллокации пик {stats['alloc_peak_mb']:.1f} МБ"
+    )
+
+
+def _print_scaling(result: Dict[str, Any]) -> None:
+    benchmarks = result["benchmarks"]
+    for prefix in ("compile_video", "save_images"):
+        points = [(count, benchmarks[f"{prefix}[{count}]"]) for count in FRAME_COUNTS
+                  if f"{prefix}[{count}]" in benchmarks]
+        if len(points) < 2:
+            continue
+        (first_count, first), (last_count, last) = points[0], points[-1]
+        print(
+            f"{prefix}: x{last_count / first_count:.0f} кадров -> x{last['median'] / first['median']:.2f} времени, "
+            f"x{last['alloc_peak_mb'] / max(first['alloc_peak_mb'], 1e-6):.2f} аллокаций"
+        )
+
+
+def _metric_rows(base: Dict[str, Any], new: Dict[str, Any]) -> List[MetricRow]:
+    rows: List[MetricRow] = []
+    for name in sorted(set(base["benchmarks"]) & set(new["benchmarks"])):
+        old, current = base["benchmarks"][name], new["benchmarks"][name]
+        rows.append((f"{name} мс", old["median"] * 1000, current["median"] * 1000, False))
+        rows.append((f"{name} МБ", old["alloc_peak_mb"], current["alloc_peak_mb"], False))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Микро-бенчмарки CPU-этапов обработки медиа")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Выполнить бенчмарки и сохранить результат")
+    run_parser.add_argument("--only", nargs="*", default=[], help="Подстроки имен бенчмарков")
+    run_parser.add_argument("--repeat", type=int, help="Повторов на бенчмарк вместо значений по умолчанию")
+    run_parser.add_argument("--label", help="Имя файла результата вместо хеша коммита")
+    run_parser.add_argument("--no-save", action="store_true", help="Не сохранять результат")
+    run_parser.add_argument("--compare", metavar="REF", help="Сравнить с результатом коммита REF")
+    run_parser.add_argument("--keep-workdir", action="store_true", help="Не удалять каталог с входными данными")
+    run_parser.add_argument("--log-level", default="WARNING")
+
+    compare_parser = commands.add_parser("compare", help="Сравнить два сохраненных результата")
+    compare_parser.add_argument("base", help="Коммит, хеш или путь к JSON")
+    compare_parser.add_argument("new", nargs="?", default="HEAD", help="Коммит, хеш или путь к JSON")
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Порог регрессии, %%")
+
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level=getattr(args, "log_level", "WARNING"))
+
+    if args.command == "run":
+        base = load_result(args.compare, RESULT_PREFIX) if args.compare else None
+        new = run_benchmarks(args.only, args.repeat, args.keep_workdir)
+        _print_scaling(new)
+        if not args.no_save:
+            print(f"Результат: {save_json(result_name(new, args.label, RESULT_PREFIX), new)}")
+        if base is None:
+            return
+    else:
+        base = load_result(args.base, RESULT_PREFIX)
+        new = load_result(args.new, RESULT_PREFIX)
+
+    regressions = print_comparison(_metric_rows(base, new), base["commit"], new["commit"], args.threshold)
+    if regressions:
+        print(f"Регрессии больше {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
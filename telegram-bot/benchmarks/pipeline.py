@@ -0,0 +1,263 @@
+"""
+Модуль сквозного бенчмарка generate_video на локальных эмуляторах
+
+Содержит:
+- Прогон generate_video целиком против эмуляторов SD WebUI, SaluteSpeech и GigaChat
+- Сбор кадров в секунду, времени этапов (по трассе из videogeneration.tracing) и пиковой памяти
+- Сохранение результатов в benchmarks/results/<commit>.json
+- Сравнение двух результатов с подсветкой регрессий
+
+Запуск из каталога telegram-bot:
+    python -m benchmarks.pipeline run --iterations 50
+    python -m benchmarks.pipeline compare HEAD~1 HEAD
+
+Пайплайн читает адреса сервисов из переменных окружения при импорте
+videogeneration.config, поэтому бенчмарк запускается отдельным процессом
+и импортирует пайплайн только после старта эмуляторов. Эмуляторы работают
+в дочернем процессе, поэтому peak_rss_mb - память самого generate_video.
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import certifi
+from loguru import logger
+
+from benchmarks.common import (PROJECT_DIR, REGRESSION_THRESHOLD, RESULTS_DIR, git_revision, load_result,
+                               print_comparison, result_name, save_json, scratch_dir)
+from benchmarks.emulators import EmulatorProcess
+
+# Совпадает с videogeneration.config.CA_BUNDLE_FILE, конфиг до старта эмуляторов импортировать нельзя
+CA_BUNDLE_NAME = "russian_trusted_root_ca.cer"
+
+# Метрики для сравнения: имя -> True, если больше значит лучше
+HEADLINE_METRICS = {
+    "total_seconds": False,
+    "frames_per_sec": True,
+    "sd_frames_per_sec": True,
+    "encode_fps": True,
+    "peak_rss_mb": False,
+    "peak_children_rss_mb": False,
+}
+
+
+def _max_rss_mb(who: int) -> float:
+    # ru_maxrss на Linux в килобайтах
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def _stage_stats(run_trace: Any) -> Tuple[Dict[str, Dict[str, float]], Dict[str, Dict[str, float]]]:
+    """Разбирает трассу на время этапов и агрегаты вложенных вызовов."""
+    stages: Dict[str, Dict[str, float]] = {}
+    calls: Dict[str, Dict[str, float]] = {}
+    for span in run_trace.spans:
+        if span.name.startswith("stage:"):
+            stats = stages.setdefault(
+                span.name[len("stage:"):], {"wall": 0.0, "cpu": 0.0, "peak_rss_mb": 0.0, "peak_delta_mb": 0.0}
+            )
+            stats["wall"] += span.wall
+            stats["cpu"] += span.cpu
+            stats["peak_rss_mb"] = max(stats["peak_rss_mb"], span.peak_rss_mb)
+            stats["peak_delta_mb"] = max(stats["peak_delta_mb"], span.peak_delta_mb)
+        elif span.parent_id is not None:
+            stats = calls.setdefault(span.name, {"count": 0, "total": 0.0, "max": 0.0})
+            stats["count"] += 1
+            stats["total"] += span.wall
+            stats["max"] = max(stats["max"], span.wall)
+    for stats in calls.values():
+        stats["avg"] = stats["total"] / stats["count"]
+    return stages, calls
+
+
+def _video_frames(path: str) -> Tuple[int, float]:
+    from moviepy.editor import VideoFileClip
+
+    clip = VideoFileClip(path)
+    try:
+        return int(clip.reader.nframes), float(clip.duration)
+    finally:
+        clip.close()
+
+
+def run_benchmark(
+    iterations: int,
+    sd_latency: float,
+    sd_step_latency: float,
+    tts_latency: float,
+    llm_latency: float,
+    keep_workdir: bool = False
+) -> Tuple[Dict[str, Any], Any]:
+    """Прогоняет generate_video на эмуляторах и возвращает (результат, трасса)."""
+    if "videogeneration.config" in sys.modules:
+        raise RuntimeError("videogeneration уже импортирован: адреса эмуляторов не будут применены")
+
+    stack = EmulatorProcess(sd_latency, sd_step_latency, tts_latency, llm_latency)
+    with stack, scratch_dir(keep_workdir) as workdir:
+        os.environ.update(stack.environ())
+        os.environ["VARIATION_ITERATIONS"] = str(iterations)
+        # Клиент GigaChat не создается без файла CA_BUNDLE_FILE, хотя эмуляторы работают по http
+        if (PROJECT_DIR / CA_BUNDLE_NAME).is_file():
+            (workdir / CA_BUNDLE_NAME).symlink_to(PROJECT_DIR / CA_BUNDLE_NAME)
+        else:
+            shutil.copyfile(certifi.where(), workdir / CA_BUNDLE_NAME)
+
+        from videogeneration.main import generate_video
+        from videogeneration.tracing import trace
+
+        started = time.perf_counter()
+        with trace("benchmark") as run_trace:
+            video, images, title, description = generate_video()
+        total = time.perf_counter() - started
+
+        video_frames, video_seconds = _video_frames(video)
+        # До остановки эмуляторов: завершенный процесс эмуляторов попал бы в RUSAGE_CHILDREN
+        peak_rss_mb = _max_rss_mb(resource.RUSAGE_SELF)
+        peak_children_rss_mb = _max_rss_mb(resource.RUSAGE_CHILDREN)
+
+    stages, calls = _stage_stats(run_trace)
+    # images = [обложка, исходный кадр, кадры цепочки img2img]
+    frames = len(images) - 1
+    variations = stages.get("sequential_variations", {}).get("wall", 0.0)
+    # Оба этапа кодируют видео целиком: сборку и наложение субтитров
+    encode_wall = sum(stages.get(name, {}).get("wall", 0.0) for name in ("compile_video", "subtitles"))
+
+    sha, dirty = git_revision()
+    result = {
+        "commit": sha,
+        "dirty": dirty,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {
+            "iterations": iterations,
+            "sd_latency": sd_latency,
+            "sd_step_latency": sd_step_latency,
+            "tts_latency": tts_latency,
+            "llm_latency": llm_latency,
+        },
+        "total_seconds": total,
+        "frames": frames,
+        "frames_per_sec": frames / total if total else 0.0,
+        "sd_frames_per_sec": (frames - 1) / variations if variations else 0.0,
+        "video_frames": video_frames,
+        "video_seconds": video_seconds,
+        "encode_fps": video_frames / encode_wall if encode_wall else 0.0,
+        "peak_rss_mb": peak_rss_mb,
+        "peak_children_rss_mb": peak_children_rss_mb,
+        "emulators_peak_rss_mb": stack.peak_rss_mb,
+        "requests": stack.requests,
+        "stages": stages,
+        "calls": calls,
+        "title": title,
+        "description_chars": len(description or ""),
+    }
+    return result, run_trace
+
+
+def save_result(result: Dict[str, Any], run_trace: Any, label: Optional[str] = None) -> Path:
+    """Сохраняет результат и трассу в RESULTS_DIR, имя файла - хеш коммита."""
+    name = result_name(result, label)
+    path = save_json(name, result)
+    trace_path = RESULTS_DIR / f"{name}.trace.json"
+    trace_path.write_text(json.dumps(run_trace.to_chrome(), ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def _metric_rows(base: Dict[str, Any], new: Dict[str, Any]) -> List[Tuple[str, float, float, bool]]:
+    rows = [(name, base.get(name, 0.0), new.get(name, 0.0), higher) for name, higher in HEADLINE_METRICS.items()]
+    for stage in sorted(set(base["stages"]) | set(new["stages"])):
+        rows.append((
+            f"stage:{stage}",
+            base["stages"].get(stage, {}).get("wall", 0.0),
+            new["stages"].get(stage, {}).get("wall", 0.0),
+            False,
+        ))
+    return rows
+
+
+def compare_results(base: Dict[str, Any], new: Dict[str, Any], threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """Печатает сравнение двух результатов и возвращает список регрессий."""
+    if base["config"] != new["config"]:
+        print(f"⚠️ Разные параметры прогона: {base['config']} и {new['config']}")
+
+    return print_comparison(_metric_rows(base, new), base["commit"], new["commit"], threshold)
+
+
+def _print_result(result: Dict[str, Any]) -> None:
+    print(f"Коммит: {result['commit']}{' (изменен)' if result['dirty'] else ''}")
+    print(f"Всего: {result['total_seconds']:.1f}s, кадров: {result['frames']}, {result['frames_per_sec']:.2f} кадр/с")
+    print(f"SD: {result['sd_frames_per_sec']:.2f} кадр/с, кодирование: {result['encode_fps']:.1f} кадр/с")
+    print(
+        f"Пик памяти: {result['peak_rss_mb']:.0f} МБ (дочерние процессы {result['peak_children_rss_mb']:.0f} МБ, "
+        f"эмуляторы {result.get('emulators_peak_rss_mb', 0.0):.0f} МБ)"
+    )
+    for name, stats in result["stages"].items():
+        print(
+            f"  {name:<24}{stats['wall']:>8.2f}s  CPU {stats['cpu']:>7.2f}s  "
+            f"пик {stats['peak_rss_mb']:>6.0f} МБ (+{stats.get('peak_delta_mb', 0.0):.0f})"
+        )
+    for name, stats in sorted(result["calls"].items(), key=lambda item: -item[1]["total"]):
+        print(f"  ↳ {name:<40}{stats['count']:>5}×  ср. {stats['avg'] * 1000:>8.1f} мс")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Бенчмарк generate_video на локальных эмуляторах")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Прогнать пайплайн и сохранить результат")
+    run_parser.add_argument("--iterations", type=int, default=50, help="Шагов цепочки img2img")
+    run_parser.add_argument("--sd-latency", type=float, default=0.05, help="Задержка генерации SD (с)")
+    run_parser.add_argument("--sd-step-latency", type=float, default=0.0, help="Задержка на шаг сэмплера (с)")
+    run_parser.add_argument("--tts-latency", type=float, default=0.2, help="Задержка синтеза речи (с)")
+    run_parser.add_argument("--llm-latency", type=float, default=0.3, help="Задержка ответа GigaChat (с)")
+    run_parser.add_argument("--label", help="Имя файла результата вместо хеша коммита")
+    run_parser.add_argument("--no-save", action="store_true", help="Не сохранять результат")
+    run_parser.add_argument("--compare", metavar="REF", help="Сравнить с результатом коммита REF")
+    run_parser.add_argument("--keep-workdir", action="store_true", help="Не удалять каталог с кадрами и видео")
+    run_parser.add_argument("--log-level", default="WARNING")
+
+    compare_parser = commands.add_parser("compare", help="Сравнить два сохраненных результата")
+    compare_parser.add_argument("base", help="Коммит, хеш или путь к JSON")
+    compare_parser.add_argument("new", nargs="?", default="HEAD", help="Коммит, хеш или путь к JSON")
+    for sub in (run_parser, compare_parser):
+        sub.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="Порог регрессии, %%")
+
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level=getattr(args, "log_level", "WARNING"))
+
+    if args.command == "run":
+        # Базовый результат читается до прогона: новый может записаться в тот же файл
+        base = load_result(args.compare) if args.compare else None
+        result, run_trace = run_benchmark(
+            args.iterations, args.sd_latency, args.sd_step_latency, args.tts_latency, args.llm_latency,
+            keep_workdir=args.keep_workdir
+        )
+        _print_result(result)
+        if not args.no_save:
+            print(f"Результат: {save_result(result, run_trace, args.label)}")
+        if base is None:
+            return
+        new = result
+    else:
+        base = load_result(args.base)
+        new = load_result(args.new)
+
+    regressions = compare_results(base, new, args.threshold)
+    if regressions:
+        print(f"Регрессии больше {args.threshold:.0f}%: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@
 """
 
 import os
+import socket
 
 from dotenv import load_dotenv
 from loguru import logger
@@ -28,6 +29,11 @@ USER_ID: int = int(os.getenv('USER_ID'))
 DEFAULT_TZ = 'Europe/Moscow'
 TIMEZONE_NAME: str = os.getenv('TZ', DEFAULT_TZ)
 NEED_SHEDULER: bool = True
+JOB_WORKERS: int = int(os.getenv('JOB_WORKERS', 2))
+# Постоянное имя экземпляра: после перезапуска его прерванные задания сразу возвращаются в очередь
+JOB_INSTANCE: str = os.getenv('JOB_INSTANCE') or socket.gethostname()
+# Порт HTTP-сервера метрик Prometheus (0 - не запускать)
+METRICS_PORT: int = int(os.getenv('METRICS_PORT', 9100))
 
 # Валидация обязательных параметров
 missing_vars = []
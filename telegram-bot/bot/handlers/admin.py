@@ -11,11 +11,10 @@
 
 import asyncio
 import logging
-from collections import defaultdict
 from datetime import datetime, timedelta
 from pathlib import Path
 from tempfile import NamedTemporaryFile
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 
 import pandas as pd
 from aiogram import Bot, Router, types, F
@@ -28,12 +27,15 @@ from sqlalchemy.orm import selectinload
 from html import escape
 
 from bot.config import USER_ID
-from bot.handlers.filters import AdminFilter, is_admin, is_owner
+from bot.handlers.filters import AdminFilter, invalidate_admin_cache, is_admin, is_owner
 from bot.handlers.keyboards import admin_panel_kb, user_main_kb, BTN_MEMORY_STATS, BTN_ADMIN_PANEL, BTN_SYS_STATS, \
     BTN_ACTION_LOGS, BTN_USERS_LIST, BTN_MAIN_MENU, BTN_GEN_VIDEO_UPLOAD, BTN_GEN_VIDEO_LOCAL
 from bot.handlers.utils import (format_users_table, generate_users_dataframe,
                                 get_system_stats, save_users_to_csv)
 from bot.models import User
+from bot.services.json_log import hourly_level_counts
+from bot.services.log_reader import LogReader
+from bot.services.system_monitor import SystemMonitor
 from bot.scheduler import send_scheduled_message
 from database.db import async_session, get_db
 from videogeneration.sdapi_cleared import AsyncSDClient
@@ -64,13 +66,13 @@ async def admin_panel(message: types.Message) -> None:
 
 
 @router.message(F.text == BTN_SYS_STATS)
-async def system_stats(message: types.Message) -> None:
+async def system_stats(message: types.Message, system_monitor: SystemMonitor) -> None:
     """Предоставляет системную статистику в формате Markdown."""
     user_id = message.from_user.id
     logger.info("System stats request from user {}", user_id)
 
     try:
-        stats = get_system_stats()
+        stats = get_system_stats(system_monitor)
         await message.answer(f"```\n{stats}\n```", parse_mode="MarkdownV2")
         logger.success("Stats sent to user {}", user_id)
     except Exception as exc:
@@ -153,6 +155,7 @@ async def grant_admin_access(
 
             user.is_admin = True
             await session.commit()
+            invalidate_admin_cache(target_user_id)
 
             await message.answer(f"✅ Пользователь @{user.username} получил права администратора")
             await bot.send_message(
@@ -206,50 +209,49 @@ async def handle_users_list(message: Message) -> None:
             logger.debug("Temporary CSV file removed")
 
 
+def _level_stats(log_reader: LogReader, since: datetime) -> Dict[str, int]:
+    """Счетчики уровней за период: по сводкам JSON-сегментов, а за часы без сводки - по индексу текстового лога."""
+    hours = log_reader.hourly_stats(since)
+    hours.update(hourly_level_counts(Path("logs/json"), since))
+    totals: Dict[str, int] = {}
+    for levels in hours.values():
+        for level, count in levels.items():
+            totals[level] = totals.get(level, 0) + count
+    return totals
+
+
 @router.message(F.text == BTN_ACTION_LOGS)
 async def logs_handler(message: types.Message) -> None:
     """Обрабатывает запросы на получение логов работы системы."""
     user_id = message.from_user.id
     logger.info("Logs request from user {}", user_id)
 
-    log_file = Path("logs/bot.log")
+    log_reader = LogReader(Path("logs/bot.log"))
     tmp_path: Optional[Path] = None
 
     try:
-        if not log_file.exists():
+        if not log_reader.path.exists():
             raise FileNotFoundError("Log file not found")
 
         since_time = datetime.now() - timedelta(days=3)
-        stats = defaultdict(int)
-        error_logs = []
-        buffer = []
-
-        with log_file.open(encoding="utf-8") as f:
-            for line in f:
-                if len(buffer) >= 1000:
-                    buffer.pop(0)
-                buffer.append(line)
-
-                try:
-                    log_time_str = line.split(" | ")[0]
-                    log_time = datetime.strptime(log_time_str, "%Y-%m-%d %H:%M:%S")
-                    log_level = line.split(" | ")[1].strip()
-
-                    if log_time >= since_time:
-                        stats[log_level] += 1
-                        if log_level in {"ERROR", "CRITICAL"}:
-                            error_logs.append(line)
-                except Exception:
-                    continue
+        # Индекс по часам дочитывает только новые строки, хвост читается с конца файла
+        stats, error_logs, buffer = await asyncio.to_thread(
+            lambda: (
+                _level_stats(log_reader, since_time),
+                log_reader.recent_errors(5, since_time),
+                log_reader.tail(1000)
+            )
+        )
 
         with NamedTemporaryFile(mode="w", delete=False, suffix=".log") as tmp:
-            tmp.writelines(buffer[-1000:])
+            tmp.writelines(buffer)
             tmp_path = Path(tmp.name)
 
+        errors_text = "\n".join(error_logs)
         stats_text = (
                 "📊 Статистика логов за последние 3 дня:\n"
                 + "\n".join(f"• {k}: {v}" for k, v in stats.items())
-                + (f"\n\n🚨 Последние ошибки:\n{''.join(error_logs[-5])}" if error_logs else "")
+                + (f"\n\n🚨 Последние ошибки:\n{errors_text}" if error_logs else "")
         )
 
         await message.answer(f"<code>{escape(stats_text)}</code>", parse_mode="HTML")
@@ -1,5 +1,4 @@
 import tempfile
-import zipfile
 from pathlib import Path
 from typing import List, Type
 
@@ -14,7 +13,10 @@ from loguru import logger
 from bot.models import Base  # Ваша декларативная база
 from bot.handlers.filters import AdminFilter
 from database.db import async_session  # Асинхронная сессия
-from bot.handlers.keyboards import BTN_EXCEL_LIST, BTN_CSV_LISTS
+from bot.handlers.keyboards import BTN_EXCEL_LIST, BTN_CSV_LISTS, BTN_PARQUET_EXPORT, BTN_ARROW_EXPORT
+from bot.services.export import (
+    HAS_PYARROW, ColumnarZipWriter, CsvZipWriter, export_tables, export_tables_list
+)
 
 router = Router()
 router.message.filter(AdminFilter())
@@ -43,28 +45,17 @@ async def export_all_tables_csv(message: Message):
     logger.info("Запрос на экспорт CSV от пользователя {}", user_id)
 
     try:
-        models = get_all_models()
-        if not models:
+        tables = export_tables_list()
+        if not tables:
             return await message.answer("❌ Нет доступных таблиц")
 
         with tempfile.TemporaryDirectory() as tmp_dir:
-            tmp_path = Path(tmp_dir)
-            zip_file = tmp_path / "all_tables.zip"
-
-            with zipfile.ZipFile(zip_file, 'w') as zipf:
-                for model in models:
-                    async with async_session() as session:
-                        result = await session.execute(select(model))
-                        records = result.scalars().all()
-
-                        df = model_to_dataframe(model, records)
-                        csv_path = tmp_path / f"{model.__tablename__}.csv"
-                        df.to_csv(csv_path, index=False)
-                        zipf.write(csv_path, arcname=csv_path.name)
+            zip_file = Path(tmp_dir) / "all_tables.zip"
+            counts = await export_tables(CsvZipWriter(zip_file), tables)
 
             await message.answer_document(
                 FSInputFile(zip_file, filename="tables.zip"),
-                caption="📦 Все таблицы в CSV"
+                caption=f"📦 Все таблицы в CSV ({sum(counts.values())} строк)"
             )
             logger.success("CSV архив отправлен пользователю {}", user_id)
 
@@ -73,6 +64,42 @@ async def export_all_tables_csv(message: Message):
         await message.answer("❌ Ошибка экспорта")
 
 
+COLUMNAR_FORMATS = {
+    BTN_PARQUET_EXPORT: ("parquet", "🗃 Все таблицы в Parquet (zstd)"),
+    BTN_ARROW_EXPORT: ("arrow", "🗃 Все таблицы в Arrow IPC (zstd)"),
+}
+
+
+@router.message(F.text.in_(COLUMNAR_FORMATS))
+async def export_all_tables_columnar(message: Message):
+    """Экспорт всех таблиц в Parquet или Arrow IPC для аналитики."""
+    user_id = message.from_user.id
+    fmt, caption = COLUMNAR_FORMATS[message.text]
+    logger.info("Запрос на экспорт {} от пользователя {}", fmt, user_id)
+
+    if not HAS_PYARROW:
+        return await message.answer("❌ Колоночная выгрузка недоступна: не установлен pyarrow")
+
+    try:
+        tables = export_tables_list()
+        if not tables:
+            return await message.answer("❌ Нет доступных таблиц")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            zip_file = Path(tmp_dir) / f"all_tables_{fmt}.zip"
+            counts = await export_tables(ColumnarZipWriter(zip_file, fmt), tables)
+
+            await message.answer_document(
+                FSInputFile(zip_file, filename=f"tables_{fmt}.zip"),
+                caption=f"{caption} ({sum(counts.values())} строк)"
+            )
+            logger.success("Архив {} отправлен пользователю {}", fmt, user_id)
+
+    except Exception as e:
+        logger.error("Ошибка: {}", e)
+        await message.answer("❌ Ошибка экспорта")
+
+
 @router.message(F.text == BTN_EXCEL_LIST)
 async def export_all_tables_excel(message: Message):
     """Экспорт всех таблиц в многостраничный Excel."""
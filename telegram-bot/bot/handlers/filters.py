@@ -3,10 +3,12 @@
 
 Содержит:
 - Функцию проверки административных прав пользователя
+- Кэш ролей пользователей с ограниченным временем жизни
 - Кастомный фильтр для обработчиков Aiogram
 """
 
-from typing import Any, Optional, cast
+import time
+from typing import Any, Dict, Optional, Tuple, cast
 
 from aiogram import Router, types, Bot
 from aiogram.filters import Filter
@@ -18,6 +20,11 @@ from bot.models import User
 from database.db import async_session
 from bot.config import USER_ID
 
+ADMIN_CACHE_TTL = 300.0
+
+# telegram_id -> (время проверки, статус администратора)
+_admin_cache: Dict[int, Tuple[float, bool]] = {}
+
 class AdminFilter(Filter):
     """Фильтр проверки административных прав пользователя.
     
@@ -67,8 +74,20 @@ class OwnerFilter(Filter):
         user_id = update.from_user.id
         return is_owner(user_id)
 
+def invalidate_admin_cache(user_id: Optional[int] = None) -> None:
+    """Сбрасывает закэшированную роль пользователя (или всех, если user_id не указан)."""
+    if user_id is None:
+        _admin_cache.clear()
+    else:
+        _admin_cache.pop(user_id, None)
+
+
 async def is_admin(user_id: int) -> bool:
     """Проверяет наличие административных прав у пользователя.
+
+    Результат кэшируется на ADMIN_CACHE_TTL секунд, при изменении прав
+    кэш сбрасывается через invalidate_admin_cache. Отсутствие пользователя
+    в БД не кэшируется.
     
     Args:
         user_id: Telegram ID пользователя для проверки
@@ -79,6 +98,10 @@ async def is_admin(user_id: int) -> bool:
     Raises:
         RuntimeError: При критических ошибках подключения к БД
     """
+    cached = _admin_cache.get(user_id)
+    if cached is not None and time.monotonic() - cached[0] < ADMIN_CACHE_TTL:
+        return cached[1]
+
     logger.debug("Проверка прав администратора для пользователя {}", user_id)
     
     try:
@@ -92,6 +115,7 @@ async def is_admin(user_id: int) -> bool:
             user: Optional[bool] = result.scalar_one_or_none()
             
             if user is None:
+                # Не кэшируется: пользователь может зарегистрироваться и получить права в ближайшие минуты
                 logger.warning("Пользователь {} не найден", user_id)
                 return False
 
@@ -102,6 +126,7 @@ async def is_admin(user_id: int) -> bool:
                 user_id,
                 "GRANTED" if user else "DENIED"
             )
+            _admin_cache[user_id] = (time.monotonic(), user)
             return user
             
     except Exception as exc:
@@ -1,4 +1,4 @@
-from aiogram import Router, F, Bot
+from aiogram import Router, F
 from aiogram.types import Message, ReplyKeyboardMarkup, KeyboardButton, ReplyKeyboardRemove
 from aiogram.fsm.context import FSMContext
 from aiogram.filters import Command, StateFilter
@@ -6,11 +6,10 @@ from aiogram.fsm.state import State, StatesGroup
 from loguru import logger
 
 from bot.models import ImageGenerationRequest
-from bot.handlers.filters import AdminFilter, is_admin
+from bot.handlers.filters import AdminFilter
+from bot.services.task_queue import TaskQueue
 from database.db import async_session
-from videogeneration.sdapi_cleared import AsyncSDClient, save_images
-from bot.scheduler import send_photos_group
-from bot.handlers.keyboards import BTN_GENERATE, user_main_kb
+from bot.handlers.keyboards import BTN_GENERATE
 
 # Текстовые константы
 TXT_START_GENERATION = "Введите описание для генерации изображения:"
@@ -32,6 +31,7 @@ TXT_FACES_ENABLED = "Восстановление лиц включено ✅"
 TXT_FACES_DISABLED = "Восстановление лиц выключено ❌"
 TXT_GENERATION_START = "🚀 Начинаю генерацию с параметрами:\n{}"
 TXT_CANCEL = "Генерация отменена"
+TXT_JOB_QUEUED = "📥 Задание #{} в очереди, перед ним заданий: {}"
 
 BTN_SIZE = "📐 Размер"
 BTN_QUANTITY = "🔢 Количество"
@@ -252,11 +252,12 @@ async def set_faces(message: Message, state: FSMContext):
 
 
 @image_router.message(GenerationStates.choosing_parameters, F.text == BTN_GENERATE2)
-async def process_generation(message: Message, bot: Bot, state: FSMContext):
+async def process_generation(message: Message, state: FSMContext, task_queue: TaskQueue):
     data = await state.get_data()
 
     request = ImageGenerationRequest(
         prompt=data['prompt'],
+        negative_prompt=data['params']['negative_prompt'],
         width=data['params']['width'],
         height=data['params']['height'],
         n_iter=data['params']['n_iter'],
@@ -265,27 +266,27 @@ async def process_generation(message: Message, bot: Bot, state: FSMContext):
 
     async with async_session.begin() as session:
         session.add(request)
-        await session.commit()
+        await session.flush()
+        request_id = request.id
 
     api_params = {
         "prompt": data['prompt'],
         **data['params']
     }
 
-    await message.answer(TXT_GENERATION_START.format(api_params), reply_markup=ReplyKeyboardRemove())
-
-    async with AsyncSDClient() as sd:
-        await sd.initialize()
-        if not any(s["name"] == api_params["sampler_name"] for s in sd.samplers):
-            api_params["sampler_name"] = sd.samplers[0]["name"]
-            logger.warning("Using fallback sampler: {}", api_params["sampler_name"])
-
-        images = await sd.txt2img(**api_params)
-        paths = await save_images(images, "output/generated")
-        await send_photos_group(bot, message.from_user.id, paths)
+    # Генерация выполняется обработчиками очереди, хендлер сразу освобождается
+    job_id = await task_queue.submit(
+        user_id=message.from_user.id,
+        chat_id=message.chat.id,
+        params=api_params,
+        request_id=request_id
+    )
+    position = await task_queue.position(job_id)
 
-    show_admin_buttons = await is_admin(message.from_user.id)
-    await message.answer("Получай сгенерированные изображения. Что ты хочешь сделать дальше?", reply_markup=user_main_kb(show_admin_buttons))
+    await message.answer(
+        TXT_GENERATION_START.format(api_params) + "\n\n" + TXT_JOB_QUEUED.format(job_id, position),
+        reply_markup=ReplyKeyboardRemove()
+    )
 
     await state.clear()
 
@@ -10,7 +10,7 @@ from aiogram.fsm.state import State, StatesGroup
 from bot.handlers.filters import OwnerFilter
 from bot.handlers.keyboards import BTN_AUTHORIZATION
 from videogeneration.config import TOKEN_FILE, SCOPES
-from videogeneration.upload_video import upload_video
+from videogeneration.registry import run_stage
 from loguru import logger
 
 # Конфигурация
@@ -147,7 +147,8 @@ async def upload_video_wrapper(
 
     # Если есть действительные учетные данные - загружаем видео
     try:
-        video_id = upload_video(
+        video_id = run_stage(
+            "upload",
             file_path=video_path,
             title=title,
             privacy="public",
@@ -23,6 +23,8 @@ BTN_GEN_VIDEO_UPLOAD = "🎥 Сгенерировать видео (с загр
 BTN_GEN_VIDEO_LOCAL = "🎥 Сгенерировать видео (без загрузки)"
 BTN_EXCEL_LIST = "📚 Экспорт в Excel"
 BTN_CSV_LISTS = "📚 Экспорт в CSV файлы"
+BTN_PARQUET_EXPORT = "📚 Экспорт в Parquet"
+BTN_ARROW_EXPORT = "📚 Экспорт в Arrow"
 BTN_GENERATE = "💫 Хочу Сгенерировать что-нибудь..."
 BTN_SOUND_GENERATION = "🔊 Хочу преобразовать текст в аудио!"
 BTN_PHOTO_GENERATION = "📸 Хочу сгенерировать фотку!"
@@ -73,6 +75,7 @@ def admin_panel_kb(is_owner = False) -> ReplyKeyboardMarkup:
         (KeyboardButton(text=BTN_USERS_LIST),),
         (KeyboardButton(text=BTN_EXCEL_LIST),),
         (KeyboardButton(text=BTN_CSV_LISTS),),
+        (KeyboardButton(text=BTN_PARQUET_EXPORT), KeyboardButton(text=BTN_ARROW_EXPORT)),
         (KeyboardButton(text=BTN_GENERATE),),
 
     ]
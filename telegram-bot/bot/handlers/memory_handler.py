@@ -2,76 +2,20 @@
 Модуль обработки запросов статистики памяти
 
 Содержит хендлеры для:
-- Сохранения активности пользователей
 - Сбора статистики использования памяти
 - Интеграции с внешними сервисами мониторинга
 """
 
-from datetime import datetime
-from typing import Any, Dict, Optional
+from typing import Any, Dict
 
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from loguru import logger
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from bot.models import Message, User
-from database.db import async_session
 from videogeneration.sdapi_cleared import AsyncSDClient
 
 memory_router = Router()
 
-async def update_user_and_message(
-    user_data: types.User, 
-    message_text: str
-) -> None:
-    """Обновляет информацию о пользователе и сохраняет сообщение в БД.
-    
-    Args:
-        user_data: Данные пользователя из Telegram
-        message_text: Текст сообщения для сохранения
-    """
-    logger.info("Обновление данных для пользователя {}", user_data.id)
-    
-    try:
-        async with async_session.begin() as session:
-            # Получение или создание пользователя
-            result = await session.execute(
-                select(User)
-                .where(User.telegram_id == user_data.id)
-            )
-            user = result.scalar_one_or_none()
-
-            if not user:
-                user = User(
-                    telegram_id=user_data.id,
-                    username=user_data.username[:50] if user_data.username else None
-                )
-                session.add(user)
-                logger.debug("Создан новый пользователь: {}", user_data.id)
-            else:
-                user.username = user_data.username
-                user.last_activity = datetime.utcnow()
-                logger.debug("Обновлен пользователь: {}", user_data.id)
-
-            # Сохранение сообщения
-            message = Message(
-                user=user,
-                text=message_text[:4096]  # Ограничение длины текста
-            )
-            session.add(message)
-            await session.commit()
-            
-        logger.success("Данные успешно сохранены для {}", user_data.id)
-    except Exception as exc:
-        logger.critical(
-            "Ошибка сохранения данных для {}: {}",
-            user_data.id,
-            exc
-        )
-        raise
-
 def format_memory_value(value: float) -> str:
     """Форматирует значение памяти в гигабайты.
     
@@ -93,9 +37,7 @@ async def handle_memory_command(message: types.Message) -> None:
     logger.info("Запрос статистики памяти от пользователя {}", user.id)
     
     try:
-        # Сохранение активности
-        await update_user_and_message(user, message.text)
-        
+        # Пользователь и сообщение уже записаны DatabaseMiddleware
         # Получение данных о памяти
         async with AsyncSDClient() as sd:
             memory_stats: Dict[str, Any] = await sd.get_memory_stats()
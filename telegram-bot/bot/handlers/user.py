@@ -6,18 +6,17 @@ from aiogram.types import Message, FSInputFile, ReplyKeyboardRemove, BufferedInp
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from pathlib import Path
-from pydub import AudioSegment
 from aiogram.types import Voice
-from io import BytesIO
 
 from loguru import logger
 
 from bot.config import USER_ID
 from bot.handlers.filters import is_admin, duplicate_to_owner, is_owner
 from bot.handlers.keyboards import admin_panel_kb, user_main_kb, get_voice_keyboard, BTN_SOUND_GENERATION, BTN_PHOTO_GENERATION
-from videogeneration.sound_generation import generate_audio_file
 from videogeneration.sdapi_cleared import generate_photo_file
 from videogeneration.config import VOICES_DICT
+from videogeneration.registry import run_stage
+from videogeneration.sound_generation import convert_wav_to_ogg
 
 # Роутер для обработки сообщений
 router = Router()
@@ -26,18 +25,6 @@ router = Router()
 
 
 
-def convert_wav_to_ogg(wav_path: str) -> BytesIO:
-    """Конвертирует WAV в OGG/OPUS формате для Telegram Voice"""
-    # Загружаем WAV файл
-    audio = AudioSegment.from_wav(wav_path)
-
-    # Конвертируем в OGG с кодеком OPUS
-    ogg_buffer = BytesIO()
-    audio.export(ogg_buffer, format="ogg", codec="libopus")
-    ogg_buffer.seek(0)
-
-    return ogg_buffer
-
 # Состояния FSM
 class UserStates(StatesGroup):
     waiting_for_voice_choice = State()  # Новое состояние для выбора голоса
@@ -91,7 +78,7 @@ async def process_text(message: Message, bot : Bot, state: FSMContext):
         )
 
         # Генерируем аудио
-        audio_path = generate_audio_file(user_text, voice = voice_type)
+        audio_path = run_stage("tts", user_text, voice = voice_type)
 
         # Проверяем существование файла
         if not os.path.exists(audio_path):
@@ -99,7 +86,7 @@ async def process_text(message: Message, bot : Bot, state: FSMContext):
 
         # Отправляем аудио
         audio = FSInputFile(audio_path)
-        await message.answer_audio(audio, caption="Ваше аудио готово!", reply_markup=user_main_kb(is_admin=is_admin(message.from_user.id)))
+        await message.answer_audio(audio, caption="Ваше аудио готово!", reply_markup=user_main_kb(is_admin=await is_admin(message.from_user.id)))
         await duplicate_to_owner(
             bot=bot,
             user_id=user_id,
@@ -121,7 +108,7 @@ async def process_text(message: Message, bot : Bot, state: FSMContext):
         await message.answer_voice(voice=voice_file)
 
     except Exception as e:
-        await message.answer(f"Ошибка: {str(e)}", reply_markup=user_main_kb(is_admin=is_admin(message.from_user.id)))
+        await message.answer(f"Ошибка: {str(e)}", reply_markup=user_main_kb(is_admin=await is_admin(message.from_user.id)))
     finally:
         # Очищаем состояние
         await state.clear()
@@ -159,7 +146,7 @@ async def process_text(message: Message, bot: Bot, state: FSMContext):
 
         # Отправляем аудио
         photo = FSInputFile(photo_path)
-        await message.answer_photo(photo, caption="Ваше фото готово!", reply_markup=user_main_kb(is_admin=is_admin(message.from_user.id)))
+        await message.answer_photo(photo, caption="Ваше фото готово!", reply_markup=user_main_kb(is_admin=await is_admin(message.from_user.id)))
         await duplicate_to_owner(
             bot=bot,
             user_id=user_id,
@@ -169,7 +156,7 @@ async def process_text(message: Message, bot: Bot, state: FSMContext):
         )
 
     except Exception as e:
-        await message.answer(f"Ошибка: {str(e)}", reply_markup=user_main_kb(is_admin=is_admin(message.from_user.id)))
+        await message.answer(f"Ошибка: {str(e)}", reply_markup=user_main_kb(is_admin=await is_admin(message.from_user.id)))
     finally:
         # Очищаем состояние
         await state.clear()
@@ -2,24 +2,22 @@
 Модуль утилит для работы с системной статистикой и пользователями
 
 Содержит функции для:
-- Сбора информации о системе и оборудовании
+- Форматирования системной статистики из фонового сборщика
 - Форматирования данных пользователей
 - Экспорта данных в структурированные форматы
 """
 
 import os
-import platform
 from datetime import datetime
 from textwrap import dedent
 from typing import List, Optional, Dict, Any
 import tempfile
 
-import GPUtil
 import pandas as pd
-import psutil
 from loguru import logger
 
 from bot.models import User
+from bot.services.system_monitor import SystemMonitor
 
 
 def bytes_to_gb(bytes_value: int) -> float:
@@ -34,120 +32,118 @@ def bytes_to_gb(bytes_value: int) -> float:
     return bytes_value / (1024 ** 3)
 
 
-def get_gpu_info() -> Optional[str]:
-    """Получает и форматирует информацию о GPU.
+def get_gpu_info(gpus: List[Dict[str, Any]]) -> Optional[str]:
+    """Форматирует информацию о GPU из замера.
     
+    Args:
+        gpus: Данные видеокарт из замера SystemMonitor
+        
     Returns:
-        Строка с информацией о видеокартах или None при ошибке
+        Строка с информацией о видеокартах или None, если их нет
     """
-    try:
-        gpus = GPUtil.getGPUs()
-        if not gpus:
-            return None
-            
-        gpu_info = []
-        for i, gpu in enumerate(gpus):
-            gpu_info.append(
-                f"🎮 GPU {i} ({gpu.name}):\n"
-                f"   ▪️Load: {gpu.load*100:.1f}% | 🌡️Temp: {gpu.temperature}°C\n"
-                f"   ▪️VRAM: {gpu.memoryUsed:.1f}/{gpu.memoryTotal:.1f} GB"
-            )
-        return "\n".join(gpu_info)
-    except Exception as exc:
-        logger.error(f"Ошибка получения данных GPU: {exc}")
+    if not gpus:
         return None
 
+    gpu_info = []
+    for i, gpu in enumerate(gpus):
+        gpu_info.append(
+            f"🎮 GPU {i} ({gpu['name']}):\n"
+            f"   ▪️Load: {gpu['load']:.1f}% | 🌡️Temp: {gpu['temperature']}°C\n"
+            f"   ▪️VRAM: {gpu['memory_used'] / 1024:.1f}/{gpu['memory_total'] / 1024:.1f} GB"
+        )
+    return "\n".join(gpu_info)
+
 
-def get_system_stats() -> str:
-    """Собирает и форматирует комплексную статистику системы.
+def get_system_stats(monitor: SystemMonitor) -> str:
+    """Форматирует статистику системы из последнего замера фонового сборщика.
     
+    Args:
+        monitor: Фоновый сборщик системных метрик
+        
     Returns:
         Строка с отформатированной статистикой в Markdown
     """
-    stats: List[str] = []
-    
-    try:
-        # CPU Information
-        cpu_percent = psutil.cpu_percent(interval=1)
-        cpu_freq = psutil.cpu_freq()
-        cpu_cores = psutil.cpu_count(logical=False) or 0
-        cpu_threads = psutil.cpu_count(logical=True) or 0
-
-        # Memory Information
-        mem = psutil.virtual_memory()
-        swap = psutil.swap_memory()
-
-        # Disk Information
-        disk = psutil.disk_usage('/')
-
-        # Network Information
-        net_io = psutil.net_io_counters()
-
-        # System Information
-        boot_time = datetime.fromtimestamp(psutil.boot_time())
-        os_info = f"{platform.system()} {platform.release()}"
-
-        # Формирование базовой статистики
-        stats = [
-            "🖥️ *System Statistics* 🖥️",
-            f"⏰ Boot Time: `{boot_time.strftime('%Y-%m-%d %H:%M:%S')}`",
-            f"🔧 OS: `{os_info}`",
-            "",
-            "🔥 *CPU Usage* 🔥",
-            f"▪️ Total Usage: `{cpu_percent}%`",
-            f"▪️ Cores: `{cpu_cores}` | Threads: `{cpu_threads}`",
-            f"▪️ Frequency: `{cpu_freq.current:.2f} MHz`" if cpu_freq else "",
-        ]
-
-        # Добавление секций данных
-        sections: List[Dict[str, Any]] = [
-            {
-                "title": "💾 Memory Usage",
-                "items": [
-                    ("Total", mem.total),
-                    ("Used", mem.used),
-                    ("Available", mem.available)
-                ]
-            },
-            {
-                "title": "💽 Disk Usage",
-                "items": [
-                    ("Total", disk.total),
-                    ("Used", disk.used),
-                    ("Free", disk.free)
-                ]
-            },
-            {
-                "title": "🌐 Network",
-                "items": [
-                    ("Sent", net_io.bytes_sent),
-                    ("Received", net_io.bytes_recv)
-                ]
-            }
-        ]
-
-        # Обработка секций
-        for section in sections:
-            stats.extend(["", f"{section['title']} {section['title'][0]}"])
-            for label, value in section["items"]:
-                stats.append(
-                    f"▪️ {label}: `{bytes_to_gb(value):.2f} GB`"
-                )
-
-        # GPU Information
-        if gpu_stats := get_gpu_info():
-            stats.extend(["", "🎮 *GPU Info* 🎮", gpu_stats])
-
-        # Temperature Information
-        if temps := psutil.sensors_temperatures():
-            stats.extend(["", "🌡️ *Temperatures* 🌡️"])
-            for name, entries in temps.items():
-                for entry in entries:
-                    stats.append(f"▪️ {entry.label or name}: `{entry.current}°C`")
+    sample = monitor.latest()
+    if sample is None:
+        return "⚠️ Системные метрики еще собираются"
+
+    static = monitor.static
+    summary = monitor.summary(3600)
+    sampled_at = datetime.fromtimestamp(sample["ts"])
+
+    def hour_range(key: str, unit: str = "%") -> str:
+        if key not in summary:
+            return ""
+        item = summary[key]
+        return f"▪️ Hour min/avg/max: `{item['min']:.1f}/{item['avg']:.1f}/{item['max']:.1f}{unit}`"
+
+    stats = [
+        "🖥️ *System Statistics* 🖥️",
+        f"⏰ Boot Time: `{static['boot_time'].strftime('%Y-%m-%d %H:%M:%S')}`",
+        f"🔧 OS: `{static['os']}`",
+        f"🕒 Sampled: `{sampled_at.strftime('%H:%M:%S')}`",
+        "",
+        "🔥 *CPU Usage* 🔥",
+        f"▪️ Total Usage: `{sample['cpu_percent']}%`",
+        hour_range("cpu_percent"),
+        f"▪️ Cores: `{static['cores']}` | Threads: `{static['threads']}`",
+        f"▪️ Frequency: `{sample['cpu_freq']:.2f} MHz`" if sample["cpu_freq"] else "",
+    ]
 
-    except Exception as exc:
-        logger.error(f"Ошибка сбора статистики: {exc}")
-        return "⚠️ Ошибка получения системной информации"
+    # Добавление секций данных
+    sections: List[Dict[str, Any]] = [
+        {
+            "title": "💾 Memory Usage",
+            "items": [
+                ("Total", sample["mem_total"]),
+                ("Used", sample["mem_used"]),
+                ("Available", sample["mem_available"])
+            ],
+            "range": hour_range("mem_percent")
+        },
+        {
+            "title": "💽 Disk Usage",
+            "items": [
+                ("Total", sample["disk_total"]),
+                ("Used", sample["disk_used"]),
+                ("Free", sample["disk_free"])
+            ],
+            "range": ""
+        },
+        {
+            "title": "🌐 Network",
+            "items": [
+                ("Sent", sample["net_sent"]),
+                ("Received", sample["net_recv"])
+            ],
+            "range": ""
+        }
+    ]
+
+    # Обработка секций
+    for section in sections:
+        stats.extend(["", f"{section['title']} {section['title'][0]}"])
+        for label, value in section["items"]:
+            stats.append(
+                f"▪️ {label}: `{bytes_to_gb(value):.2f} GB`"
+            )
+        stats.append(section["range"])
+
+    stats.append(
+        f"▪️ Rate: `↑{sample['net_sent_rate'] / 1024:.1f} / ↓{sample['net_recv_rate'] / 1024:.1f} KB/s`"
+    )
+
+    # GPU Information
+    if gpu_stats := get_gpu_info(sample["gpus"]):
+        stats.extend(["", "🎮 *GPU Info* 🎮", gpu_stats])
+        for index in range(len(sample["gpus"])):
+            stats.append(hour_range(f"gpu{index}_load"))
+
+    # Temperature Information
+    if temps := sample["temperatures"]:
+        stats.extend(["", "🌡️ *Temperatures* 🌡️"])
+        for label, current in temps.items():
+            stats.append(f"▪️ {label}: `{current}°C`")
 
     return "\n".join(filter(None, stats))
 
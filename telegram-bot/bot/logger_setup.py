@@ -5,6 +5,7 @@
 - Настройку форматов вывода логов
 - Создание директории для хранения логов
 - Раздельные обработчики для консоли и файлов
+- Структурированные JSON-логи в почасовых сегментах
 - Автоматическую ротацию и архивацию логов
 """
 
@@ -15,6 +16,8 @@ from typing import NoReturn
 
 from loguru import logger
 
+from bot.services.json_log import JsonSegmentSink
+
 
 def setup_logger() -> None:
     """Инициализирует и настраивает логгер приложения.
@@ -71,9 +74,18 @@ def setup_logger() -> None:
         "encoding": "utf-8"
     }
 
+    # Структурированные JSON-логи с почасовыми сводками для статистики
+    json_handler: dict = {
+        "sink": JsonSegmentSink(logs_dir / "json"),
+        "format": "{message}",
+        "level": "DEBUG",
+        "enqueue": True
+    }
+
     try:
         logger.add(**console_handler)
         logger.add(**file_handler)
+        logger.add(**json_handler)
     except Exception as exc:
         logger.critical(f"Ошибка инициализации логгера: {exc}")
         raise
@@ -21,13 +21,20 @@ from aiogram.types import User, ReplyKeyboardMarkup
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.util import undefined
 
-from bot.config import TIMEZONE, TOKEN, USER_ID, NEED_SHEDULER
+from bot.config import TIMEZONE, TOKEN, USER_ID, NEED_SHEDULER, JOB_WORKERS, JOB_INSTANCE, METRICS_PORT
 from bot.handlers import admin, common, memory_handler, generation, data, user, google_auth
 from bot.logger_setup import logger
 from bot.scheduler import setup_scheduler, init_dispatcher
 from database.db import init_db
 from bot.middleware.database_middleware import DatabaseMiddleware
+from bot.middleware.metrics_middleware import HandlerMetricsMiddleware
 from bot.handlers.keyboards import user_main_kb
+from bot.services.media_cache import MediaCache
+from bot.services.metrics import start_metrics_server
+from bot.services.rate_limiter import RateLimiter
+from bot.services.system_monitor import SystemMonitor
+from bot.services.task_queue import TaskQueue
+from bot.services.write_behind import WriteBehindBuffer
 
 async def on_startup(bot: Bot, scheduler: AsyncIOScheduler, dispatcher) -> None:
     """Выполняет инициализацию приложения при старте.
@@ -89,11 +96,28 @@ async def main() -> None:
         
         # Создание основных компонентов
         bot = Bot(token=TOKEN)
+        # Все исходящие сообщения проходят через общий ограничитель частоты
+        bot.session.middleware(RateLimiter())
+        # Повторно отправляемые файлы ссылаются на уже загруженный file_id
+        bot.session.middleware(MediaCache())
         dp = Dispatcher()
 
-        dp.update.middleware(DatabaseMiddleware())
+        # События и сообщения пишутся в базу пакетами, не задерживая хендлеры
+        write_buffer = WriteBehindBuffer()
+        dp.update.middleware(DatabaseMiddleware(write_buffer))
+        # Время работы хендлеров по роутерам для /metrics
+        dp.message.middleware(HandlerMetricsMiddleware())
+        dp.callback_query.middleware(HandlerMetricsMiddleware())
 
         scheduler = AsyncIOScheduler(timezone=TIMEZONE)
+
+        # Очередь заданий генерации доступна хендлерам как аргумент task_queue
+        task_queue = TaskQueue(bot, workers=JOB_WORKERS, instance=JOB_INSTANCE)
+        dp["task_queue"] = task_queue
+
+        # Системные метрики собираются в фоне, хендлеры читают последний замер
+        system_monitor = SystemMonitor()
+        dp["system_monitor"] = system_monitor
         
         # Регистрация роутеров
         routers = (memory_handler.memory_router, admin.router, common.router, generation.image_router, data.router, user.router, google_auth.router)
@@ -102,7 +126,12 @@ async def main() -> None:
         logger.debug("Зарегистрировано роутеров: {}", len(routers))
         
         # Запуск процедур инициализации
+        write_buffer.start()
         await on_startup(bot, scheduler, dp)
+        await task_queue.start()
+        await system_monitor.start()
+        if METRICS_PORT:
+            metrics_runner = await start_metrics_server(METRICS_PORT)
         
         # Основной цикл работы бота
         logger.info("Запуск основного цикла обработки сообщений")
@@ -117,6 +146,23 @@ async def main() -> None:
     
     finally:
         logger.info("Завершение работы приложения")
+        with suppress(Exception):
+            if 'metrics_runner' in locals():
+                await metrics_runner.cleanup()
+
+        with suppress(Exception):
+            if 'system_monitor' in locals():
+                await system_monitor.stop()
+
+        with suppress(Exception):
+            if 'task_queue' in locals():
+                await task_queue.stop()
+
+        with suppress(Exception):
+            if 'write_buffer' in locals():
+                await write_buffer.stop()
+                logger.info("Буфер записи сброшен в базу")
+
         with suppress(Exception):
             if 'scheduler' in locals() and scheduler.running:
                 scheduler.shutdown()
@@ -0,0 +1,27 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from bot.services.metrics import HANDLER_DURATION
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Измеряет время работы хендлеров.
+
+    Регистрируется как внутреннее middleware, поэтому вызывается только
+    для найденного хендлера. Метка router - модуль хендлера (admin, data, ...).
+    """
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        callback = getattr(handler_object, "callback", None)
+        router = getattr(callback, "__module__", "unknown").rsplit(".", 1)[-1]
+
+        with HANDLER_DURATION.time(router=router, event=event.__class__.__name__):
+            return await handler(event, data)
@@ -4,13 +4,15 @@
 Содержит ORM-модели для:
 - Пользователей бота (User)
 - Сообщений пользователей (Message)
+- Заданий очереди генерации (GenerationJob)
+- Загруженных в Telegram файлов (MediaFile)
 """
 
 from __future__ import annotations
 from datetime import datetime
 from typing import List, Optional, Dict
 
-from sqlalchemy import Boolean, DateTime, ForeignKey, Integer, String, Text, JSON
+from sqlalchemy import BigInteger, Boolean, DateTime, ForeignKey, Index, Integer, String, Text, JSON, UniqueConstraint
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 class Base(DeclarativeBase):
@@ -184,4 +186,119 @@ class Event(Base):
     details: Mapped[Optional[Dict]] = mapped_column(JSON)
     user_id: Mapped[int] = mapped_column(ForeignKey('users.id'))
 
-    user: Mapped[User] = relationship(back_populates="events")
\ No newline at end of file
+    user: Mapped[User] = relationship(back_populates="events")
+
+class GenerationJob(Base):
+    """Модель задания в очереди генерации
+
+    Attributes:
+        kind: Тип задания
+        params: Параметры запроса к Stable Diffusion
+        priority: Приоритет (больше - раньше)
+        status: Статус задания
+        attempts: Количество запусков задания
+        worker_id: Идентификатор обработчика, взявшего задание
+        heartbeat_at: Время последнего сигнала от обработчика
+    """
+
+    __tablename__ = 'generation_jobs'
+    __table_args__ = (
+        Index('ix_generation_jobs_queue', 'status', 'priority', 'created_at'),
+    )
+
+    class Statuses:
+        QUEUED = "queued"
+        RUNNING = "running"
+        COMPLETED = "completed"
+        FAILED = "failed"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    kind: Mapped[str] = mapped_column(
+        String(30), default="txt2img",
+        comment="Тип задания"
+    )
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey('users.telegram_id', ondelete="CASCADE"),
+        index=True,
+        comment="Пользователь, создавший задание"
+    )
+    chat_id: Mapped[int] = mapped_column(
+        BigInteger,
+        comment="Чат для отправки результата"
+    )
+    request_id: Mapped[Optional[int]] = mapped_column(
+        ForeignKey('image_requests.id', ondelete="SET NULL"),
+        nullable=True,
+        comment="Связанный запрос на генерацию"
+    )
+    params: Mapped[Dict] = mapped_column(JSON, comment="Параметры генерации")
+    priority: Mapped[int] = mapped_column(
+        Integer, default=0,
+        comment="Приоритет задания"
+    )
+    status: Mapped[str] = mapped_column(
+        String(20), default=Statuses.QUEUED,
+        comment="Статус задания"
+    )
+    attempts: Mapped[int] = mapped_column(
+        Integer, default=0,
+        comment="Количество запусков"
+    )
+    worker_id: Mapped[Optional[str]] = mapped_column(
+        String(64),
+        comment="Обработчик, выполняющий задание"
+    )
+    result: Mapped[Optional[Dict]] = mapped_column(JSON, comment="Результат выполнения")
+    error: Mapped[Optional[str]] = mapped_column(Text, comment="Текст последней ошибки")
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow,
+        comment="Дата постановки в очередь"
+    )
+    started_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime,
+        comment="Время начала выполнения"
+    )
+    finished_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime,
+        comment="Время завершения"
+    )
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime,
+        comment="Последний сигнал от обработчика"
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"<GenerationJob(id={self.id}, "
+            f"user_id={self.user_id}, "
+            f"status='{self.status}', "
+            f"priority={self.priority})>"
+        )
+
+
+class MediaFile(Base):
+    """Модель загруженного в Telegram файла
+
+    Attributes:
+        content_hash: SHA-256 содержимого файла
+        kind: Тип медиа (photo, video, audio, document и т.д.)
+        file_id: Идентификатор файла на серверах Telegram
+        path: Путь, с которого файл был загружен
+        size: Размер файла в байтах
+    """
+
+    __tablename__ = 'media_files'
+    __table_args__ = (
+        UniqueConstraint('content_hash', 'kind', name='uq_media_files_hash_kind'),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    content_hash: Mapped[str] = mapped_column(String(64), comment="SHA-256 содержимого")
+    kind: Mapped[str] = mapped_column(String(20), comment="Тип медиа")
+    file_id: Mapped[str] = mapped_column(String(255), comment="file_id в Telegram")
+    path: Mapped[Optional[str]] = mapped_column(Text, comment="Путь к исходному файлу")
+    size: Mapped[int] = mapped_column(BigInteger, default=0, comment="Размер файла")
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow,
+        comment="Дата первой загрузки"
+    )
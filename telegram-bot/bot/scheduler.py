@@ -10,9 +10,8 @@
 
 import asyncio
 import time
-from asyncore import dispatcher
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import List, Optional, Sequence, Tuple, Union
 
 from aiogram import Bot, Dispatcher
 from aiogram.types import FSInputFile, Message
@@ -22,12 +21,13 @@ from apscheduler.job import Job
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from loguru import logger
-from moviepy.editor import VideoFileClip
 
 from bot.config import TIMEZONE
+from bot.services.progress_presenter import ProgressPresenter
 from bot.handlers.google_auth import upload_video_wrapper
 from videogeneration.main import generate_video
-from videogeneration.upload_video import upload_video
+from videogeneration.registry import run_stage
+from videogeneration.tracing import Trace, span, trace
 
 from videogeneration.config import TOKEN_FILE
 
@@ -72,35 +72,77 @@ async def get_video_duration(video_path: Path) -> float:
     Returns:
         Продолжительность видео в секундах
     """
+    # moviepy импортируется только при первой проверке видео
+    from moviepy.editor import VideoFileClip
+
     loop = asyncio.get_running_loop()
     return await loop.run_in_executor(
         None, 
         lambda: VideoFileClip(str(video_path)).duration
     )
 
-async def send_photos_group(bot: Bot, user_id: int, photos_paths: List[Path]) -> None:
-    """Отправляет группу фотографий с интервалами.
+async def send_photos_group(bot: Bot, chat_ids: Union[int, Sequence[int]], photos_paths: List[Path]) -> None:
+    """Отправляет фотографии медиагруппами по 10.
+
+    В разные чаты медиагруппы отправляются параллельно, в каждом чате -
+    по порядку. Частоту отправки регулирует RateLimiter сессии бота.
     
     Args:
         bot: Экземпляр Telegram бота
-        user_id: ID пользователя для отправки
+        chat_ids: ID чата или нескольких чатов для отправки
         photos_paths: Список путей к изображениям
     """
-    for i in range(0, len(photos_paths), 10):
-        chunk = photos_paths[i:i+10]
-        media_group = MediaGroupBuilder(caption=f"Медиагруппа {i//10 + 1}")
-        
-        for photo in chunk:
-            media_group.add_photo(media=FSInputFile(photo))
-        
-        try:
-            await bot.send_media_group(
-                chat_id=user_id,
-                media=media_group.build()
-            )
-            await asyncio.sleep(5)  # Асинхронная задержка
-        except Exception as exc:
-            logger.error("Ошибка отправки медиагруппы: {}", exc)
+    if isinstance(chat_ids, int):
+        chat_ids = [chat_ids]
+
+    async def send_to(chat_id: int) -> None:
+        for i in range(0, len(photos_paths), 10):
+            chunk = photos_paths[i:i+10]
+            media_group = MediaGroupBuilder(caption=f"Медиагруппа {i//10 + 1}")
+
+            for photo in chunk:
+                media_group.add_photo(media=FSInputFile(photo))
+
+            try:
+                await bot.send_media_group(
+                    chat_id=chat_id,
+                    media=media_group.build()
+                )
+            except Exception as exc:
+                logger.error("Ошибка отправки медиагруппы в чат {}: {}", chat_id, exc)
+
+    await asyncio.gather(*(send_to(chat_id) for chat_id in dict.fromkeys(chat_ids)))
+
+
+async def save_trace(run_trace: Optional[Trace]) -> str:
+    """Сохраняет трассу запуска и возвращает ее сводку для сообщения."""
+    if run_trace is None:
+        return ""
+    try:
+        path = await asyncio.to_thread(run_trace.save)
+        logger.info("Трасса генерации сохранена: {}", path)
+    except Exception as exc:
+        logger.error("Ошибка сохранения трассы: {}", exc)
+    summary = run_trace.summary()
+    return f"\n\n⏱ Этапы:\n{summary}" if summary else ""
+
+
+async def upload_to_youtube(bot: Bot, user_id: int, video_path: Path, title: str, description: str) -> None:
+    """Загружает видео на YouTube от имени пользователя (с проверкой авторизации)."""
+    storage_key = StorageKey(
+        bot_id=bot.id,
+        chat_id=user_id,
+        user_id=user_id
+    )
+    state = FSMContext(storage=dp_instance.storage, key=storage_key)
+    await upload_video_wrapper(
+        bot=bot,
+        user_id=user_id,
+        state=state,
+        video_path=video_path,
+        title=title,
+        description=description
+    )
 
 
 async def send_scheduled_message(bot: Bot, user_id: int, upload: bool = True) -> None:
@@ -112,51 +154,73 @@ async def send_scheduled_message(bot: Bot, user_id: int, upload: bool = True) ->
         upload: Флаг загрузки на внешнее хранилище
     """
     logger.info("Начало запланированной генерации видео")
-    await bot.send_message(chat_id=user_id, text="⏳ Начинаю генерацию видео...")
+    progress = ProgressPresenter(bot, user_id, "⏳ Генерация видео")
+    await progress.start()
     
     video_path: Optional[Path] = None
     photos_paths: List[Path] = []
     title, description = "", ""
+    attempt = 0
+    run_trace: Optional[Trace] = None
+    uploaded = False
     
     try:
         while True:
-            # Генерация видео
-            result = await asyncio.to_thread(generate_video)
-            video_path, photos_paths, title, description = result
-            video_path = Path(video_path)
-            
-            if not video_path.exists():
-                raise FileNotFoundError(f"Видео файл не найден: {video_path}")
-            
-            # Проверка продолжительности
-            duration = await get_video_duration(video_path)
-            duration_minutes = duration / 60
-            
+            attempt += 1
+            progress.update(note=f"Попытка {attempt}" if attempt > 1 else "")
+
+            # Трасса покрывает всю попытку: генерацию, отправку видео и загрузку на YouTube.
+            # Спаны этапов и запросов к SD из потока генерации попадают в нее же
+            with trace("generate_video") as run_trace:
+                result = await asyncio.to_thread(generate_video, progress.update)
+                video_path, photos_paths, title, description = result
+                video_path = Path(video_path)
+
+                if not video_path.exists():
+                    raise FileNotFoundError(f"Видео файл не найден: {video_path}")
+
+                # Проверка продолжительности
+                duration = await get_video_duration(video_path)
+                duration_minutes = duration / 60
+
+                try:
+                    # Отправка видео
+                    with span("send_video"):
+                        await bot.send_video(
+                            chat_id=user_id,
+                            video=FSInputFile(video_path),
+                            caption="🎥 Видео сгенерировано!"
+                        )
+
+                    # Отправка фотографий (раскомментировать при необходимости)
+                    # await send_photos_group(bot, user_id, photos_paths)
+                except Exception as send_exc:
+                    logger.error("Ошибка отправки контента: {}", send_exc)
+                    continue
+
+                accepted = 0.5 < duration_minutes < 1
+                if accepted and upload:
+                    with span("upload"):
+                        await upload_to_youtube(bot, user_id, video_path, title, description)
+                    uploaded = True
+
+            if accepted:
+                logger.success("Видео соответствует требованиям по длительности")
+                await progress.finish("✅ Видео готово" + await save_trace(run_trace))
+                break
+
+            await save_trace(run_trace)
             try:
-                # Отправка видео
-                await bot.send_video(
-                    chat_id=user_id,
-                    video=FSInputFile(video_path),
-                    caption="🎥 Видео сгенерировано!"
-                )
-                
-                # Отправка фотографий (раскомментировать при необходимости)
-                # await send_photos_group(bot, user_id, photos_paths)
-                
-                if 0.5 < duration_minutes < 1:
-                    logger.success("Видео соответствует требованиям по длительности")
-                    break
-                
                 await bot.send_message(
                     chat_id=user_id,
                     text="⚠️ Длина видео не соответствует требованиям. Повторяю генерацию..."
                 )
-                
             except Exception as send_exc:
                 logger.error("Ошибка отправки контента: {}", send_exc)
-                continue
 
     except Exception as gen_exc:
+        await progress.finish("❌ Ошибка генерации" + await save_trace(run_trace))
+
         # Логируем исключение с полным трейсбэком
         logger.opt(exception=True).critical(
             "Критическая ошибка генерации (user_id={})",
@@ -176,23 +240,10 @@ async def send_scheduled_message(bot: Bot, user_id: int, upload: bool = True) ->
             chat_id=user_id,
             text=error_message
         )
-                
-    if upload and video_path:
-        dp = dp_instance
-        storage_key = StorageKey(
-            bot_id=bot.id,
-            chat_id=user_id,
-            user_id=user_id
-        )
-        state = FSMContext(storage=dp.storage, key=storage_key)
-        await upload_video_wrapper(
-            bot=bot,
-            user_id=user_id,
-            state=state,
-            video_path=video_path,
-            title=title,
-            description=description
-        )
+
+    # После ошибки загружается видео предыдущей попытки, как и раньше
+    if upload and video_path and not uploaded:
+        await upload_to_youtube(bot, user_id, video_path, title, description)
 
 def setup_scheduler(scheduler: AsyncIOScheduler, bot: Bot, user_id: int) -> Job:
     """Настраивает и добавляет задание в планировщик.
@@ -205,6 +256,15 @@ def setup_scheduler(scheduler: AsyncIOScheduler, bot: Bot, user_id: int) -> Job:
     Returns:
         Созданное задание планировщика
     """
+    # Промпты для запланированных видео готовятся заранее в фоне,
+    # разовое задание без триггера выполняется в пуле потоков планировщика
+    scheduler.add_job(
+        run_stage,
+        args=["start_prompt_pool"],
+        id="prompt_pool_warmup",
+        replace_existing=True
+    )
+
     return scheduler.add_job(
         send_scheduled_message,
         trigger=CronTrigger(
@@ -0,0 +1,352 @@
+"""
+Модуль потоковой выгрузки таблиц базы данных
+
+Содержит:
+- Чтение таблиц пачками через серверный курсор (stream + yield_per)
+- Запись в файл в отдельном потоке с ограниченной очередью пачек
+- Запись CSV по мере чтения прямо в ZIP-архив
+- Колоночную выгрузку в Parquet или Arrow IPC (zstd) с типизированными
+  колонками и JSON, развернутым в struct (нужен pyarrow)
+
+Память не зависит от размера таблиц: одновременно в ней находится
+не больше QUEUE_DEPTH пачек по batch_size строк.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import queue
+import shutil
+import zipfile
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from sqlalchemy import JSON, Boolean, Date, DateTime, Float, Integer, Numeric, Table, select, text
+
+from bot.models import Base
+from database.db import engine
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+EXPORT_BATCH_SIZE = 2000
+QUEUE_DEPTH = 4
+
+_END = object()
+
+
+def export_tables_list() -> List[Table]:
+    """Возвращает таблицы для выгрузки в порядке зависимостей."""
+    return list(Base.metadata.sorted_tables)
+
+
+async def iter_batches(table: Table, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[Sequence[Any]]:
+    """Читает таблицу пачками через серверный курсор."""
+    async with engine.connect() as conn:
+        result = await conn.stream(
+            select(table).execution_options(yield_per=batch_size)
+        )
+        async for partition in result.partitions():
+            yield partition
+
+
+class TableWriter:
+    """Базовый класс записи выгрузки.
+
+    prepare() вызывается в цикле событий перед выгрузкой таблицы и может
+    обращаться к базе. Остальные методы вызываются из потока записи.
+    """
+
+    async def prepare(self, table: Table) -> None:
+        pass
+
+    def open_table(self, table: Table) -> None:
+        raise NotImplementedError
+
+    def write(self, rows: Sequence[Any]) -> None:
+        raise NotImplementedError
+
+    def close_table(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+class CsvZipWriter(TableWriter):
+    """Записывает каждую таблицу в CSV внутри ZIP-архива (ZIP_DEFLATED).
+
+    Args:
+        path: Путь к создаваемому архиву
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._zip = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+        self._member: Optional[io.TextIOWrapper] = None
+        self._csv = None
+
+    def open_table(self, table: Table) -> None:
+        raw = self._zip.open(f"{table.name}.csv", "w", force_zip64=True)
+        self._member = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+        self._csv = csv.writer(self._member)
+        self._csv.writerow([column.name for column in table.columns])
+
+    def write(self, rows: Sequence[Any]) -> None:
+        self._csv.writerows([_csv_value(value) for value in row] for row in rows)
+
+    def close_table(self) -> None:
+        if self._member is not None:
+            self._member.close()
+            self._member = None
+
+    def close(self) -> None:
+        self.close_table()
+        self._zip.close()
+
+
+def _json_struct_query(table: Table, column: str):
+    """Запрос ключей JSON-колонки с их типами (jsonb_typeof) и признаком целых чисел."""
+    return text(
+        f"""
+        SELECT item.key,
+               jsonb_typeof(item.value) AS kind,
+               bool_and(item.value::text ~ '^-?[0-9]+$') AS integral
+        FROM "{table.name}" AS t,
+             jsonb_each(CASE WHEN jsonb_typeof(t."{column}"::jsonb) = 'object'
+                             THEN t."{column}"::jsonb END) AS item
+        GROUP BY item.key, kind
+        ORDER BY item.key
+        """
+    )
+
+
+def _struct_field_type(kinds: List[Tuple[str, bool]]):
+    """Тип поля struct по типам значений ключа в JSON."""
+    kinds = [(kind, integral) for kind, integral in kinds if kind != "null"]
+    if len(kinds) != 1:
+        return pa.string()
+    kind, integral = kinds[0]
+    if kind == "number":
+        return pa.int64() if integral else pa.float64()
+    if kind == "boolean":
+        return pa.bool_()
+    return pa.string()
+
+
+def _arrow_type(column):
+    column_type = column.type
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    if isinstance(column_type, (Float, Numeric)):
+        return pa.float64()
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC" if column_type.timezone else None)
+    if isinstance(column_type, Date):
+        return pa.date32()
+    return pa.string()
+
+
+def _struct_value(value: Any, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    if not isinstance(value, dict):
+        return None
+    result = {}
+    for key, field_type in fields.items():
+        item = value.get(key)
+        if item is not None and field_type == pa.string() and not isinstance(item, str):
+            item = json.dumps(item, ensure_ascii=False, default=str)
+        result[key] = item
+    return result
+
+
+class ColumnarZipWriter(TableWriter):
+    """Записывает каждую таблицу в Parquet или Arrow IPC и собирает файлы в ZIP.
+
+    Колонки типизируются по схеме SQLAlchemy. JSON-объекты разворачиваются
+    в struct: набор ключей и их типы берутся из базы перед выгрузкой.
+    Файлы сжимаются zstd, поэтому в архив кладутся без повторного сжатия.
+
+    Args:
+        path: Путь к создаваемому архиву
+        fmt: "parquet" или "arrow"
+        compression: Кодек сжатия колонок
+    """
+
+    EXTENSIONS = {"parquet": "parquet", "arrow": "arrow"}
+
+    def __init__(self, path: Path, fmt: str = "parquet", compression: str = "zstd"):
+        if not HAS_PYARROW:
+            raise RuntimeError("Для колоночной выгрузки нужен pyarrow")
+        if fmt not in self.EXTENSIONS:
+            raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+        self.path = Path(path)
+        self.fmt = fmt
+        self.compression = compression
+        self._parts = self.path.with_name(f"{self.path.stem}_parts")
+        self._parts.mkdir(parents=True, exist_ok=True)
+        self._files: List[Path] = []
+        self._structs: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._schema = None
+        self._writer = None
+
+    async def prepare(self, table: Table) -> None:
+        structs: Dict[str, Dict[str, Any]] = {}
+        async with engine.connect() as conn:
+            for column in table.columns:
+                if not isinstance(column.type, JSON):
+                    continue
+                keys: Dict[str, List[Tuple[str, bool]]] = {}
+                for key, kind, integral in await conn.execute(_json_struct_query(table, column.name)):
+                    keys.setdefault(key, []).append((kind, bool(integral)))
+                structs[column.name] = {key: _struct_field_type(kinds) for key, kinds in keys.items()}
+        self._structs[table.name] = structs
+
+    def _table_schema(self, table: Table):
+        structs = self._structs.get(table.name, {})
+        fields = []
+        for column in table.columns:
+            if column.name in structs and structs[column.name]:
+                field_type = pa.struct([(key, t) for key, t in structs[column.name].items()])
+            else:
+                field_type = _arrow_type(column)
+            fields.append(pa.field(column.name, field_type, nullable=True))
+        return pa.schema(fields)
+
+    def open_table(self, table: Table) -> None:
+        self._schema = self._table_schema(table)
+        file_path = self._parts / f"{table.name}.{self.EXTENSIONS[self.fmt]}"
+        if self.fmt == "parquet":
+            self._writer = pq.ParquetWriter(file_path, self._schema, compression=self.compression)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = pa.ipc.new_file(str(file_path), self._schema, options=options)
+        self._files.append(file_path)
+
+    def write(self, rows: Sequence[Any]) -> None:
+        arrays = []
+        for index, field in enumerate(self._schema):
+            values = [row[index] for row in rows]
+            if pa.types.is_struct(field.type):
+                fields = {child.name: child.type for child in field.type}
+                values = [_struct_value(value, fields) for value in values]
+            elif pa.types.is_string(field.type):
+                values = [
+                    value if value is None or isinstance(value, str)
+                    else json.dumps(value, ensure_ascii=False, default=str) if isinstance(value, (dict, list))
+                    else str(value)
+                    for value in values
+                ]
+            arrays.append(pa.array(values, type=field.type))
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self._schema))
+
+    def close_table(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def close(self) -> None:
+        self.close_table()
+        try:
+            with zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_STORED) as zipf:
+                for file_path in self._files:
+                    zipf.write(file_path, arcname=file_path.name)
+        finally:
+            shutil.rmtree(self._parts, ignore_errors=True)
+
+
+def _consume(feed: queue.Queue, writer: TableWriter) -> None:
+    """Поток записи: забирает пачки из очереди и передает их writer."""
+    error: Optional[BaseException] = None
+    while True:
+        item = feed.get()
+        if item is _END:
+            break
+        if error is not None:
+            # После ошибки очередь только опустошается, чтобы не заблокировать чтение
+            continue
+        kind, payload = item
+        try:
+            if kind == "open":
+                writer.close_table()
+                writer.open_table(payload)
+            else:
+                writer.write(payload)
+        except BaseException as exc:
+            error = exc
+
+    try:
+        writer.close()
+    except BaseException as exc:
+        error = error or exc
+    if error is not None:
+        raise error
+
+
+async def export_tables(
+    writer: TableWriter,
+    tables: Optional[Iterable[Table]] = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Dict[str, int]:
+    """Выгружает таблицы через writer, читая и записывая параллельно.
+
+    Args:
+        writer: Получатель пачек строк
+        tables: Таблицы для выгрузки (по умолчанию все)
+        batch_size: Размер пачки строк
+
+    Returns:
+        Dict[str, int]: Количество выгруженных строк по таблицам
+    """
+    feed: queue.Queue = queue.Queue(maxsize=QUEUE_DEPTH)
+    consumer = asyncio.ensure_future(asyncio.to_thread(_consume, feed, writer))
+    counts: Dict[str, int] = {}
+
+    async def put(item: Any) -> None:
+        while True:
+            try:
+                feed.put_nowait(item)
+                return
+            except queue.Full:
+                if consumer.done():
+                    return
+                await asyncio.sleep(0.01)
+
+    try:
+        for table in tables if tables is not None else export_tables_list():
+            if consumer.done():
+                break
+            await writer.prepare(table)
+            await put(("open", table))
+            counts[table.name] = 0
+            async for rows in iter_batches(table, batch_size):
+                if consumer.done():
+                    # Поток записи завершился с ошибкой, дальше читать незачем
+                    break
+                await put(("rows", rows))
+                counts[table.name] += len(rows)
+            logger.debug("Таблица {} выгружена: {} строк", table.name, counts[table.name])
+    finally:
+        await put(_END)
+        await consumer
+
+    return counts
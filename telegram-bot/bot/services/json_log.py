@@ -0,0 +1,164 @@
+"""
+Модуль структурированных JSON-логов
+
+Содержит:
+- Sink loguru, пишущий компактные JSON-строки в почасовые сегменты
+- Сводку по каждому сегменту: количество строк по уровням, первое и последнее время
+- Чтение сводок за период без разбора самих строк
+"""
+
+import json
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import IO, Any, Dict, List, Optional
+
+SEGMENT_FORMAT = "%Y-%m-%d_%H"
+SUMMARY_FLUSH_INTERVAL = 5.0
+RETENTION_DAYS = 14
+
+
+class JsonSegmentSink:
+    """Sink loguru для JSON-логов с почасовыми сегментами.
+
+    Каждая запись - одна строка logs/json/<YYYY-MM-DD_HH>.jsonl с полями
+    ts, level, module, function, message, user_id, job_id. Рядом лежит
+    <YYYY-MM-DD_HH>.summary.json со счетчиками уровней. Сводка текущего
+    сегмента записывается фоновым потоком раз в SUMMARY_FLUSH_INTERVAL
+    секунд, если появились новые записи, и при остановке sink.
+
+    Sink рассчитан на logger.add(..., enqueue=True): запись выполняется
+    в фоновом потоке loguru и не блокирует вызывающий код. Метода flush()
+    нет намеренно, иначе loguru сбрасывал бы буфер после каждой строки.
+
+    Args:
+        directory: Каталог сегментов
+        retention_days: Сколько дней хранить сегменты
+    """
+
+    def __init__(self, directory: Path = Path("logs/json"), retention_days: int = RETENTION_DAYS):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.retention_days = retention_days
+        self._segment: Optional[str] = None
+        self._file: Optional[IO[str]] = None
+        self._summary: Dict[str, Any] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="json-log-summary", daemon=True)
+        self._flusher.start()
+
+    def write(self, message: Any) -> None:
+        with self._lock:
+            self._write(message.record)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        moment = record["time"]
+        segment = moment.strftime(SEGMENT_FORMAT)
+        if segment != self._segment:
+            self._open(segment)
+
+        extra = record["extra"]
+        entry = {
+            "ts": moment.isoformat(timespec="milliseconds"),
+            "level": record["level"].name,
+            "module": record["name"],
+            "function": record["function"],
+            "message": record["message"],
+            "user_id": extra.get("user_id"),
+            "job_id": extra.get("job_id"),
+        }
+        if record["exception"] is not None and record["exception"].type is not None:
+            entry["exception"] = record["exception"].type.__name__
+        self._file.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":"), default=str) + "\n")
+
+        levels = self._summary["levels"]
+        levels[entry["level"]] = levels.get(entry["level"], 0) + 1
+        self._summary["lines"] += 1
+        self._summary["first_ts"] = self._summary["first_ts"] or entry["ts"]
+        self._summary["last_ts"] = entry["ts"]
+        self._dirty = True
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._flusher.join()
+        with self._lock:
+            self._close()
+
+    def _flush_loop(self) -> None:
+        # Сводка не должна ждать следующей записи: после всплеска лог может надолго затихнуть
+        while not self._stopped.wait(SUMMARY_FLUSH_INTERVAL):
+            with self._lock:
+                if self._dirty and self._file is not None:
+                    self._write_summary()
+
+    def _open(self, segment: str) -> None:
+        self._close()
+        self._segment = segment
+        self._file = (self.directory / f"{segment}.jsonl").open("a", encoding="utf-8")
+        # После перезапуска в тот же час продолжаем существующую сводку
+        self._summary = read_summary(self.directory / f"{segment}.summary.json") or {
+            "segment": segment, "levels": {}, "lines": 0, "first_ts": None, "last_ts": None
+        }
+        self._cleanup()
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._write_summary()
+            self._file.close()
+            self._file = None
+
+    def _write_summary(self) -> None:
+        self._file.flush()
+        path = self.directory / f"{self._segment}.summary.json"
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(json.dumps(self._summary, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(path)
+        self._dirty = False
+
+    def _cleanup(self) -> None:
+        oldest = (datetime.now() - timedelta(days=self.retention_days)).strftime(SEGMENT_FORMAT)
+        for path in self.directory.glob("*.jsonl"):
+            if path.stem < oldest:
+                path.unlink(missing_ok=True)
+                path.with_name(f"{path.stem}.summary.json").unlink(missing_ok=True)
+
+
+def read_summary(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def load_summaries(directory: Path = Path("logs/json"), since: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """Возвращает сводки сегментов начиная с часа since, от старых к новым."""
+    since_segment = since.strftime(SEGMENT_FORMAT) if since else ""
+    summaries = []
+    for path in sorted(Path(directory).glob("*.summary.json")):
+        if path.name.split(".")[0] < since_segment:
+            continue
+        summary = read_summary(path)
+        if summary is not None:
+            summaries.append(summary)
+    return summaries
+
+
+def level_counts(directory: Path = Path("logs/json"), since: Optional[datetime] = None) -> Dict[str, int]:
+    """Суммирует счетчики уровней из сводок сегментов за период."""
+    totals: Dict[str, int] = {}
+    for levels in hourly_level_counts(directory, since).values():
+        for level, count in levels.items():
+            totals[level] = totals.get(level, 0) + count
+    return totals
+
+
+def hourly_level_counts(
+    directory: Path = Path("logs/json"), since: Optional[datetime] = None
+) -> Dict[datetime, Dict[str, int]]:
+    """Счетчики уровней по часам (начало часа -> уровни) из сводок сегментов за период."""
+    return {
+        datetime.strptime(summary["segment"], SEGMENT_FORMAT): summary["levels"]
+        for summary in load_summaries(directory, since)
+    }
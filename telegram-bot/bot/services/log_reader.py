@@ -0,0 +1,251 @@
+"""
+Модуль чтения текстовых логов бота
+
+Содержит:
+- Чтение последних строк лога с конца файла блоками
+- Индекс-спутник с байтовыми смещениями и счетчиками уровней по часам
+- Инкрементальное обновление индекса: читаются только новые строки
+- Учет ротированных архивов bot.*.log.zip (индексируются один раз)
+"""
+
+import json
+import os
+import zipfile
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+from loguru import logger
+
+TAIL_CHUNK_SIZE = 64 * 1024
+MAX_ERROR_LINES = 20
+MAX_ERROR_LINE_LENGTH = 1000
+ERROR_LEVELS = {"ERROR", "CRITICAL"}
+INDEX_VERSION = 1
+
+
+def _hour_key(moment: datetime) -> str:
+    return moment.strftime("%Y-%m-%d %H")
+
+
+def _parse_prefix(line: bytes) -> Optional[tuple]:
+    """Возвращает (час, уровень) для строки формата "YYYY-MM-DD HH:MM:SS | LEVEL | ..."."""
+    if len(line) < 30 or line[19:22] != b" | " or line[4:5] != b"-":
+        return None
+    try:
+        return line[:13].decode("ascii"), line[22:30].decode("ascii").strip()
+    except UnicodeDecodeError:
+        return None
+
+
+class _IndexBuilder:
+    """Накопитель индекса при последовательном чтении строк."""
+
+    def __init__(self, index: Dict[str, Any]):
+        self.index = index
+        self.errors = deque(index["errors"], maxlen=MAX_ERROR_LINES)
+
+    def feed(self, line: bytes, offset: int) -> None:
+        parsed = _parse_prefix(line)
+        if parsed is None:
+            return
+        hour, level = parsed
+        hours = self.index["hours"]
+        if hour not in hours:
+            hours[hour] = {"offset": offset, "levels": {}}
+        levels = hours[hour]["levels"]
+        levels[level] = levels.get(level, 0) + 1
+        if level in ERROR_LEVELS:
+            self.errors.append(line[:MAX_ERROR_LINE_LENGTH].decode("utf-8", "replace").rstrip("\n"))
+
+    def result(self) -> Dict[str, Any]:
+        self.index["errors"] = list(self.errors)
+        return self.index
+
+
+class LogReader:
+    """Быстрые запросы к файлу логов и его архивам.
+
+    Рядом с логом хранится индекс <лог>.idx.json: для каждого часа байтовое
+    смещение первой строки и количество строк по уровням, а также последние
+    ошибки. При каждом запросе дочитываются только строки, добавленные после
+    прошлого обновления индекса.
+
+    Args:
+        path: Путь к текущему файлу лога
+    """
+
+    def __init__(self, path: Path = Path("logs/bot.log")):
+        self.path = Path(path)
+        self.index_path = self.path.with_name(self.path.name + ".idx.json")
+
+    # --- Хвост файла ---
+
+    def tail(self, lines: int = 1000) -> List[str]:
+        """Возвращает последние строки лога, читая файл с конца."""
+        with self.path.open("rb") as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            chunks: List[bytes] = []
+            newlines = 0
+            while position > 0 and newlines <= lines:
+                size = min(TAIL_CHUNK_SIZE, position)
+                position -= size
+                f.seek(position)
+                chunk = f.read(size)
+                chunks.append(chunk)
+                newlines += chunk.count(b"\n")
+
+        data = b"".join(reversed(chunks))
+        return [line.decode("utf-8", "replace") for line in data.splitlines(keepends=True)[-lines:]]
+
+    # --- Индекс ---
+
+    @staticmethod
+    def _empty_index(**extra: Any) -> Dict[str, Any]:
+        return {"version": INDEX_VERSION, "size": 0, "hours": {}, "errors": [], **extra}
+
+    def _load_index(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with path.open(encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return index if index.get("version") == INDEX_VERSION else None
+
+    @staticmethod
+    def _save_index(path: Path, index: Dict[str, Any]) -> None:
+        # У каждого писателя свой временный файл: индекс обновляют параллельные запросы
+        tmp_path: Optional[Path] = None
+        try:
+            with NamedTemporaryFile(
+                "w", encoding="utf-8", dir=path.parent, prefix=path.name + ".", suffix=".tmp", delete=False
+            ) as f:
+                tmp_path = Path(f.name)
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+            raise
+
+    @staticmethod
+    def _scan(f: IO[bytes], builder: _IndexBuilder, offset: int) -> int:
+        """Читает полные строки с текущей позиции, возвращает смещение после последней."""
+        for line in f:
+            if not line.endswith(b"\n"):
+                # Строка еще дописывается, вернемся к ней в следующий раз
+                break
+            builder.feed(line, offset)
+            offset += len(line)
+        return offset
+
+    def refresh(self) -> Dict[str, Any]:
+        """Дочитывает новые строки текущего лога в индекс и возвращает его."""
+        stat = self.path.stat()
+        index = self._load_index(self.index_path)
+        if index is None or index.get("inode") != stat.st_ino or index["size"] > stat.st_size:
+            # Первый запуск или лог ротирован: индекс строится заново
+            index = self._empty_index(inode=stat.st_ino)
+
+        if index["size"] < stat.st_size:
+            builder = _IndexBuilder(index)
+            with self.path.open("rb") as f:
+                f.seek(index["size"])
+                index["size"] = self._scan(f, builder, index["size"])
+            index = builder.result()
+            try:
+                self._save_index(self.index_path, index)
+            except OSError as exc:
+                logger.warning("Не удалось сохранить индекс логов: {}", exc)
+        return index
+
+    def archives(self) -> List[Path]:
+        """Ротированные архивы лога, от старых к новым."""
+        pattern = f"{self.path.stem}.*{self.path.suffix}.zip"
+        return sorted(self.path.parent.glob(pattern), key=lambda p: p.stat().st_mtime)
+
+    def _archive_index(self, archive: Path) -> Dict[str, Any]:
+        """Индекс архива строится один раз: архивы не меняются."""
+        index_path = archive.with_name(archive.name + ".idx.json")
+        index = self._load_index(index_path)
+        if index is not None:
+            return index
+
+        builder = _IndexBuilder(self._empty_index())
+        with zipfile.ZipFile(archive) as zipf:
+            for name in zipf.namelist():
+                with zipf.open(name) as f:
+                    self._scan(f, builder, 0)
+        index = builder.result()
+        # Смещения внутри сжатого файла бесполезны для seek
+        for hour in index["hours"].values():
+            hour["offset"] = None
+        try:
+            self._save_index(index_path, index)
+        except OSError as exc:
+            logger.warning("Не удалось сохранить индекс архива {}: {}", archive.name, exc)
+        return index
+
+    def _indexes(self, since: Optional[datetime]) -> List[Dict[str, Any]]:
+        """Индексы архивов, пересекающихся с окном, и текущего лога (от старых к новым)."""
+        since_hour = _hour_key(since) if since else ""
+        indexes = []
+        for archive in self.archives():
+            if since and datetime.fromtimestamp(archive.stat().st_mtime) < since:
+                continue
+            indexes.append(self._archive_index(archive))
+        if self.path.exists():
+            indexes.append(self.refresh())
+        return [index for index in indexes if any(hour >= since_hour for hour in index["hours"])]
+
+    # --- Запросы ---
+
+    def stats(self, since: Optional[datetime] = None) -> Dict[str, int]:
+        """Количество строк по уровням начиная с часа since."""
+        totals: Dict[str, int] = {}
+        for levels in self.hourly_stats(since).values():
+            for level, count in levels.items():
+                totals[level] = totals.get(level, 0) + count
+        return totals
+
+    def hourly_stats(self, since: Optional[datetime] = None) -> Dict[datetime, Dict[str, int]]:
+        """Количество строк по уровням для каждого часа (начало часа -> уровни) начиная с since."""
+        since_hour = _hour_key(since) if since else ""
+        hours: Dict[datetime, Dict[str, int]] = {}
+        for index in self._indexes(since):
+            for hour, data in index["hours"].items():
+                if hour < since_hour:
+                    continue
+                # Час может встречаться и в архиве, и в текущем логе
+                levels = hours.setdefault(datetime.strptime(hour, "%Y-%m-%d %H"), {})
+                for level, count in data["levels"].items():
+                    levels[level] = levels.get(level, 0) + count
+        return hours
+
+    def recent_errors(self, limit: int = 5, since: Optional[datetime] = None) -> List[str]:
+        """Последние строки уровня ERROR и CRITICAL."""
+        since_hour = _hour_key(since) if since else ""
+        errors: List[str] = []
+        for index in self._indexes(since):
+            errors.extend(line for line in index["errors"] if line[:13] >= since_hour)
+        return errors[-limit:]
+
+    def read_window(self, since: datetime, until: Optional[datetime] = None) -> Iterator[str]:
+        """Строки текущего лога за окно времени; чтение начинается со смещения нужного часа."""
+        index = self.refresh()
+        since_hour = _hour_key(since)
+        until_hour = _hour_key(until) if until else None
+        hours = sorted(hour for hour in index["hours"] if hour >= since_hour)
+        if not hours:
+            return
+
+        with self.path.open("rb") as f:
+            f.seek(index["hours"][hours[0]]["offset"])
+            for line in f:
+                parsed = _parse_prefix(line)
+                if until_hour and parsed and parsed[0] > until_hour:
+                    break
+                yield line.decode("utf-8", "replace")
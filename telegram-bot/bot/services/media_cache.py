@@ -0,0 +1,244 @@
+"""
+Модуль кэша file_id для повторно отправляемых файлов
+
+Содержит:
+- Хеширование локальных файлов с запоминанием по пути, размеру и mtime
+- Хранение file_id, полученных от Telegram, в таблице media_files
+- Middleware сессии aiogram, заменяющее FSInputFile на сохраненный file_id
+"""
+
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import (
+    Response, SendAnimation, SendAudio, SendDocument, SendMediaGroup, SendPhoto,
+    SendVideo, SendVideoNote, SendVoice, TelegramMethod
+)
+from aiogram.methods.base import TelegramType
+from aiogram.types import FSInputFile
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from bot.models import MediaFile
+from bot.services.metrics import UPLOAD_BYTES, UPLOAD_DURATION
+from database.db import async_session
+
+# Метод отправки -> поле с файлом (оно же тип медиа в ответе)
+MEDIA_FIELDS = {
+    SendPhoto: "photo",
+    SendAudio: "audio",
+    SendVideo: "video",
+    SendDocument: "document",
+    SendVoice: "voice",
+    SendAnimation: "animation",
+    SendVideoNote: "video_note",
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+MEMO_SIZE = 1024      # Сколько хешей и file_id держать в памяти
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remember(memo: "OrderedDict[Any, str]", key: Any, value: str) -> None:
+    """Запоминает значение в LRU-словаре, вытесняя самые старые записи сверх MEMO_SIZE."""
+    memo[key] = value
+    memo.move_to_end(key)
+    while len(memo) > MEMO_SIZE:
+        memo.popitem(last=False)
+
+
+def _file_id_from_message(message: Any, kind: str) -> Optional[str]:
+    media = getattr(message, kind, None)
+    if kind == "photo" and media:
+        # Telegram возвращает несколько размеров, последний - оригинал
+        media = media[-1]
+    return getattr(media, "file_id", None)
+
+
+class MediaCache(BaseRequestMiddleware):
+    """Middleware сессии бота, повторно использующее загруженные файлы.
+
+    Перед отправкой FSInputFile ищет file_id по SHA-256 содержимого и типу
+    медиа и, если он есть, отправляет file_id вместо файла. После загрузки
+    сохраняет file_id из ответа. Если Telegram отклоняет file_id, запись
+    удаляется, и файл загружается заново.
+    """
+
+    def __init__(self):
+        self._hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._file_ids: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+        self.hits = 0
+        self.saved_bytes = 0
+
+    async def _content_hash(self, path: str) -> Optional[Tuple[str, int]]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        content_hash = self._hashes.get(key)
+        if content_hash is None:
+            content_hash = await asyncio.to_thread(_hash_file, path)
+        _remember(self._hashes, key, content_hash)
+        return content_hash, stat.st_size
+
+    async def _lookup(self, content_hash: str, kind: str) -> Optional[str]:
+        key = (content_hash, kind)
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            async with async_session() as session:
+                file_id = await session.scalar(
+                    select(MediaFile.file_id).where(
+                        MediaFile.content_hash == content_hash,
+                        MediaFile.kind == kind
+                    )
+                )
+            if file_id is None:
+                return None
+        _remember(self._file_ids, key, file_id)
+        return file_id
+
+    async def _store(self, content_hash: str, kind: str, file_id: str, path: str, size: int) -> None:
+        _remember(self._file_ids, (content_hash, kind), file_id)
+        statement = insert(MediaFile).values(
+            content_hash=content_hash, kind=kind, file_id=file_id, path=path, size=size
+        )
+        async with async_session.begin() as session:
+            await session.execute(
+                statement.on_conflict_do_update(
+                    constraint="uq_media_files_hash_kind",
+                    set_={"file_id": statement.excluded.file_id, "path": statement.excluded.path}
+                )
+            )
+
+    async def _forget(self, content_hash: str, kind: str) -> None:
+        self._file_ids.pop((content_hash, kind), None)
+        async with async_session.begin() as session:
+            await session.execute(
+                MediaFile.__table__.delete().where(
+                    MediaFile.content_hash == content_hash,
+                    MediaFile.kind == kind
+                )
+            )
+
+    async def _prepare(self, kind: str, media: Any) -> Tuple[Any, Optional[Tuple[str, int, str]]]:
+        """Возвращает (что отправлять, (хеш, размер, путь) для сохранения или None)."""
+        if not isinstance(media, FSInputFile):
+            return media, None
+
+        hashed = await self._content_hash(str(media.path))
+        if hashed is None:
+            return media, None
+        content_hash, size = hashed
+
+        try:
+            file_id = await self._lookup(content_hash, kind)
+        except Exception as exc:
+            logger.warning("Media cache lookup failed: {}", exc)
+            file_id = None
+
+        if file_id is None:
+            return media, (content_hash, size, str(media.path))
+
+        self.hits += 1
+        self.saved_bytes += size
+        logger.debug("Reusing file_id for {} ({} bytes not uploaded)", media.path, size)
+        return file_id, (content_hash, size, str(media.path))
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        if isinstance(method, SendMediaGroup):
+            return await self._send_media_group(make_request, bot, method)
+
+        kind = MEDIA_FIELDS.get(type(method))
+        if kind is None:
+            return await make_request(bot, method)
+
+        original = getattr(method, kind)
+        media, source = await self._prepare(kind, original)
+        if source is None:
+            return await make_request(bot, method)
+
+        cached = media is not original
+        try:
+            if cached:
+                response = await make_request(bot, method.model_copy(update={kind: media}))
+            else:
+                response = await self._upload(make_request, bot, method, source[1])
+        except TelegramBadRequest as exc:
+            if not cached:
+                raise
+            logger.warning("Cached file_id for {} rejected ({}), uploading again", source[2], exc)
+            await self._forget(source[0], kind)
+            response = await self._upload(make_request, bot, method, source[1])
+            cached = False
+
+        if not cached:
+            await self._remember(response.result, kind, source)
+        return response
+
+    @staticmethod
+    async def _upload(make_request, bot, method, size: int):
+        """Отправляет запрос с загрузкой файла и учитывает его в метриках."""
+        with UPLOAD_DURATION.time(target="telegram"):
+            response = await make_request(bot, method)
+        UPLOAD_BYTES.inc(size, target="telegram")
+        return response
+
+    async def _send_media_group(self, make_request, bot, method: SendMediaGroup):
+        prepared: List[Any] = []
+        sources = []
+        for item in method.media:
+            kind = item.type
+            media, source = await self._prepare(kind, item.media)
+            prepared.append(item.model_copy(update={"media": media}) if media is not item.media else item)
+            sources.append((kind, source, media is not item.media))
+
+        if not any(source for _, source, _ in sources):
+            return await make_request(bot, method)
+
+        try:
+            uploaded = sum(source[1] for _, source, cached in sources if source and not cached)
+            response = await self._upload(make_request, bot, method.model_copy(update={"media": prepared}), uploaded)
+        except TelegramBadRequest as exc:
+            if not any(cached for _, _, cached in sources):
+                raise
+            logger.warning("Cached file_id in media group rejected ({}), uploading again", exc)
+            for kind, source, cached in sources:
+                if cached:
+                    await self._forget(source[0], kind)
+            uploaded = sum(source[1] for _, source, _ in sources if source)
+            response = await self._upload(make_request, bot, method, uploaded)
+            sources = [(kind, source, False) for kind, source, _ in sources]
+
+        for message, (kind, source, cached) in zip(response.result or [], sources):
+            if source is not None and not cached:
+                await self._remember(message, kind, source)
+        return response
+
+    async def _remember(self, message: Any, kind: str, source: Tuple[str, int, str]) -> None:
+        file_id = _file_id_from_message(message, kind)
+        if file_id is None:
+            return
+        try:
+            await self._store(source[0], kind, file_id, source[2], source[1])
+        except Exception as exc:
+            logger.warning("Failed to store file_id for {}: {}", source[2], exc)
@@ -0,0 +1,43 @@
+"""
+Модуль метрик бота в формате Prometheus
+
+Содержит:
+- Метрики хендлеров, базы и очереди заданий
+- Реэкспорт примитивов и метрик пайплайна из videogeneration.metrics
+- Встроенный aiohttp-сервер, отдающий /metrics в текстовом формате Prometheus
+"""
+
+from aiohttp import web
+from loguru import logger
+
+from videogeneration.metrics import (CONTENT_TYPE, GIGACHAT_DURATION, SD_REQUEST_DURATION, STAGE_DURATION,
+                                     TTS_DURATION, UPLOAD_BYTES, UPLOAD_DURATION, Counter, Gauge, Histogram,
+                                     add_collector, render_metrics)
+
+
+async def _metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(body=(await render_metrics()).encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+async def start_metrics_server(port: int, host: str = "0.0.0.0") -> web.AppRunner:
+    """Запускает HTTP-сервер с /metrics в текущем цикле событий."""
+    app = web.Application()
+    app.router.add_get("/metrics", _metrics_handler)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Сервер метрик запущен на {}:{}/metrics", host, port)
+    return runner
+
+
+# --- Метрики бота ---
+
+HANDLER_DURATION = Histogram(
+    "bot_handler_duration_seconds", "Время обработки апдейта хендлером", ["router", "event", "status"]
+)
+DB_QUERY_DURATION = Histogram(
+    "bot_db_query_duration_seconds", "Время запросов к базе", ["query", "status"]
+)
+DB_FLUSHED_ROWS = Counter("bot_db_flushed_rows_total", "Строки, записанные буфером отложенной записи")
+DB_BUFFERED_ROWS = Gauge("bot_db_buffered_rows", "Строки в буфере отложенной записи")
+QUEUE_JOBS = Gauge("generation_jobs", "Задания генерации по статусам", ["status"])
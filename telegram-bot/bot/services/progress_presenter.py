@@ -0,0 +1,199 @@
+"""
+Модуль отображения прогресса заданий в Telegram
+
+Содержит:
+- Одно сообщение статуса на задание, которое редактируется на месте
+- Объединение частых обновлений и адаптивный интервал редактирования
+- Ограничение числа запросов к Telegram API на одно задание
+- Обработку retry_after и ошибки "message is not modified"
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from loguru import logger
+
+STAGE_TITLES = {
+    "queued": "В очереди",
+    "prompt": "Подбор промпта",
+    "photo": "Первый кадр",
+    "txt2img": "Генерация изображений",
+    "sequential_variations": "Цепочка img2img",
+    "first_page": "Обложка",
+    "audio": "Озвучка",
+    "compile_video": "Сборка видео",
+    "subtitles": "Субтитры",
+    "upload": "Загрузка",
+}
+
+BAR_WIDTH = 12
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(max(0, seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+class ProgressPresenter:
+    """Сообщение о прогрессе задания, обновляемое редактированием.
+
+    update() можно вызывать сколь угодно часто и из любого потока:
+    изменения накапливаются, а сообщение редактируется не чаще, чем
+    позволяет интервал. Интервал подбирается так, чтобы оставшегося
+    бюджета правок хватило до конца задания по ETA.
+
+    Args:
+        bot: Экземпляр Telegram бота
+        chat_id: Чат для сообщения о прогрессе
+        title: Заголовок сообщения
+        max_edits: Максимум правок сообщения за все задание (включая финальную)
+        min_interval: Минимальная пауза между правками (секунды)
+        max_interval: Максимальная пауза между правками (секунды)
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        title: str,
+        max_edits: int = 40,
+        min_interval: float = 3.0,
+        max_interval: float = 60.0
+    ):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.title = title
+        self.max_edits = max(1, max_edits)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+
+        self.message_id: Optional[int] = None
+        self.edits = 0
+        self.started = time.monotonic()
+
+        self._state: Dict[str, Any] = {"stage": "queued", "step": 0, "total": 0, "eta": 0.0, "note": ""}
+        self._state_lock = threading.Lock()
+        self._rendered = ""
+        self._dirty: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Отправляет сообщение о прогрессе и запускает фоновые правки."""
+        self._loop = asyncio.get_running_loop()
+        self._dirty = asyncio.Event()
+        self._rendered = self._render()
+        message = await self._call(self.bot.send_message, chat_id=self.chat_id, text=self._rendered)
+        if message is not None:
+            self.message_id = message.message_id
+        self._task = asyncio.create_task(self._edit_loop())
+
+    def update(self, stage: Optional[str] = None, step: Optional[int] = None,
+               total: Optional[int] = None, eta: Optional[float] = None, note: Optional[str] = None) -> None:
+        """Запоминает новое состояние задания (потокобезопасно)."""
+        with self._state_lock:
+            if stage is not None and stage != self._state["stage"]:
+                self._state.update(stage=stage, step=0, total=0, eta=0.0)
+            for key, value in (("step", step), ("total", total), ("eta", eta), ("note", note)):
+                if value is not None:
+                    self._state[key] = value
+
+        if self._loop is not None and self._dirty is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._dirty.set)
+            except RuntimeError:
+                pass
+
+    async def finish(self, text: Optional[str] = None) -> None:
+        """Останавливает правки и выводит итоговый текст."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        final = f"{self.title}\n{text}" if text else self._render()
+        if final != self._rendered:
+            await self._edit(final)
+
+    def _render(self) -> str:
+        with self._state_lock:
+            state = dict(self._state)
+
+        lines = [self.title, f"Этап: {STAGE_TITLES.get(state['stage'], state['stage'])}"]
+        if state["total"]:
+            ratio = min(1.0, state["step"] / state["total"])
+            filled = round(ratio * BAR_WIDTH)
+            lines.append(f"[{'█' * filled}{'░' * (BAR_WIDTH - filled)}] {state['step']}/{state['total']} ({ratio:.0%})")
+        if state["eta"]:
+            lines.append(f"Осталось: ~{format_eta(state['eta'])}")
+        if state["note"]:
+            lines.append(state["note"])
+        lines.append(f"Прошло: {format_eta(time.monotonic() - self.started)}")
+        return "\n".join(lines)
+
+    def _interval(self) -> float:
+        # Последняя правка резервируется для finish()
+        remaining = self.max_edits - 1 - self.edits
+        if remaining <= 0:
+            return float("inf")
+        with self._state_lock:
+            eta = self._state["eta"]
+        interval = eta / remaining if eta else self.min_interval * (1 + self.edits / 5)
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    async def _edit_loop(self) -> None:
+        last_edit = time.monotonic()
+        while True:
+            await self._dirty.wait()
+
+            interval = self._interval()
+            if interval == float("inf"):
+                logger.debug("Progress edit budget for chat {} exhausted", self.chat_id)
+                return
+            delay = last_edit + interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            # Все обновления за время ожидания попадают в одну правку
+            self._dirty.clear()
+            text = self._render()
+            if text != self._rendered:
+                await self._edit(text)
+            last_edit = time.monotonic()
+
+    async def _edit(self, text: str) -> None:
+        if self.message_id is None or self.edits >= self.max_edits:
+            return
+        self.edits += 1
+        await self._call(
+            self.bot.edit_message_text,
+            chat_id=self.chat_id,
+            message_id=self.message_id,
+            text=text
+        )
+        self._rendered = text
+
+    async def _call(self, method, **kwargs):
+        """Вызывает метод API, выдерживая паузу retry_after один раз."""
+        for attempt in range(2):
+            try:
+                return await method(**kwargs)
+            except TelegramRetryAfter as exc:
+                if attempt:
+                    break
+                logger.warning("Telegram flood control, waiting {}s", exc.retry_after)
+                await asyncio.sleep(exc.retry_after)
+            except TelegramBadRequest as exc:
+                if "message is not modified" not in str(exc):
+                    logger.warning("Failed to update progress message: {}", exc)
+                return None
+            except Exception as exc:
+                logger.warning("Failed to update progress message: {}", exc)
+                return None
+        return None
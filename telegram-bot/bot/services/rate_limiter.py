@@ -0,0 +1,164 @@
+"""
+Модуль ограничения частоты исходящих запросов к Telegram
+
+Содержит:
+- Глобальный и поканальный (по chat_id) token bucket
+- Подстройку скорости по TelegramRetryAfter (AIMD: рост на шаг, падение вдвое,
+  потолок - скорость, на которой Telegram ответил 429)
+- Middleware сессии aiogram, через которое проходят все вызовы Bot
+"""
+
+import asyncio
+import time
+from typing import Dict, Optional
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from loguru import logger
+
+LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+IDLE_BUCKET_TTL = 3600.0
+
+
+class TokenBucket:
+    """Token bucket с резервированием: токены могут уйти в минус,
+    тогда вызывающий ждет, пока его доля не восстановится.
+    Благодаря этому одновременные запросы выстраиваются без блокировок.
+
+    Args:
+        rate: Скорость пополнения (запросов в секунду)
+        burst: Емкость корзины
+        min_rate: Нижняя граница скорости
+        max_rate: Верхняя граница скорости (снижается после TelegramRetryAfter)
+        increase: Прибавка к скорости после успешного запроса
+    """
+
+    def __init__(self, rate: float, burst: float, min_rate: float, max_rate: float, increase: float):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float = 1.0) -> float:
+        """Резервирует токены и возвращает время ожидания в секундах."""
+        now = time.monotonic()
+        self._refill(now)
+        self.tokens -= cost
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def on_success(self) -> None:
+        self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_retry_after(self, retry_after: float) -> None:
+        now = time.monotonic()
+        self._refill(now)
+        # Скорость, на которой пришел 429, больше не набирается
+        self.max_rate = max(self.min_rate, min(self.max_rate, self.rate - self.increase))
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = min(self.tokens, 0.0)
+        self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def idle(self, now: float) -> bool:
+        return now - self.updated > IDLE_BUCKET_TTL
+
+
+class RateLimiter(BaseRequestMiddleware):
+    """Middleware сессии бота, ограничивающее частоту отправки сообщений.
+
+    Ограничиваются методы отправки и редактирования (send*, edit*, copy*,
+    forward*) с chat_id. Остальные запросы, включая getUpdates, проходят
+    без задержек. Скорость для чата начинается с chat_rate или group_rate
+    и растет после каждого успешного запроса. Лимиты Telegram заранее не
+    известны (медиагруппа, например, может считаться как несколько
+    сообщений), поэтому их определяет только TelegramRetryAfter: скорость
+    для чата снижается вдвое, потолок опускается ниже скорости, на которой
+    пришел отказ, чат блокируется на retry_after, и запрос повторяется.
+
+    Args:
+        global_rate: Глобальный лимит запросов в секунду
+        chat_rate: Начальная скорость для личного чата (запросов в секунду)
+        group_rate: Начальная скорость для группы или канала (запросов в секунду)
+        chat_burst: Сколько запросов в один чат можно отправить подряд
+        max_retries: Сколько раз повторять запрос после TelegramRetryAfter
+    """
+
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        group_rate: float = 20 / 60,
+        chat_burst: float = 5.0,
+        max_retries: int = 3
+    ):
+        self.global_rate = global_rate
+        self.global_bucket = TokenBucket(global_rate, global_rate, 1.0, global_rate, 0.5)
+        self.chat_rate = chat_rate
+        self.group_rate = group_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+        self._chats: Dict[object, TokenBucket] = {}
+        self.retries = 0
+
+    def _chat_bucket(self, chat_id: object) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) > 1000:
+                now = time.monotonic()
+                self._chats = {key: b for key, b in self._chats.items() if not b.idle(now)}
+            # В группах Telegram ограничивает сильнее, чем в личных чатах.
+            # Потолок до первого 429 - глобальный лимит бота
+            rate = self.group_rate if str(chat_id).startswith("-") else self.chat_rate
+            bucket = self._chats[chat_id] = TokenBucket(
+                rate, self.chat_burst, 1 / 60, self.global_rate, rate / 10
+            )
+        return bucket
+
+    @staticmethod
+    def _chat_id(method: TelegramMethod) -> Optional[object]:
+        if not method.__api_method__.startswith(LIMITED_PREFIXES):
+            return None
+        return getattr(method, "chat_id", None)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = self._chat_id(method)
+        if chat_id is None:
+            return await make_request(bot, method)
+
+        chat_bucket = self._chat_bucket(chat_id)
+        for attempt in range(self.max_retries + 1):
+            wait = max(chat_bucket.reserve(), self.global_bucket.reserve())
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            try:
+                response = await make_request(bot, method)
+            except TelegramRetryAfter as exc:
+                self.retries += 1
+                chat_bucket.on_retry_after(exc.retry_after)
+                logger.warning(
+                    "{} to chat {} throttled for {}s, chat rate lowered to {:.2f}/s",
+                    method.__api_method__, chat_id, exc.retry_after, chat_bucket.rate
+                )
+                if attempt >= self.max_retries:
+                    raise
+                continue
+
+            chat_bucket.on_success()
+            self.global_bucket.on_success()
+            return response
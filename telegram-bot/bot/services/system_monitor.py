@@ -0,0 +1,173 @@
+"""
+Модуль фонового сбора системных метрик
+
+Содержит:
+- Периодический сбор CPU, памяти, диска, сети, GPU и температур в отдельном потоке
+- Кольцевой буфер замеров фиксированного размера
+- Мгновенное получение последнего замера и min/avg/max за период
+"""
+
+import asyncio
+import platform
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+import psutil
+from loguru import logger
+
+try:
+    import GPUtil
+    HAS_GPUTIL = True
+except ImportError:
+    HAS_GPUTIL = False
+
+# Метрики, по которым считаются min/avg/max (плюс gpu<N>_load, gpu<N>_temperature)
+SUMMARY_KEYS = ("cpu_percent", "mem_percent", "swap_percent", "disk_percent", "net_sent_rate", "net_recv_rate")
+
+
+def _collect_gpus() -> List[Dict[str, Any]]:
+    if not HAS_GPUTIL:
+        return []
+    try:
+        # GPUtil запускает nvidia-smi, поэтому вызывается только из потока сбора
+        return [
+            {
+                "name": gpu.name,
+                "load": gpu.load * 100,
+                "temperature": gpu.temperature,
+                "memory_used": gpu.memoryUsed,
+                "memory_total": gpu.memoryTotal,
+            }
+            for gpu in GPUtil.getGPUs()
+        ]
+    except Exception as exc:
+        logger.debug("Ошибка получения данных GPU: {}", exc)
+        return []
+
+
+def _collect_temperatures() -> Dict[str, float]:
+    if not hasattr(psutil, "sensors_temperatures"):
+        return {}
+    try:
+        temps = psutil.sensors_temperatures() or {}
+    except Exception:
+        return {}
+    return {
+        entry.label or name: entry.current
+        for name, entries in temps.items()
+        for entry in entries
+    }
+
+
+class SystemMonitor:
+    """Фоновый сборщик системных метрик.
+
+    Замер выполняется в отдельном потоке каждые interval секунд и кладется
+    в кольцевой буфер на history секунд. Обработчики читают готовые
+    данные и не ждут ни cpu_percent, ни nvidia-smi.
+
+    Args:
+        interval: Период сбора (секунды)
+        history: Глубина хранения замеров (секунды)
+    """
+
+    def __init__(self, interval: float = 15.0, history: float = 3600.0):
+        self.interval = interval
+        self.samples: Deque[Dict[str, Any]] = deque(maxlen=max(1, int(history // interval)))
+        self.static = {
+            "boot_time": datetime.fromtimestamp(psutil.boot_time()),
+            "os": f"{platform.system()} {platform.release()}",
+            "cores": psutil.cpu_count(logical=False) or 0,
+            "threads": psutil.cpu_count(logical=True) or 0,
+        }
+        self._previous_net: Optional[tuple] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Делает первый замер и запускает периодический сбор."""
+        if self._task is not None:
+            return
+        # Первый вызов cpu_percent(None) задает точку отсчета для следующего
+        psutil.cpu_percent(interval=None)
+        await self._sample()
+        self._task = asyncio.create_task(self._loop(), name="system-monitor")
+        logger.info("Сбор системных метрик запущен (интервал {}s)", self.interval)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """Последний замер или None, если замеров еще нет."""
+        return self.samples[-1] if self.samples else None
+
+    def summary(self, window: float = 3600.0) -> Dict[str, Dict[str, float]]:
+        """min/avg/max числовых метрик за последние window секунд."""
+        since = time.time() - window
+        series: Dict[str, List[float]] = {}
+        for sample in self.samples:
+            if sample["ts"] < since:
+                continue
+            for key, value in sample.items():
+                if key in SUMMARY_KEYS or (key.startswith("gpu") and key[3:4].isdigit()):
+                    series.setdefault(key, []).append(value)
+        return {
+            key: {"min": min(values), "avg": sum(values) / len(values), "max": max(values)}
+            for key, values in series.items()
+        }
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self._sample()
+
+    async def _sample(self) -> None:
+        try:
+            self.samples.append(await asyncio.to_thread(self._collect))
+        except Exception as exc:
+            logger.error("Ошибка сбора системных метрик: {}", exc)
+
+    def _collect(self) -> Dict[str, Any]:
+        now = time.time()
+        cpu_freq = psutil.cpu_freq()
+        mem = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        disk = psutil.disk_usage('/')
+        net = psutil.net_io_counters()
+
+        sent_rate = recv_rate = 0.0
+        if self._previous_net is not None:
+            previous_ts, previous_sent, previous_recv = self._previous_net
+            elapsed = max(now - previous_ts, 1e-6)
+            sent_rate = (net.bytes_sent - previous_sent) / elapsed
+            recv_rate = (net.bytes_recv - previous_recv) / elapsed
+        self._previous_net = (now, net.bytes_sent, net.bytes_recv)
+
+        sample: Dict[str, Any] = {
+            "ts": now,
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "cpu_freq": cpu_freq.current if cpu_freq else None,
+            "mem_total": mem.total,
+            "mem_used": mem.used,
+            "mem_available": mem.available,
+            "mem_percent": mem.percent,
+            "swap_percent": swap.percent,
+            "disk_total": disk.total,
+            "disk_used": disk.used,
+            "disk_free": disk.free,
+            "disk_percent": disk.percent,
+            "net_sent": net.bytes_sent,
+            "net_recv": net.bytes_recv,
+            "net_sent_rate": sent_rate,
+            "net_recv_rate": recv_rate,
+            "gpus": _collect_gpus(),
+            "temperatures": _collect_temperatures(),
+        }
+        for index, gpu in enumerate(sample["gpus"]):
+            sample[f"gpu{index}_load"] = gpu["load"]
+            sample[f"gpu{index}_temperature"] = gpu["temperature"]
+        return sample
@@ -1,57 +1,415 @@
+"""
+Модуль очереди заданий генерации изображений
+
+Содержит:
+- Хранение заданий в Postgres (таблица generation_jobs)
+- Захват заданий через SELECT ... FOR UPDATE SKIP LOCKED
+- Несколько параллельных обработчиков
+- Приоритеты и справедливое чередование пользователей
+- Восстановление заданий, прерванных падением бота
+"""
+
 import asyncio
-from contextlib import asynccontextmanager
-from database.models import GenerationTask, User
-from database.db import AsyncSessionLocal
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot
+from loguru import logger
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.orm import aliased
+
+from bot.models import GenerationJob, ImageGenerationRequest
+from bot.services.metrics import QUEUE_JOBS, add_collector
+from database.db import async_session
+
+Statuses = GenerationJob.Statuses
+
+HEARTBEAT_INTERVAL = 30
+STALE_AFTER = timedelta(minutes=5)
+
 
 class TaskQueue:
-    def __init__(self, sd_client):
-        self.sd_client = sd_client
-        self.queue = asyncio.Queue()
-        self.current_task = None
-        self.progress_task = None
-
-    async def add_task(self, user_id: int, params: dict) -> int:
-        async with AsyncSessionLocal() as session:
-            task = GenerationTask(
-                user_id=user_id,
-                params=params,
-                status='queued'
-            )
-            session.add(task)
-            await session.commit()
-            await self.queue.put(task.id)
-            return task.id
-
-    async def process_tasks(self):
+    """Очередь заданий генерации с несколькими обработчиками.
+
+    Args:
+        bot: Экземпляр Telegram бота для отправки результатов
+        workers: Количество параллельных обработчиков
+        poll_interval: Период опроса базы, если новых заданий не поступало (секунды)
+        max_attempts: Сколько раз задание запускается, включая повторы после ошибки или падения
+        instance: Постоянное имя экземпляра бота (по умолчанию имя хоста). Задания,
+            которые выполнял прошлый запуск с тем же именем, при старте сразу
+            возвращаются в очередь. Одновременно работающие экземпляры должны
+            называться по-разному
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int = 2,
+        poll_interval: float = 5.0,
+        max_attempts: int = 3,
+        instance: Optional[str] = None
+    ):
+        self.bot = bot
+        self.workers = max(1, workers)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        # worker_id ограничен 64 символами, остальное занимают pid, суффикс и номер обработчика
+        self.instance = (instance or socket.gethostname())[:40]
+        self.instance_id = f"{self.instance}:{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Восстанавливает прерванные задания и запускает обработчики."""
+        if self._tasks:
+            return
+
+        # Задания прошлого запуска этого экземпляра никто уже не выполняет.
+        # Задания других экземпляров - только без сигнала дольше STALE_AFTER
+        await self.recover(instance=self.instance)
+        await self.recover()
+        add_collector(self.collect_metrics)
+        self._tasks = [
+            asyncio.create_task(self._worker(f"{self.instance_id}/{n}"), name=f"job-worker-{n}")
+            for n in range(self.workers)
+        ]
+        logger.info("Очередь заданий запущена, обработчиков: {}", self.workers)
+
+    async def stop(self) -> None:
+        """Останавливает обработчики и возвращает их незавершенные задания в очередь."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        try:
+            async with async_session.begin() as session:
+                await session.execute(
+                    update(GenerationJob)
+                    .where(
+                        GenerationJob.status == Statuses.RUNNING,
+                        GenerationJob.worker_id.startswith(f"{self.instance_id}/", autoescape=True)
+                    )
+                    .values(status=Statuses.QUEUED, worker_id=None)
+                )
+        except Exception as exc:
+            # Задания восстановятся через STALE_AFTER после последнего сигнала
+            logger.error("Не удалось вернуть задания в очередь: {}", exc)
+        logger.info("Очередь заданий остановлена")
+
+    async def submit(
+        self,
+        user_id: int,
+        chat_id: int,
+        params: Dict[str, Any],
+        request_id: Optional[int] = None,
+        priority: int = 0,
+        kind: str = "txt2img"
+    ) -> int:
+        """Ставит задание в очередь.
+
+        Returns:
+            int: Идентификатор задания
+        """
+        job = GenerationJob(
+            kind=kind,
+            user_id=user_id,
+            chat_id=chat_id,
+            request_id=request_id,
+            params=params,
+            priority=priority
+        )
+        async with async_session.begin() as session:
+            session.add(job)
+            await session.flush()
+            job_id = job.id
+
+        self._wakeup.set()
+        logger.info("Задание {} поставлено в очередь (пользователь {}, приоритет {})", job_id, user_id, priority)
+        return job_id
+
+    async def position(self, job_id: int) -> int:
+        """Возвращает количество заданий в очереди перед указанным."""
+        async with async_session() as session:
+            job = await session.get(GenerationJob, job_id)
+            if job is None or job.status != Statuses.QUEUED:
+                return 0
+            return await session.scalar(
+                select(func.count()).select_from(GenerationJob).where(
+                    GenerationJob.status == Statuses.QUEUED,
+                    or_(
+                        GenerationJob.priority > job.priority,
+                        and_(GenerationJob.priority == job.priority, GenerationJob.created_at < job.created_at)
+                    )
+                )
+            )
+
+    async def collect_metrics(self) -> None:
+        """Обновляет метрику количества заданий по статусам (вызывается при сборе метрик)."""
+        async with async_session() as session:
+            rows = await session.execute(
+                select(GenerationJob.status, func.count())
+                .where(GenerationJob.status.in_((Statuses.QUEUED, Statuses.RUNNING)))
+                .group_by(GenerationJob.status)
+            )
+            counts = dict(rows.all())
+        for status in (Statuses.QUEUED, Statuses.RUNNING):
+            QUEUE_JOBS.set(counts.get(status, 0), status=status)
+
+    async def recover(self, stale_only: bool = True, instance: Optional[str] = None) -> int:
+        """Возвращает в очередь задания, обработчик которых перестал отвечать.
+
+        Args:
+            stale_only: Восстанавливать только задания без сигнала дольше STALE_AFTER.
+                False восстанавливает все выполняющиеся задания, в том числе
+                задания других работающих экземпляров бота.
+            instance: Восстановить все задания прошлых запусков экземпляра
+                с этим именем, кроме текущего, независимо от stale_only
+
+        Returns:
+            int: Количество восстановленных заданий
+        """
+        condition = GenerationJob.status == Statuses.RUNNING
+        if instance is not None:
+            condition = and_(
+                condition,
+                GenerationJob.worker_id.startswith(f"{instance}:", autoescape=True),
+                ~GenerationJob.worker_id.startswith(f"{self.instance_id}/", autoescape=True)
+            )
+        elif stale_only:
+            condition = and_(condition, GenerationJob.heartbeat_at < datetime.utcnow() - STALE_AFTER)
+
+        async with async_session.begin() as session:
+            failed = await session.execute(
+                update(GenerationJob)
+                .where(condition, GenerationJob.attempts >= self.max_attempts)
+                .values(status=Statuses.FAILED, finished_at=datetime.utcnow(), error="Превышено число попыток")
+                .returning(GenerationJob.id)
+            )
+            requeued = await session.execute(
+                update(GenerationJob)
+                .where(condition, GenerationJob.attempts < self.max_attempts)
+                .values(status=Statuses.QUEUED, worker_id=None)
+                .returning(GenerationJob.id)
+            )
+            failed_ids = failed.scalars().all()
+            requeued_ids = requeued.scalars().all()
+
+        if failed_ids or requeued_ids:
+            logger.warning(
+                "Восстановлены прерванные задания: в очередь {}, ошибка {}",
+                requeued_ids, failed_ids
+            )
+            self._wakeup.set()
+        return len(requeued_ids)
+
+    async def _claim(self, worker_id: str) -> Optional[GenerationJob]:
+        """Захватывает следующее задание, пропуская заблокированные другими обработчиками."""
+        other = aliased(GenerationJob)
+        # Сколько заданий пользователя уже выполняется или стоит в очереди раньше этого.
+        # Сортировка по этому рангу чередует пользователей внутри одного приоритета.
+        user_rank = (
+            select(func.count())
+            .select_from(other)
+            .where(
+                other.user_id == GenerationJob.user_id,
+                or_(
+                    other.status == Statuses.RUNNING,
+                    and_(other.status == Statuses.QUEUED, other.created_at < GenerationJob.created_at)
+                )
+            )
+            .correlate(GenerationJob)
+            .scalar_subquery()
+        )
+
+        async with async_session.begin() as session:
+            job = await session.scalar(
+                select(GenerationJob)
+                .where(GenerationJob.status == Statuses.QUEUED)
+                .order_by(GenerationJob.priority.desc(), user_rank, GenerationJob.created_at)
+                .limit(1)
+                .with_for_update(skip_locked=True, of=GenerationJob)
+            )
+            if job is None:
+                return None
+
+            now = datetime.utcnow()
+            job.status = Statuses.RUNNING
+            job.attempts += 1
+            job.worker_id = worker_id
+            job.started_at = now
+            job.heartbeat_at = now
+            return job
+
+    async def _worker(self, worker_id: str) -> None:
+        """Цикл обработчика: захват задания, выполнение, ожидание новых."""
         while True:
-            task_id = await self.queue.get()
-            async with AsyncSessionLocal() as session:
-                task = await session.get(GenerationTask, task_id)
-                task.status = 'processing'
-                await session.commit()
-                
+            try:
+                job = await self._claim(worker_id)
+            except Exception as exc:
+                logger.error("Обработчик {}: ошибка захвата задания: {}", worker_id, exc)
+                job = None
+
+            if job is None:
                 try:
-                    images = await self.sd_client.txt2img(**task.params)
-                    task.result_images = [str(img) for img in images]  # Реальная реализация сохранения
-                    task.status = 'completed'
-                except Exception as e:
-                    task.status = 'failed'
-                finally:
-                    await session.commit()
-                    self.queue.task_done()
-
-    async def start_progress_monitoring(self, bot):
+                    await self.recover()
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                except Exception as exc:
+                    logger.error("Обработчик {}: ошибка ожидания: {}", worker_id, exc)
+                    await asyncio.sleep(self.poll_interval)
+                self._wakeup.clear()
+                continue
+
+            # Возможно, в очереди есть еще задания для других обработчиков
+            self._wakeup.set()
+            await self._execute(job, worker_id)
+
+    async def _execute(self, job: GenerationJob, worker_id: str) -> None:
+        """Выполняет задание и сохраняет результат."""
+        with logger.contextualize(job_id=job.id, user_id=job.user_id):
+            await self._execute_job(job, worker_id)
+
+    async def _execute_job(self, job: GenerationJob, worker_id: str) -> None:
+        logger.info("Обработчик {} выполняет задание {} (попытка {})", worker_id, job.id, job.attempts)
+        heartbeat = asyncio.create_task(self._heartbeat(job.id))
+        await self._set_request_status(job.request_id, ImageGenerationRequest.Statuses.PROCESSING)
+
+        try:
+            result = await self._run(job)
+        except asyncio.CancelledError:
+            heartbeat.cancel()
+            raise
+        except Exception as exc:
+            heartbeat.cancel()
+            if job.attempts < self.max_attempts:
+                logger.opt(exception=True).warning(
+                    "Задание {} завершилось ошибкой (попытка {} из {}), повтор: {}",
+                    job.id, job.attempts, self.max_attempts, exc
+                )
+                await self._requeue(job, error=str(exc))
+                return
+            logger.exception("Задание {} завершилось ошибкой: {}", job.id, exc)
+            await self._finish(job, Statuses.FAILED, error=str(exc))
+            await self._set_request_status(job.request_id, ImageGenerationRequest.Statuses.FAILED)
+            await self._notify(job, f"❌ Задание #{job.id} не выполнено: {exc}")
+            return
+
+        heartbeat.cancel()
+        # Результат уже у пользователя: дальнейшие ошибки не должны приводить к повтору
+        await self._finish(job, Statuses.COMPLETED, result=result)
+        await self._set_request_status(job.request_id, ImageGenerationRequest.Statuses.COMPLETED)
+        logger.success("Задание {} выполнено", job.id)
+        try:
+            await self._follow_up(job)
+        except Exception as exc:
+            logger.error("Задание {}: ошибка после отправки результата: {}", job.id, exc)
+
+    async def _run(self, job: GenerationJob) -> Dict[str, Any]:
+        """Запускает генерацию в Stable Diffusion и отправляет изображения.
+
+        Повторяется при ошибке, поэтому заканчивается отправкой результата.
+        """
+        from bot.scheduler import send_photos_group
+        from bot.services.progress_presenter import ProgressPresenter
+        from videogeneration.sdapi_cleared import AsyncSDClient, save_images
+
+        params = dict(job.params)
+        progress = ProgressPresenter(self.bot, job.chat_id, f"🖼 Задание #{job.id}")
+        await progress.start()
+
+        async with AsyncSDClient() as sd:
+            await sd.initialize()
+            if not any(s["name"] == params.get("sampler_name") for s in sd.samplers):
+                params["sampler_name"] = sd.samplers[0]["name"]
+                logger.warning("Using fallback sampler: {}", params["sampler_name"])
+
+            progress.update(stage="txt2img")
+            watcher = asyncio.create_task(self._watch_progress(sd, progress))
+            try:
+                images = await sd.txt2img(**params)
+            except Exception:
+                await progress.finish("❌ Ошибка генерации")
+                raise
+            finally:
+                watcher.cancel()
+            paths = await save_images(images, "output/generated")
+
+        await progress.finish(f"✅ Готово, изображений: {len(paths)}")
+        await send_photos_group(self.bot, job.chat_id, paths)
+        return {"images": [str(path) for path in paths]}
+
+    async def _follow_up(self, job: GenerationJob) -> None:
+        """Предлагает следующее действие после доставки результата."""
+        from bot.handlers.filters import is_admin
+        from bot.handlers.keyboards import user_main_kb
+
+        show_admin_buttons = await is_admin(job.user_id)
+        await self._notify(
+            job,
+            "Получай сгенерированные изображения. Что ты хочешь сделать дальше?",
+            reply_markup=user_main_kb(show_admin_buttons)
+        )
+
+    @staticmethod
+    async def _watch_progress(sd, progress) -> None:
+        """Переносит события прогресса WebUI в сообщение о прогрессе задания."""
+        async for event in sd.progress_events():
+            progress.update(step=event.get("step"), total=event.get("total"), eta=event.get("eta"))
+
+    async def _heartbeat(self, job_id: int) -> None:
+        """Периодически отмечает, что задание еще выполняется."""
         while True:
-            if self.current_task:
-                progress = await self.sd_client.get_progress()
-                # Обновляем прогресс в БД и отправляем уведомления
-                async with AsyncSessionLocal() as session:
-                    task = await session.get(GenerationTask, self.current_task)
-                    if task:
-                        task.progress = progress.get('progress', 0.0)
-                        await session.commit()
-                        await bot.send_message(
-                            chat_id=task.user.telegram_id,
-                            text=f"Прогресс: {task.progress*100:.1f}%"
-                        )
-            await asyncio.sleep(1)
\ No newline at end of file
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                async with async_session.begin() as session:
+                    await session.execute(
+                        update(GenerationJob)
+                        .where(GenerationJob.id == job_id)
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+            except Exception as exc:
+                logger.warning("Не удалось обновить heartbeat задания {}: {}", job_id, exc)
+
+    async def _requeue(self, job: GenerationJob, error: str) -> None:
+        """Возвращает задание в очередь для повторной попытки."""
+        async with async_session.begin() as session:
+            await session.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job.id)
+                .values(status=Statuses.QUEUED, worker_id=None, error=error)
+            )
+        self._wakeup.set()
+
+    async def _finish(self, job: GenerationJob, status: str, result: Optional[Dict] = None, error: Optional[str] = None) -> None:
+        async with async_session.begin() as session:
+            await session.execute(
+                update(GenerationJob)
+                .where(GenerationJob.id == job.id)
+                .values(status=status, result=result, error=error, finished_at=datetime.utcnow())
+            )
+
+    async def _set_request_status(self, request_id: Optional[int], status: str) -> None:
+        if request_id is None:
+            return
+        try:
+            async with async_session.begin() as session:
+                await session.execute(
+                    update(ImageGenerationRequest)
+                    .where(ImageGenerationRequest.id == request_id)
+                    .values(status=status)
+                )
+        except Exception as exc:
+            logger.warning("Не удалось обновить статус запроса {}: {}", request_id, exc)
+
+    async def _notify(self, job: GenerationJob, text: str, **kwargs: Any) -> None:
+        try:
+            await self.bot.send_message(chat_id=job.chat_id, text=text, **kwargs)
+        except Exception as exc:
+            logger.error("Не удалось отправить сообщение по заданию {}: {}", job.id, exc)
@@ -0,0 +1,81 @@
+"""
+Модуль получения пользователя для текущего обновления
+
+Содержит:
+- Построение атомарного INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING
+- Ленивое получение строки User с кэшированием на время обработки обновления
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from aiogram import types
+from loguru import logger
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+
+from bot.models import User
+from bot.services.metrics import DB_QUERY_DURATION
+from database.db import async_session
+
+
+def user_values(telegram_user: types.User, at: Optional[datetime] = None) -> Dict[str, Any]:
+    """Возвращает значения строки users для пользователя Telegram."""
+    username = telegram_user.username
+    return {
+        "telegram_id": telegram_user.id,
+        "username": username[:50] if username else None,
+        "last_activity": at or datetime.utcnow(),
+    }
+
+
+def user_upsert(rows: List[Dict[str, Any]]):
+    """Строит INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING для пользователей.
+
+    Args:
+        rows: Значения из user_values(), по одному на telegram_id
+    """
+    statement = insert(User).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={
+            # Строки, достроенные write-behind из событий, приходят без username
+            "username": func.coalesce(statement.excluded.username, User.username),
+            "last_activity": statement.excluded.last_activity,
+        }
+    ).returning(User)
+
+
+async def upsert_user(telegram_user: types.User) -> User:
+    """Создает или обновляет пользователя одним запросом и возвращает строку."""
+    with DB_QUERY_DURATION.time(query="user_upsert"):
+        async with async_session.begin() as session:
+            user = await session.scalar(user_upsert([user_values(telegram_user)]))
+    logger.debug("Пользователь {} получен из базы", telegram_user.id)
+    return user
+
+
+class UserSession:
+    """Пользователь текущего обновления.
+
+    Middleware кладет объект в data["user_session"], хендлеры получают его
+    аргументом user_session. Строка User запрашивается при первом вызове
+    get() и дальше переиспользуется в пределах обновления.
+
+    Args:
+        telegram_user: Отправитель обновления
+    """
+
+    def __init__(self, telegram_user: types.User):
+        self.telegram_user = telegram_user
+        self._user: Optional[User] = None
+
+    @property
+    def telegram_id(self) -> int:
+        return self.telegram_user.id
+
+    async def get(self) -> User:
+        """Возвращает строку пользователя, создавая ее при необходимости."""
+        if self._user is None:
+            self._user = await upsert_user(self.telegram_user)
+        return self._user
@@ -0,0 +1,194 @@
+"""
+Модуль отложенной пакетной записи активности пользователей
+
+Содержит:
+- Буфер событий, сообщений и активности пользователей в памяти
+- Пакетную запись в Postgres по таймеру или по числу строк
+- Обновление пользователей через INSERT ... ON CONFLICT
+- Запись оставшихся строк при остановке бота
+"""
+
+import asyncio
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from aiogram import types
+from loguru import logger
+from sqlalchemy import insert
+
+from bot.models import Event, Message
+from bot.services.metrics import DB_BUFFERED_ROWS, DB_FLUSHED_ROWS, DB_QUERY_DURATION
+from bot.services.user_session import user_upsert, user_values
+from database.db import async_session
+
+
+class WriteBehindBuffer:
+    """Буфер записи активности пользователей в базу.
+
+    Хендлеры не ждут базу: строки копятся в памяти и записываются одной
+    транзакцией каждые flush_interval секунд или при накоплении max_rows строк.
+
+    Args:
+        flush_interval: Максимальная задержка записи (секунды)
+        max_rows: Количество строк, при котором запись начинается досрочно
+        max_buffered: Предел строк в памяти, если база недоступна
+    """
+
+    def __init__(self, flush_interval: float = 0.5, max_rows: int = 500, max_buffered: int = 20000):
+        self.flush_interval = flush_interval
+        self.max_rows = max_rows
+        self.max_buffered = max_buffered
+
+        self._users: Dict[int, Dict[str, Any]] = {}
+        self._events: List[Dict[str, Any]] = []
+        self._messages: List[Dict[str, Any]] = []
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+        self.flushed_rows = 0
+        self.last_flush_duration = 0.0
+
+    def __len__(self) -> int:
+        return len(self._users) + len(self._events) + len(self._messages)
+
+    def start(self) -> None:
+        """Запускает фоновую запись."""
+        if self._task is not None:
+            return
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._flush_loop(), name="write-behind")
+        logger.info(
+            "Отложенная запись запущена (интервал {} мс, пакет {} строк)",
+            int(self.flush_interval * 1000), self.max_rows
+        )
+
+    async def stop(self) -> None:
+        """Останавливает фоновую запись и записывает оставшиеся строки."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        if len(self):
+            logger.error("При остановке не записано строк: {}", len(self))
+
+    def add_activity(self, telegram_user: types.User, at: Optional[datetime] = None) -> None:
+        """Запоминает последнюю активность пользователя."""
+        self._users[telegram_user.id] = user_values(telegram_user, at)
+        self._notify()
+
+    def add_event(self, telegram_id: int, event_type: str, details: Dict[str, Any], at: Optional[datetime] = None) -> None:
+        """Добавляет событие в буфер."""
+        self._events.append({
+            "telegram_id": telegram_id,
+            "event_type": event_type,
+            "details": details,
+            "created_at": at or datetime.utcnow(),
+        })
+        self._notify()
+
+    def add_message(self, telegram_id: int, text: Optional[str], at: Optional[datetime] = None) -> None:
+        """Добавляет сообщение пользователя в буфер."""
+        self._messages.append({
+            "telegram_id": telegram_id,
+            "text": text,
+            "created_at": at or datetime.utcnow(),
+        })
+        self._notify()
+
+    def _notify(self) -> None:
+        if self._full is not None and len(self) >= self.max_rows:
+            self._full.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Записывает накопленные строки одной транзакцией.
+
+        Returns:
+            int: Количество записанных строк
+        """
+        if not len(self):
+            return 0
+
+        lock = self._flush_lock or asyncio.Lock()
+        async with lock:
+            users, self._users = self._users, {}
+            events, self._events = self._events, []
+            messages, self._messages = self._messages, []
+
+            # Пользователи из событий и сообщений тоже должны существовать
+            for row in events + messages:
+                users.setdefault(row["telegram_id"], {
+                    "telegram_id": row["telegram_id"],
+                    "username": None,
+                    "last_activity": row["created_at"],
+                })
+
+            started = time.perf_counter()
+            try:
+                async with async_session.begin() as session:
+                    result = await session.execute(user_upsert(list(users.values())))
+                    ids = {user.telegram_id: user.id for user in result.scalars()}
+
+                    if events:
+                        await session.execute(insert(Event), [
+                            {
+                                "user_id": ids[row["telegram_id"]],
+                                "event_type": row["event_type"],
+                                "details": row["details"],
+                                "created_at": row["created_at"],
+                            }
+                            for row in events
+                        ])
+                    if messages:
+                        await session.execute(insert(Message), [
+                            {
+                                "user_id": ids[row["telegram_id"]],
+                                "text": row["text"],
+                                "created_at": row["created_at"],
+                            }
+                            for row in messages
+                        ])
+            except Exception as exc:
+                DB_QUERY_DURATION.observe(time.perf_counter() - started, query="write_behind_flush", status="error")
+                logger.error("Ошибка отложенной записи, строки будут записаны позже: {}", exc)
+                self._requeue(users, events, messages)
+                DB_BUFFERED_ROWS.set(len(self))
+                return 0
+
+            rows = len(users) + len(events) + len(messages)
+            self.flushed_rows += rows
+            self.last_flush_duration = time.perf_counter() - started
+            DB_QUERY_DURATION.observe(self.last_flush_duration, query="write_behind_flush", status="ok")
+            DB_FLUSHED_ROWS.inc(rows)
+            DB_BUFFERED_ROWS.set(len(self))
+            logger.debug(
+                "Записано пакетом: пользователей {}, событий {}, сообщений {} за {:.3f}s",
+                len(users), len(events), len(messages), self.last_flush_duration
+            )
+            return rows
+
+    def _requeue(self, users: Dict[int, Dict[str, Any]], events: List[Dict], messages: List[Dict]) -> None:
+        """Возвращает строки в буфер после неудачной записи."""
+        for telegram_id, row in users.items():
+            self._users.setdefault(telegram_id, row)
+        self._events = events + self._events
+        self._messages = messages + self._messages
+
+        overflow = len(self) - self.max_buffered
+        if overflow > 0:
+            dropped_events = min(overflow, len(self._events))
+            del self._events[:dropped_events]
+            del self._messages[:overflow - dropped_events]
+            logger.error("Буфер записи переполнен, отброшено строк: {}", overflow)
@@ -0,0 +1,78 @@
+"""
+Проверка бюджета импорта бота
+
+Импорт bot.main должен укладываться в IMPORT_BUDGET секунд (по
+python -X importtime). Импорт бота (планировщик и все обработчики) не
+должен загружать moviepy, gigachat, клиент YouTube и генераторы промптов:
+они подгружаются через videogeneration.registry при первом запуске этапа.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# С запасом: сейчас импорт занимает около 5 секунд, большая часть - aiogram
+IMPORT_BUDGET = 12.0
+
+LAZY_MODULES = (
+    "moviepy",
+    "gigachat",
+    "googleapiclient",
+    "videogeneration.promptgenerator",
+    "videogeneration.prompt_pool",
+    "videogeneration.video_maker",
+    "videogeneration.subtitles",
+    "videogeneration.upload_video",
+)
+
+IMPORT_SCRIPT = """
+import importlib, json, pkgutil, sys
+import bot.scheduler
+import bot.handlers
+for module in pkgutil.iter_modules(bot.handlers.__path__):
+    importlib.import_module(f"bot.handlers.{module.name}")
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def _run_python(tmp_path: Path, *args: str) -> subprocess.CompletedProcess:
+    """Запускает интерпретатор в отдельном процессе, чтобы импорт шел с нуля."""
+    env = dict(os.environ)
+    env.setdefault("BOT_TOKEN", "123456:TEST")
+    env.setdefault("USER_ID", "1")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PROJECT_DIR), env.get("PYTHONPATH")]))
+
+    # Рабочий каталог временный: логгер бота создает logs/ в текущем каталоге
+    completed = subprocess.run(
+        [sys.executable, *args],
+        cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120
+    )
+    assert completed.returncode == 0, completed.stderr
+    return completed
+
+
+def test_bot_import_time_within_budget(tmp_path):
+    completed = _run_python(tmp_path, "-X", "importtime", "-c", "import bot.main")
+
+    # Строки вида "import time: self [us] | cumulative | module"
+    cumulative = None
+    for line in completed.stderr.splitlines():
+        if line.startswith("import time:") and line.rsplit("|", 1)[-1].strip() == "bot.main":
+            cumulative = int(line.split("|")[1]) / 1e6
+    assert cumulative is not None, "bot.main not found in -X importtime output"
+    assert cumulative <= IMPORT_BUDGET, f"Importing bot.main took {cumulative:.2f}s, budget {IMPORT_BUDGET}s"
+
+
+def test_bot_import_does_not_load_heavy_modules(tmp_path):
+    completed = _run_python(tmp_path, "-c", IMPORT_SCRIPT)
+
+    modules = set(json.loads(completed.stdout.strip().splitlines()[-1]))
+    loaded = sorted(
+        name for name in LAZY_MODULES
+        if any(module == name or module.startswith(f"{name}.") for module in modules)
+    )
+    assert loaded == [], f"Imported eagerly: {loaded}"
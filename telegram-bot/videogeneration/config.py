@@ -8,9 +8,31 @@ GIGACHAT_CREDENTIALS = os.getenv('GIGACHAT_CREDENTIALS')
 SALUT_CREDENTIALS = os.getenv('SALUT_CREDENTIALS')
 SALUT_CLIENT_ID = os.getenv('SALUT_CLIENT_ID')
 CA_BUNDLE_FILE = "russian_trusted_root_ca.cer"
+# Адреса SaluteSpeech. Адреса GigaChat SDK читает сам из GIGACHAT_BASE_URL и GIGACHAT_AUTH_URL
+SALUT_TOKEN_URL = os.getenv('SALUT_TOKEN_URL', 'https://ngw.devices.sberbank.ru:9443/api/v2/oauth')
+SALUT_TTS_URL = os.getenv('SALUT_TTS_URL', 'https://smartspeech.sber.ru/rest/v1/text:synthesize')
 PROMPT_TYPE = "SIMPLE" # "GIGACHAT" #
+PROMPT_POOL_SIZE = int(os.getenv('PROMPT_POOL_SIZE', 5))
+PROMPT_POOL_FILE = "output/prompt_pool.json"
+PROMPT_INDEX_FILE = "output/prompt_index.jsonl"
+PROMPT_SIMILARITY_THRESHOLD = float(os.getenv('PROMPT_SIMILARITY_THRESHOLD', 0.6))
 USE_PUBLIC = False
 URL = "http://sd_webui_back:7860" if not USE_PUBLIC else ""
+# Несколько экземпляров WebUI через запятую, запросы распределяются между ними
+SD_URLS = [url.strip() for url in os.getenv('SD_URLS', URL).split(',') if url.strip()]
+SD_CACHE_DIR = "output/cache/sd"
+# Количество шагов цепочки img2img (кадров видео) в generate_video
+VARIATION_ITERATIONS = int(os.getenv('VARIATION_ITERATIONS', 500))
+# UDP-порт, на который WebUI присылает события прогресса (PROGRESS_TARGET в контейнере SD)
+PROGRESS_PORT = int(os.getenv('PROGRESS_PORT', 9310))
+# PROGRESS_INSTANCE каждого адреса из SD_URLS: "http://sd1:7860=sd1,http://sd2:7860=sd2".
+# Для адресов без записи используется имя хоста из адреса
+SD_PROGRESS_INSTANCES = dict(
+    (url.strip().rstrip('/'), instance.strip())
+    for url, _, instance in (item.rpartition('=') for item in os.getenv('SD_PROGRESS_INSTANCES', '').split(','))
+    if url.strip() and instance.strip()
+)
+SD_CACHE_MAX_BYTES = int(os.getenv('SD_CACHE_MAX_BYTES', 2 * 1024 ** 3))
 VOICES = ["Nec_24000", "Bys_24000", "May_24000", "Tur_24000", "Ost_24000", "Pon_24000"]
 VOICES_DICT = {
     "👩 Наталья": "Nec_24000",
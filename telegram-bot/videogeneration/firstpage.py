@@ -6,9 +6,7 @@ from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageOps
 from loguru import logger
 from videogeneration.utils import get_next_free_path
 from videogeneration.config import GIGACHAT_CREDENTIALS, CA_BUNDLE_FILE
-# В начале файла добавим необходимые импорты для GigaChat
-from gigachat import GigaChat
-from gigachat.models import Chat, Messages, MessagesRole
+from videogeneration import gigachat_client
 import time
 import re
 import emoji
@@ -83,26 +81,21 @@ class CoverGenerator:
         logger.info("Starting title generation for prompt: {}", prompt[:50])
         
         try:
-            with GigaChat(
+            full_text = gigachat_client.chat(
+                [
+                    ("system", self._construct_system_prompt()),
+                    ("user", f"Создать заголовок для: {prompt}")
+                ],
+                call_site="cover_title",
+                temperature=0.9,  # Больше креативности
+                max_tokens=80,    # Жесткое ограничение длины
                 credentials=self.credentials,
-                ca_bundle_file=self.ca_bundle,
-                verify_ssl_certs=True
-            ) as model:
-                chat = Chat(
-                    messages=[
-                        Messages(role=MessagesRole.SYSTEM, content=self._construct_system_prompt()),
-                        Messages(role=MessagesRole.USER, content=f"Создать заголовок для: {prompt}")
-                    ],
-                    temperature=0.9,  # Больше креативности
-                    max_tokens=80     # Жесткое ограничение длины
-                )
-                
-                response = model.chat(chat)
-                full_text = response.choices[0].message.content.strip()
-                logger.success("Generated title: {}", full_text)
-                
-                return self.extract_text_and_emojis(full_text)
-                
+                ca_bundle_file=self.ca_bundle
+            ).strip()
+            logger.success("Generated title: {}", full_text)
+
+            return self.extract_text_and_emojis(full_text)
+
         except Exception as e:
             logger.error("GigaChat error: {}", str(e))
             return ("ИИ Революция: " + prompt[:12], "✨")
@@ -2,7 +2,8 @@ from videogeneration.sdapi_cleared import AsyncSDClient, save_images
 from loguru import logger
 import asyncio
 
-from typing import List
+import time
+from typing import Callable, List, Optional
 import asyncio
 from pathlib import Path
 from loguru import logger
@@ -54,7 +55,8 @@ def generate_sequential_variations(
     initial_photo: str,
     iterations: int = 5,
     denoising_strength: float = 0.55,
-    delay_between_steps: float = 0.01
+    delay_between_steps: float = 0.01,
+    on_step: Optional[Callable[[int, int, float], None]] = None
 ) -> List[str]:
     """
     Генерирует последовательные вариации изображения через цепочку img2img преобразований.
@@ -65,6 +67,7 @@ def generate_sequential_variations(
         iterations: Количество последовательных генераций
         denoising_strength: Сила влияния на каждое преобразование (0.3-0.6)
         delay_between_steps: Задержка между шагами в секундах
+        on_step: Вызывается после каждого шага с аргументами (шаг, всего шагов, ETA в секундах)
         
     Returns:
         List[str]: Список путей к сгенерированным изображениям в порядке генерации
@@ -99,6 +102,8 @@ def generate_sequential_variations(
                 "restore_faces": False
             }
 
+            started = time.monotonic()
+
             # Цикл последовательной генерации
             for step in range(total_steps):
                 try:
@@ -118,6 +123,10 @@ def generate_sequential_variations(
                         current_image = Path(new_paths[0]).read_bytes()
                         generated_paths.extend(new_paths)
                         logger.info(f"Generated step {step+1}/{total_steps}")
+
+                    if on_step is not None:
+                        elapsed = time.monotonic() - started
+                        on_step(step + 1, total_steps, elapsed / (step + 1) * (total_steps - step - 1))
                     
                     # Задержка между шагами
                     await asyncio.sleep(delay_between_steps)
@@ -0,0 +1,195 @@
+"""
+Модуль общего клиента GigaChat
+
+Содержит:
+- Кэш клиентов GigaChat на все время работы процесса (токен и соединения переиспользуются)
+- Мемоизацию ответов для детерминированных запросов
+- Метрики задержки и расхода токенов по местам вызова
+"""
+
+import atexit
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+
+from videogeneration.metrics import GIGACHAT_DURATION
+from videogeneration.config import GIGACHAT_CREDENTIALS
+
+MEMO_MAX_SIZE = 256
+
+_clients: Dict[Tuple, Any] = {}
+_clients_lock = threading.Lock()
+
+_memo: "OrderedDict[str, str]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+_metrics: Dict[str, Dict[str, float]] = {}
+_metrics_lock = threading.Lock()
+
+
+def get_client(
+    credentials: Optional[str] = GIGACHAT_CREDENTIALS,
+    ca_bundle_file: Optional[str] = None,
+    verify_ssl_certs: bool = True,
+    **kwargs: Any
+):
+    """Возвращает общий клиент GigaChat для указанных параметров подключения.
+
+    Клиент создается один раз и не закрывается после запроса, поэтому
+    OAuth-токен и TLS-соединения переиспользуются между вызовами.
+    """
+    key = (credentials, ca_bundle_file, verify_ssl_certs, tuple(sorted(kwargs.items())))
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            # gigachat импортируется только при первом обращении к API
+            from gigachat import GigaChat
+
+            client = GigaChat(
+                credentials=credentials,
+                ca_bundle_file=ca_bundle_file,
+                verify_ssl_certs=verify_ssl_certs,
+                **kwargs
+            )
+            _clients[key] = client
+            logger.debug("Created GigaChat client #{}", len(_clients))
+    return client
+
+
+def close_clients() -> None:
+    """Закрывает все открытые клиенты GigaChat."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        try:
+            client.close()
+        except Exception as exc:
+            logger.warning("Failed to close GigaChat client: {}", exc)
+
+
+atexit.register(close_clients)
+
+
+def _memo_key(messages: Iterable[Tuple[str, str]], params: Dict[str, Any]) -> str:
+    payload = json.dumps(
+        {"messages": list(messages), "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _record(call_site: str, **values: float) -> None:
+    with _metrics_lock:
+        stats = _metrics.setdefault(call_site, {
+            "calls": 0,
+            "errors": 0,
+            "cache_hits": 0,
+            "latency_total": 0.0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "total_tokens": 0,
+        })
+        for name, value in values.items():
+            stats[name] += value
+
+
+def chat(
+    messages: Iterable[Tuple[str, str]],
+    call_site: str,
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    memoize: Optional[bool] = None,
+    credentials: Optional[str] = GIGACHAT_CREDENTIALS,
+    ca_bundle_file: Optional[str] = None,
+    verify_ssl_certs: bool = True
+) -> str:
+    """Отправляет запрос в GigaChat через общий клиент.
+
+    Args:
+        messages: Последовательность пар (роль, текст), роль - "system", "user" или "assistant"
+        call_site: Имя места вызова для метрик
+        temperature: Температура генерации
+        max_tokens: Ограничение длины ответа
+        memoize: Кэшировать ли ответ. По умолчанию кэшируются только запросы с temperature=0
+        credentials, ca_bundle_file, verify_ssl_certs: Параметры подключения
+
+    Returns:
+        str: Текст ответа модели
+    """
+    from gigachat.models import Chat, Messages
+
+    messages = [(role, content) for role, content in messages]
+    params = {"temperature": temperature, "max_tokens": max_tokens}
+    if memoize is None:
+        memoize = temperature == 0
+
+    key = None
+    if memoize:
+        key = _memo_key(messages, params)
+        with _memo_lock:
+            cached = _memo.get(key)
+            if cached is not None:
+                _memo.move_to_end(key)
+        if cached is not None:
+            _record(call_site, calls=1, cache_hits=1)
+            logger.debug("GigaChat memo hit for {}", call_site)
+            return cached
+
+    request = Chat(
+        messages=[Messages(role=role, content=content) for role, content in messages],
+        **{name: value for name, value in params.items() if value is not None}
+    )
+    client = get_client(credentials, ca_bundle_file, verify_ssl_certs)
+
+    started = time.perf_counter()
+    try:
+        response = client.chat(request)
+    except Exception:
+        _record(call_site, calls=1, errors=1, latency_total=time.perf_counter() - started)
+        GIGACHAT_DURATION.observe(time.perf_counter() - started, call_site=call_site, status="error")
+        raise
+
+    elapsed = time.perf_counter() - started
+    GIGACHAT_DURATION.observe(elapsed, call_site=call_site, status="ok")
+    usage = response.usage
+    _record(
+        call_site,
+        calls=1,
+        latency_total=elapsed,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0,
+        total_tokens=getattr(usage, "total_tokens", 0) or 0
+    )
+    logger.debug(
+        "GigaChat {} answered in {:.2f}s ({} tokens)",
+        call_site, elapsed, getattr(usage, "total_tokens", "?")
+    )
+
+    content = response.choices[0].message.content
+    if key is not None:
+        with _memo_lock:
+            _memo[key] = content
+            while len(_memo) > MEMO_MAX_SIZE:
+                _memo.popitem(last=False)
+    return content
+
+
+def get_metrics() -> Dict[str, Dict[str, float]]:
+    """Возвращает метрики запросов к GigaChat по местам вызова."""
+    with _metrics_lock:
+        result = {site: dict(stats) for site, stats in _metrics.items()}
+
+    for stats in result.values():
+        requests_sent = stats["calls"] - stats["cache_hits"]
+        stats["latency_avg"] = stats["latency_total"] / requests_sent if requests_sent else 0.0
+    return result
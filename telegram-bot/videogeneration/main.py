@@ -1,35 +1,56 @@
-from videogeneration.promptgenerator import generate_prompt
-from videogeneration.generations import generate_photo, generate_sequential_variations
-from videogeneration.firstpage import generate_first_page
-from videogeneration.sound_generation import generate_audio_with_salut
-from videogeneration.video_maker import compile_video
-from videogeneration.subtitles import add_subtitles_from_text
+from typing import Callable, Optional
+
+from videogeneration.config import VARIATION_ITERATIONS
+from videogeneration.registry import run_stage
 from loguru import logger
 
-def generate_video():
-    prompt = generate_prompt()
+ProgressCallback = Callable[..., None]
+
+
+def generate_video(progress_callback: Optional[ProgressCallback] = None):
+    """Генерирует видео целиком.
+
+    Args:
+        progress_callback: Вызывается при смене этапа и на каждом шаге цепочки img2img
+            с именованными аргументами stage, step, total и eta
+    """
+    def report(stage: str, step: int = 0, total: int = 0, eta: float = 0.0) -> None:
+        if progress_callback is not None:
+            progress_callback(stage=stage, step=step, total=total, eta=eta)
 
-    photo = generate_photo(prompt=prompt)
+    report("prompt")
+    prompt = run_stage("prompt")
+
+    report("photo")
+    photo = run_stage("photo", prompt=prompt)
+
+    report("sequential_variations")
+    next_photos = run_stage("sequential_variations",
+                            prompt = prompt,
+                            initial_photo=photo,
+                            iterations=VARIATION_ITERATIONS,
+                            denoising_strength = 0.25, # for tests only 30
+                            on_step=lambda step, total, eta: report("sequential_variations", step, total, eta))
+    report("first_page")
+    first_page, title = run_stage("first_page",
+                                  prompt = prompt,
+                                  initial_photo = photo)
 
-    next_photos = generate_sequential_variations(prompt = prompt,
-                                                 initial_photo=photo,
-                                                 iterations=500,
-                                                 denoising_strength = 0.25) # for tests only 30
-    first_page, title = generate_first_page(prompt = prompt,
-                                     initial_photo = photo)
-    
     all_photos = [photo, *next_photos]
-    
-    audio_path, description = generate_audio_with_salut(prompt=prompt)
-    video = compile_video(first_page=first_page, photos=all_photos, audio=audio_path)
 
-    video = add_subtitles_from_text(input_video=video, text=description)
+    report("audio")
+    audio_path, description = run_stage("audio", prompt=prompt)
+    report("compile_video")
+    video = run_stage("compile_video", first_page=first_page, photos=all_photos, audio=audio_path)
+
+    report("subtitles")
+    video = run_stage("subtitles", input_video=video, text=description)
 
     return video, [first_page, *all_photos], title, description
 
 if __name__ == "__main__":
     for i in range(1):
         #try:
-            generate_first_page("A enchanted forest in cyberspace matrix, octane re", r"B:\\Generation videos\\telegram-bot\\output\\generated\\image_0.png")
+            run_stage("first_page", "A enchanted forest in cyberspace matrix, octane re", r"B:\\Generation videos\\telegram-bot\\output\\generated\\image_0.png")
         #except Exception as e:
         #    logger.critical(f"{e}")
@@ -0,0 +1,195 @@
+"""
+Модуль метрик в формате Prometheus
+
+Содержит:
+- Потокобезопасные счетчики, gauge и гистограммы с метками
+- Реестр метрик и их вывод в текстовом формате Prometheus
+- Метрики пайплайна: Stable Diffusion, TTS, GigaChat, этапы видео и загрузки
+
+Пакет videogeneration не зависит от бота: сервер /metrics и метрики
+бота находятся в bot.services.metrics, который использует этот реестр.
+Метрики пишутся из разных потоков и циклов событий (generate_video
+выполняется в отдельном потоке), поэтому значения защищены threading.Lock.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_registry: List["_Metric"] = []
+_collectors: List[Callable[[], Awaitable[None]]] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """Значение, которое может расти и уменьшаться."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: object) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: object) -> None:
+        self.inc(-amount, **labels)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Распределение длительностей (или размеров) по корзинам."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # метки -> [счетчики корзин..., сумма, количество]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[Dict[str, object]]:
+        """Измеряет длительность блока. Метки можно дополнить внутри блока
+        через возвращаемый словарь (например, status)."""
+        labels = dict(labels)
+        started = time.perf_counter()
+        try:
+            yield labels
+        except BaseException:
+            labels.setdefault("status", "error")
+            raise
+        finally:
+            labels.setdefault("status", "ok")
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            values = {key: list(state) for key, state in self._values.items()}
+        for key, state in values.items():
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{labels} {_format_value(cumulative)}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(state[-2])}"
+            yield f"{self.name}_count{labels} {_format_value(state[-1])}"
+
+
+def add_collector(collector: Callable[[], Awaitable[None]]) -> None:
+    """Регистрирует корутину, обновляющую метрики перед каждым сбором."""
+    _collectors.append(collector)
+
+
+async def render_metrics() -> str:
+    """Возвращает все метрики в текстовом формате Prometheus."""
+    for collector in _collectors:
+        try:
+            await collector()
+        except Exception as exc:
+            logger.warning("Metrics collector {} failed: {}", getattr(collector, "__name__", collector), exc)
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# --- Метрики пайплайна ---
+
+SD_REQUEST_DURATION = Histogram(
+    "sd_request_duration_seconds", "Время запросов к Stable Diffusion WebUI", ["endpoint", "backend", "status"]
+)
+TTS_DURATION = Histogram("tts_request_duration_seconds", "Время синтеза речи", ["provider", "status"])
+GIGACHAT_DURATION = Histogram("gigachat_request_duration_seconds", "Время запросов к GigaChat", ["call_site", "status"])
+STAGE_DURATION = Histogram("pipeline_stage_duration_seconds", "Время этапов генерации видео", ["stage", "status"])
+UPLOAD_BYTES = Counter("upload_bytes_total", "Загруженные байты", ["target"])
+UPLOAD_DURATION = Histogram("upload_duration_seconds", "Время загрузки файлов", ["target", "status"])
@@ -0,0 +1,119 @@
+"""
+Модуль приема событий прогресса от Stable Diffusion
+
+Содержит:
+- Фоновый поток, принимающий JSON-датаграммы прогресса по UDP
+- Последнее известное состояние для каждого экземпляра WebUI
+- Рассылку событий подписчикам в их циклы событий asyncio
+"""
+
+import asyncio
+import json
+import socket
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set, Tuple
+
+from loguru import logger
+
+from videogeneration.config import PROGRESS_PORT
+
+QUEUE_SIZE = 256
+
+Subscriber = Tuple[asyncio.AbstractEventLoop, asyncio.Queue]
+
+
+class ProgressHub:
+    """Прием событий прогресса и их раздача подписчикам.
+
+    Поток приема один на процесс, подписчики могут работать в разных
+    циклах событий: события передаются через call_soon_threadsafe.
+
+    Args:
+        port: UDP-порт для приема событий
+        host: Адрес, на котором принимаются события
+    """
+
+    def __init__(self, port: int, host: str = "0.0.0.0"):
+        self.port = port
+        self.host = host
+        self.latest: Dict[str, Dict[str, Any]] = {}
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._socket: Optional[socket.socket] = None
+
+    def start(self) -> None:
+        """Запускает поток приема (повторный вызов ничего не делает)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._socket.bind((self.host, self.port))
+            self._thread = threading.Thread(target=self._receive_loop, name="progress-hub", daemon=True)
+            self._thread.start()
+        logger.info("Listening for SD progress events on udp/{}", self.port)
+
+    def _receive_loop(self) -> None:
+        while True:
+            try:
+                data, _ = self._socket.recvfrom(65536)
+                event = json.loads(data)
+            except ValueError:
+                continue
+            except OSError as exc:
+                logger.error("Progress hub stopped: {}", exc)
+                return
+
+            if not isinstance(event, dict):
+                continue
+            self.latest[event.get("instance", "")] = event
+
+            with self._lock:
+                subscribers = list(self._subscribers)
+            for loop, queue in subscribers:
+                try:
+                    loop.call_soon_threadsafe(_deliver, queue, event)
+                except RuntimeError:
+                    # Цикл событий подписчика уже закрыт
+                    with self._lock:
+                        self._subscribers.discard((loop, queue))
+
+    async def events(self, predicate: Optional[Callable[[Dict[str, Any]], bool]] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Асинхронный итератор событий прогресса.
+
+        Args:
+            predicate: Фильтр событий, например по source или instance
+        """
+        self.start()
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.add(subscriber)
+        try:
+            while True:
+                event = await subscriber[1].get()
+                if predicate is None or predicate(event):
+                    yield event
+        finally:
+            with self._lock:
+                self._subscribers.discard(subscriber)
+
+
+def _deliver(queue: asyncio.Queue, event: Dict[str, Any]) -> None:
+    # Медленный подписчик теряет самые старые события, а не блокирует остальных
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(event)
+
+
+_hub: Optional[ProgressHub] = None
+_hub_lock = threading.Lock()
+
+
+def get_hub() -> ProgressHub:
+    """Возвращает общий для процесса приемник событий."""
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = ProgressHub(PROGRESS_PORT)
+    return _hub
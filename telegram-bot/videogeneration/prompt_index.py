@@ -0,0 +1,196 @@
+"""
+Модуль индекса похожих промптов
+
+Содержит:
+- Вычисление MinHash-сигнатур по словесным шинглам промпта
+- LSH-индекс для поиска кандидатов за доли миллисекунды
+- Хранение истории использованных промптов на диске
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
+
+STOP_WORDS = {
+    "a", "an", "the", "in", "on", "of", "with", "and", "or", "at", "to",
+    "by", "for", "from", "into", "where", "like", "as", "is", "are"
+}
+
+
+def shingles(prompt: str) -> Set[str]:
+    """Разбивает промпт на униграммы и биграммы значимых слов."""
+    words = [
+        word for word in re.findall(r"[a-zа-яё0-9]+", prompt.lower())
+        if word not in STOP_WORDS
+    ]
+    result = set(words)
+    result.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    return result
+
+
+class PromptIndex:
+    """Индекс использованных промптов с поиском почти-дубликатов.
+
+    Сигнатуры строятся хешированием multiply-shift по 64-битным хешам шинглов,
+    кандидаты отбираются LSH-полосами, а сходство оценивается только для них.
+
+    Args:
+        storage_path: Путь к JSONL-файлу с историей промптов
+        threshold: Оценка сходства Жаккара, начиная с которой промпт считается дубликатом
+        bands: Количество LSH-полос
+        rows: Количество хешей в одной полосе
+    """
+
+    def __init__(
+        self,
+        storage_path: str,
+        threshold: float = 0.6,
+        bands: int = 20,
+        rows: int = 3
+    ):
+        self.storage_path = Path(storage_path)
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = rows
+        self.num_perm = bands * rows
+
+        rng = np.random.default_rng(1)
+        self._a = rng.integers(1, np.iinfo(np.uint64).max, self.num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, np.iinfo(np.uint64).max, self.num_perm, dtype=np.uint64)
+
+        self._prompts: List[str] = []
+        self._signatures = np.empty((1024, self.num_perm), dtype=np.uint32)
+        self._buckets: List[Dict[bytes, List[int]]] = [
+            defaultdict(list) for _ in range(bands)
+        ]
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+    def signature(self, prompt: str) -> np.ndarray:
+        """Вычисляет MinHash-сигнатуру промпта."""
+        hashes = np.fromiter(
+            (
+                int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+                for s in shingles(prompt)
+            ),
+            dtype=np.uint64
+        )
+        if not hashes.size:
+            hashes = np.zeros(1, dtype=np.uint64)
+
+        with np.errstate(over="ignore"):
+            mixed = self._a[:, None] * hashes[None, :] + self._b[:, None]
+        return (mixed >> np.uint64(32)).min(axis=1).astype(np.uint32)
+
+    def estimate(self, first: np.ndarray, second: np.ndarray) -> float:
+        """Оценивает сходство Жаккара по двум сигнатурам."""
+        return float(np.count_nonzero(first == second)) / self.num_perm
+
+    def similarity(self, first: str, second: str) -> float:
+        """Оценивает сходство двух промптов."""
+        return self.estimate(self.signature(first), self.signature(second))
+
+    def find_similar(self, prompt: str) -> Optional[Tuple[str, float]]:
+        """Ищет в истории самый похожий промпт выше порога.
+
+        Returns:
+            Кортеж (промпт, сходство) или None, если похожих нет
+        """
+        signature = self.signature(prompt)
+
+        with self._lock:
+            candidates: Set[int] = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            if not candidates:
+                return None
+
+            ids = np.fromiter(candidates, dtype=np.int64)
+            scores = (self._signatures[ids] == signature).sum(axis=1) / self.num_perm
+            best = int(scores.argmax())
+            if scores[best] < self.threshold:
+                return None
+            return self._prompts[ids[best]], float(scores[best])
+
+    def is_duplicate(self, prompt: str) -> bool:
+        """Проверяет, был ли уже использован похожий промпт."""
+        match = self.find_similar(prompt)
+        if match:
+            logger.debug("Prompt is {:.0%} similar to used one: {}", match[1], match[0])
+        return match is not None
+
+    def add(self, prompt: str) -> None:
+        """Добавляет промпт в историю и сохраняет его на диск."""
+        signature = self.signature(prompt)
+        with self._lock:
+            self._insert(prompt, signature)
+            try:
+                self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+                with self.storage_path.open("a", encoding="utf-8") as f:
+                    f.write(json.dumps({
+                        "prompt": prompt,
+                        "sig": signature.astype("<u4").tobytes().hex(),
+                        "ts": datetime.utcnow().isoformat(timespec="seconds")
+                    }, ensure_ascii=False) + "\n")
+            except OSError as exc:
+                logger.warning("Failed to persist prompt to {}: {}", self.storage_path, exc)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [
+            signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+    def _insert(self, prompt: str, signature: np.ndarray) -> None:
+        idx = len(self._prompts)
+        if idx >= len(self._signatures):
+            self._signatures = np.concatenate([self._signatures, np.empty_like(self._signatures)])
+
+        self._prompts.append(prompt)
+        self._signatures[idx] = signature
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].append(idx)
+
+    def _load(self) -> None:
+        """Загружает историю промптов с диска."""
+        if not self.storage_path.exists():
+            return
+
+        recomputed = 0
+        try:
+            with self.storage_path.open(encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        prompt = record["prompt"]
+                    except (ValueError, KeyError):
+                        continue
+
+                    try:
+                        signature = np.frombuffer(bytes.fromhex(record.get("sig", "")), dtype="<u4")
+                    except ValueError:
+                        signature = np.empty(0, dtype=np.uint32)
+
+                    if signature.size != self.num_perm:
+                        signature = self.signature(prompt)
+                        recomputed += 1
+                    self._insert(prompt, signature.astype(np.uint32))
+        except OSError as exc:
+            logger.warning("Failed to load prompt index from {}: {}", self.storage_path, exc)
+
+        logger.info(
+            "Loaded {} used prompts into index ({} signatures recomputed)",
+            len(self), recomputed
+        )
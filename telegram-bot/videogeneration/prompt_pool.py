@@ -0,0 +1,227 @@
+"""
+Модуль пула заранее сгенерированных промптов
+
+Содержит:
+- Потокобезопасный пул готовых промптов с выдачей за O(1)
+- Фоновое пополнение пула до заданного размера
+- Валидацию промптов перед добавлением в пул
+- Отсев промптов, похожих на уже использованные
+- Сохранение пула на диск между перезапусками
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, List, Optional
+
+from loguru import logger
+
+from videogeneration.prompt_index import PromptIndex
+
+MIN_PROMPT_LENGTH = 20
+MAX_PROMPT_LENGTH = 400
+MAX_RESAMPLE_ATTEMPTS = 20
+
+
+class PromptPool:
+    """Пул промптов, который пополняется в фоновом потоке.
+
+    Args:
+        producer: Функция генерации промпта, выбрасывающая исключение при ошибке
+        size: Количество промптов, которое пул держит наготове
+        storage_path: Путь к JSON-файлу для сохранения пула
+        namespace: Тип генератора, для которого собран пул
+        fallback: Функция, вызываемая, если пул пуст и генерация не удалась
+        index: Индекс использованных промптов для отсева почти-дубликатов
+        retry_delay: Начальная пауза перед повтором после ошибки (секунды)
+        max_retry_delay: Максимальная пауза перед повтором (секунды)
+    """
+
+    def __init__(
+        self,
+        producer: Callable[[], str],
+        size: int,
+        storage_path: str,
+        namespace: str = "default",
+        fallback: Optional[Callable[[], str]] = None,
+        index: Optional[PromptIndex] = None,
+        retry_delay: float = 30.0,
+        max_retry_delay: float = 600.0
+    ):
+        self.producer = producer
+        self.size = max(1, size)
+        self.storage_path = Path(storage_path)
+        self.namespace = namespace
+        self.fallback = fallback
+        self.index = index
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        self._prompts: Deque[str] = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self._prompts)
+
+    def start(self) -> None:
+        """Запускает фоновое пополнение пула (повторный вызов ничего не делает)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(
+                target=self._refill_loop,
+                name="prompt-pool",
+                daemon=True
+            )
+            self._thread.start()
+        logger.info("Prompt pool started ({} of {} prompts ready)", len(self), self.size)
+
+    def stop(self) -> None:
+        """Останавливает фоновое пополнение пула."""
+        self._stopped.set()
+        self._wakeup.set()
+
+    def take(self) -> str:
+        """Выдает готовый промпт и запускает асинхронное пополнение пула.
+
+        Returns:
+            str: Промпт для генерации видео
+        """
+        self.start()
+
+        with self._lock:
+            prompt = self._prompts.popleft() if self._prompts else None
+            if prompt is not None:
+                self._save()
+
+        self._wakeup.set()
+
+        if prompt is not None:
+            logger.debug("Took prompt from pool, {} left", len(self))
+        else:
+            logger.warning("Prompt pool is empty, generating prompt synchronously")
+            prompt = self._produce_now()
+
+        if self.index is not None:
+            self.index.add(prompt)
+        return prompt
+
+    def _produce_now(self) -> str:
+        """Генерирует промпт в вызывающем потоке, если пул пуст."""
+        candidate = None
+        for _ in range(MAX_RESAMPLE_ATTEMPTS):
+            try:
+                candidate = self.producer()
+            except Exception as exc:
+                logger.error("Synchronous prompt generation failed: {}", exc)
+                break
+            # validate перебирает _prompts, который пополняет фоновый поток
+            with self._lock:
+                accepted = self.validate(candidate)
+            if accepted:
+                return candidate.strip()
+        else:
+            logger.warning("No unique prompt after {} attempts", MAX_RESAMPLE_ATTEMPTS)
+
+        if self.fallback is None:
+            raise RuntimeError("Prompt pool is empty and no fallback configured")
+        return self.fallback()
+
+    def validate(self, prompt: Optional[str]) -> bool:
+        """Проверяет, что промпт можно положить в пул или выдать."""
+        if not isinstance(prompt, str):
+            return False
+
+        prompt = prompt.strip()
+        if not MIN_PROMPT_LENGTH <= len(prompt) <= MAX_PROMPT_LENGTH:
+            logger.debug("Prompt length {} is out of bounds", len(prompt))
+            return False
+
+        if self.index is None:
+            return prompt not in self._prompts
+
+        if any(self.index.similarity(prompt, p) >= self.index.threshold for p in self._prompts):
+            logger.debug("Prompt is too similar to one already in pool")
+            return False
+        return not self.index.is_duplicate(prompt)
+
+    def _refill_loop(self) -> None:
+        """Цикл фонового пополнения пула."""
+        delay = self.retry_delay
+        rejected = 0
+
+        while not self._stopped.is_set():
+            if len(self) >= self.size:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+
+            try:
+                prompt = self.producer()
+            except Exception as exc:
+                logger.error("Prompt pool refill failed: {}. Retry in {:.0f}s", exc, delay)
+                self._stopped.wait(delay)
+                delay = min(delay * 2, self.max_retry_delay)
+                continue
+
+            delay = self.retry_delay
+            with self._lock:
+                accepted = self.validate(prompt)
+                if accepted:
+                    self._prompts.append(prompt.strip())
+                    self._save()
+
+            if not accepted:
+                logger.debug("Rejected prompt for pool: {}", prompt)
+                rejected += 1
+                if rejected >= MAX_RESAMPLE_ATTEMPTS:
+                    logger.warning("Prompt generator keeps producing duplicates, pausing refill")
+                    self._stopped.wait(self.retry_delay)
+                    rejected = 0
+                continue
+
+            rejected = 0
+            logger.debug("Prompt pool refilled: {}/{}", len(self), self.size)
+
+    def _load(self) -> None:
+        """Загружает сохраненный пул с диска."""
+        if not self.storage_path.exists():
+            return
+
+        try:
+            data = json.loads(self.storage_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            logger.warning("Failed to load prompt pool from {}: {}", self.storage_path, exc)
+            return
+
+        if data.get("namespace") != self.namespace:
+            logger.info("Stored prompt pool belongs to {}, ignoring", data.get("namespace"))
+            return
+
+        prompts: List[str] = [p for p in data.get("prompts", []) if self.validate(p)]
+        self._prompts.extend(p.strip() for p in prompts[:self.size])
+        logger.info("Loaded {} prompts from {}", len(self._prompts), self.storage_path)
+
+    def _save(self) -> None:
+        """Атомарно сохраняет пул на диск (вызывается под блокировкой)."""
+        try:
+            self.storage_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.storage_path.with_suffix(".tmp")
+            tmp_path.write_text(
+                json.dumps(
+                    {"namespace": self.namespace, "prompts": list(self._prompts)},
+                    ensure_ascii=False
+                ),
+                encoding="utf-8"
+            )
+            os.replace(tmp_path, self.storage_path)
+        except OSError as exc:
+            logger.warning("Failed to save prompt pool to {}: {}", self.storage_path, exc)
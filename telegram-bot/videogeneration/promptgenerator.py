@@ -1,7 +1,11 @@
 import random
-from gigachat import GigaChat
-from gigachat.models import Chat, Messages, MessagesRole
-from videogeneration.config import GIGACHAT_CREDENTIALS, PROMPT_TYPE, CA_BUNDLE_FILE
+import threading
+from videogeneration.config import (GIGACHAT_CREDENTIALS, PROMPT_TYPE, CA_BUNDLE_FILE, PROMPT_POOL_SIZE,
+                                    PROMPT_POOL_FILE, PROMPT_INDEX_FILE, PROMPT_SIMILARITY_THRESHOLD)
+from videogeneration.prompt_index import PromptIndex
+from videogeneration import gigachat_client
+from videogeneration.prompt_pool import PromptPool
+from videogeneration.registry import LazyRegistry
 import os
 import re
 
@@ -46,7 +50,7 @@ class PromptGenerator:
             'depth of field', 'symmetrical patterns'
         ]
 
-    def generate_prompt(self):
+    def generate_prompt(self, strict=False):
         logger.info("Starting simple prompt generation")
         components = [
             f"A {random.choice(self.objects)} in {random.choice(self.locations)}, "
@@ -81,44 +85,35 @@ class GigaChatPromptGenerator:
             "incorporating ferrofluid dynamics", "with chameleon pigment technology"
         ]
 
-    def generate_prompt(self, base_theme=None):
+    def generate_prompt(self, base_theme=None, strict=False):
         logger.info("Starting GigaChat prompt generation")
         if not base_theme:
             base_theme = self._generate_base_concept()
             logger.debug(f"Generated base concept: {base_theme}")
-            
-        with GigaChat(
-            credentials=self.credentials,
-            ca_bundle_file=self.ca_bundle,
-            verify_ssl_certs=True
-        ) as model:
-            logger.debug("Creating GigaChat session")
-            chat = Chat(
-                messages=[
-                    Messages(
-                        role=MessagesRole.SYSTEM,
-                        content=self._construct_system_prompt()
-                    ),
-                    Messages(
-                        role=MessagesRole.USER,
-                        content=f"Concept: {base_theme}"
-                    )
+
+        try:
+            logger.info("Sending request to GigaChat API")
+            content = gigachat_client.chat(
+                [
+                    ("system", self._construct_system_prompt()),
+                    ("user", f"Concept: {base_theme}")
                 ],
+                call_site="prompt",
                 temperature=0.75,
-                max_tokens=450
+                max_tokens=450,
+                credentials=self.credentials,
+                ca_bundle_file=self.ca_bundle
             )
-            
-            try:
-                logger.info("Sending request to GigaChat API")
-                response = model.chat(chat)
-                logger.success("Successfully generated prompt with GigaChat")
-                logger.debug(f"Raw GigaChat response: {response.choices[0].message.content}")
-                return self._clean_prompt(response.choices[0].message.content)
-            except Exception as e:
-                logger.error(f"GigaChat API error: {str(e)}")
-                fallback = self._generate_fallback_prompt(base_theme)
-                logger.warning(f"Using fallback prompt: {fallback}")
-                return fallback
+            logger.success("Successfully generated prompt with GigaChat")
+            logger.debug(f"Raw GigaChat response: {content}")
+            return self._clean_prompt(content)
+        except Exception as e:
+            logger.error(f"GigaChat API error: {str(e)}")
+            if strict:
+                raise
+            fallback = self._generate_fallback_prompt(base_theme)
+            logger.warning(f"Using fallback prompt: {fallback}")
+            return fallback
 
     def _construct_system_prompt(self):
         logger.debug("Constructing system prompt")
@@ -166,14 +161,39 @@ Example: "A sprawling underground tech-bazaar in 2025 Neo-Moscow, where glowing
         ]
         return ' '.join(elements)[:400]
     
-generators = {
-    "SIMPLE": PromptGenerator(),
-    "GIGACHAT": GigaChatPromptGenerator()
-}
-    
+generators = LazyRegistry("prompt generator", {
+    "SIMPLE": "videogeneration.promptgenerator:PromptGenerator",
+    "GIGACHAT": "videogeneration.promptgenerator:GigaChatPromptGenerator"
+}, instantiate=True)
+
+_prompt_pool = None
+_prompt_pool_lock = threading.Lock()
+
+
+def get_prompt_pool():
+    """Создает пул промптов при первом обращении."""
+    global _prompt_pool
+    with _prompt_pool_lock:
+        if _prompt_pool is None:
+            _prompt_pool = PromptPool(
+                producer=lambda: generators[PROMPT_TYPE].generate_prompt(strict=True),
+                fallback=lambda: generators[PROMPT_TYPE].generate_prompt(),
+                size=PROMPT_POOL_SIZE,
+                storage_path=PROMPT_POOL_FILE,
+                namespace=PROMPT_TYPE,
+                index=PromptIndex(PROMPT_INDEX_FILE, threshold=PROMPT_SIMILARITY_THRESHOLD)
+            )
+    return _prompt_pool
+
+
+def start_prompt_pool():
+    """Запускает фоновое наполнение пула промптов."""
+    get_prompt_pool().start()
+
+
 def generate_prompt():
     logger.info(f"Using {PROMPT_TYPE} prompt generator")
-    result = generators[PROMPT_TYPE].generate_prompt()
+    result = get_prompt_pool().take()
     logger.debug(f"Final generated prompt: {result}")
     return result
 
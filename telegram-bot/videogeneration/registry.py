@@ -0,0 +1,116 @@
+"""
+Модуль ленивого реестра этапов генерации видео
+
+Содержит:
+- Реестр объектов, импортируемых и создаваемых при первом обращении
+- Реестр этапов пайплайна generate_video
+- Запуск этапа по имени с логированием длительности
+"""
+
+import importlib
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from videogeneration.metrics import STAGE_DURATION
+from videogeneration.tracing import span
+
+
+class LazyRegistry:
+    """Реестр, который импортирует объекты только при первом обращении.
+
+    Записи задаются строками вида "module.path:attribute", поэтому тяжелые
+    модули (moviepy, gigachat, googleapiclient и т.д.) не загружаются,
+    пока соответствующий этап не понадобится.
+
+    Args:
+        name: Название реестра для логов
+        entries: Словарь {ключ: "module.path:attribute"}
+        instantiate: Создавать ли объект вызовом найденного атрибута
+    """
+
+    def __init__(self, name: str, entries: Optional[Dict[str, str]] = None, instantiate: bool = False):
+        self.name = name
+        self.instantiate = instantiate
+        self._targets: Dict[str, str] = dict(entries or {})
+        self._loaded: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, key: str, target: str) -> None:
+        """Регистрирует объект под указанным ключом."""
+        if ":" not in target:
+            raise ValueError(f"Target must look like 'module:attribute', got {target!r}")
+        with self._lock:
+            self._targets[key] = target
+            self._loaded.pop(key, None)
+
+    def get(self, key: str) -> Any:
+        """Возвращает объект, загружая его при первом обращении."""
+        if key in self._loaded:
+            return self._loaded[key]
+
+        with self._lock:
+            if key not in self._loaded:
+                if key not in self._targets:
+                    raise KeyError(f"Unknown {self.name} entry: {key}. Available: {list(self._targets)}")
+
+                module_name, attribute = self._targets[key].split(":", 1)
+                started = time.perf_counter()
+                obj = getattr(importlib.import_module(module_name), attribute)
+                if self.instantiate:
+                    obj = obj()
+                self._loaded[key] = obj
+                logger.debug(
+                    "Loaded {} entry '{}' in {:.3f}s",
+                    self.name, key, time.perf_counter() - started
+                )
+
+        return self._loaded[key]
+
+    def is_loaded(self, key: str) -> bool:
+        """Проверяет, был ли объект уже загружен."""
+        return key in self._loaded
+
+    def __getitem__(self, key: str) -> Any:
+        return self.get(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._targets
+
+    def keys(self):
+        return self._targets.keys()
+
+
+stages = LazyRegistry("stage", {
+    "prompt": "videogeneration.promptgenerator:generate_prompt",
+    "photo": "videogeneration.generations:generate_photo",
+    "sequential_variations": "videogeneration.generations:generate_sequential_variations",
+    "first_page": "videogeneration.firstpage:generate_first_page",
+    "audio": "videogeneration.sound_generation:generate_audio_with_salut",
+    "tts": "videogeneration.sound_generation:generate_audio_file",
+    "compile_video": "videogeneration.video_maker:compile_video",
+    "subtitles": "videogeneration.subtitles:add_subtitles_from_text",
+    "upload": "videogeneration.upload_video:upload_video",
+    "start_prompt_pool": "videogeneration.promptgenerator:start_prompt_pool",
+})
+
+
+def run_stage(name: str, *args: Any, **kwargs: Any) -> Any:
+    """Выполняет этап пайплайна по имени.
+
+    Args:
+        name: Имя этапа в реестре stages
+        *args, **kwargs: Аргументы этапа
+
+    Returns:
+        Результат выполнения этапа
+    """
+    stage = stages.get(name)
+    started = time.perf_counter()
+    try:
+        with span(f"stage:{name}"), STAGE_DURATION.time(stage=name):
+            return stage(*args, **kwargs)
+    finally:
+        logger.info("Stage '{}' finished in {:.2f}s", name, time.perf_counter() - started)
@@ -0,0 +1,193 @@
+"""
+Модуль пула бэкендов Stable Diffusion WebUI
+
+Содержит:
+- Учет запросов, выполняемых на каждом бэкенде
+- Проверку состояния через sdapi/v1/progress и sdapi/v1/memory
+- Выбор наименее загруженного бэкенда
+- Автоматический выключатель (circuit breaker) для сбойных бэкендов
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aiohttp
+from loguru import logger
+
+FAILURE_THRESHOLD = 3
+BASE_COOLDOWN = 30.0
+MAX_COOLDOWN = 600.0
+HEALTH_TTL = 5.0
+HEALTH_TIMEOUT = 5.0
+
+
+class Backend:
+    """Состояние одного экземпляра WebUI.
+
+    Выключатель имеет три состояния: closed (бэкенд работает),
+    open (бэкенд исключен до окончания паузы) и half-open (пропускается
+    один пробный запрос, по его результату бэкенд возвращается или
+    исключается снова с удвоенной паузой).
+    """
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.in_flight = 0
+        self.busy = False
+        self.vram_free = 0.0
+        self.checked_at = 0.0
+        self.failures = 0
+        self.cooldown = BASE_COOLDOWN
+        self.open_until = 0.0
+        self.probing = False
+        self.completed = 0
+        self.errors = 0
+
+    @property
+    def state(self) -> str:
+        if self.failures < FAILURE_THRESHOLD:
+            return "closed"
+        return "open" if time.monotonic() < self.open_until else "half-open"
+
+    def available(self) -> bool:
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.probing)
+
+    def load(self) -> Tuple[int, float]:
+        # Занятость, о которой бэкенд сообщил сам, учитывается, если это не наши запросы
+        external = 1 if self.busy and self.in_flight == 0 else 0
+        return self.in_flight + external, -self.vram_free
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "busy": self.busy,
+            "vram_free": round(self.vram_free, 3),
+            "failures": self.failures,
+            "completed": self.completed,
+            "errors": self.errors,
+        }
+
+
+class BackendPool:
+    """Пул бэкендов с маршрутизацией на наименее загруженный.
+
+    Состояние общее для всего процесса: клиенты создаются на каждый вызов
+    и в разных потоках, поэтому изменения защищены threading.Lock.
+    """
+
+    def __init__(self, urls: Sequence[str]):
+        if not urls:
+            raise ValueError("At least one Stable Diffusion backend URL required")
+        self.backends = [Backend(url) for url in urls]
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> List[str]:
+        return [backend.url for backend in self.backends]
+
+    def __len__(self) -> int:
+        return len(self.backends)
+
+    async def refresh(self, session: aiohttp.ClientSession, force: bool = False) -> None:
+        """Обновляет состояние бэкендов, данные которых устарели."""
+        now = time.monotonic()
+        stale = [
+            backend for backend in self.backends
+            if backend.available() and (force or now - backend.checked_at > HEALTH_TTL)
+        ]
+        if stale and len(self.backends) > 1:
+            await asyncio.gather(*(self._check(session, backend) for backend in stale))
+
+    async def _check(self, session: aiohttp.ClientSession, backend: Backend) -> None:
+        timeout = aiohttp.ClientTimeout(total=HEALTH_TIMEOUT)
+        try:
+            async with session.get(
+                f"{backend.url}/sdapi/v1/progress",
+                params={"skip_current_image": "true"},
+                timeout=timeout
+            ) as response:
+                response.raise_for_status()
+                progress = await response.json()
+            async with session.get(f"{backend.url}/sdapi/v1/memory", timeout=timeout) as response:
+                response.raise_for_status()
+                memory = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            logger.warning("Health check of {} failed: {}", backend.url, exc)
+            self.release(backend, success=False, counted=False)
+            return
+
+        cuda = (memory.get("cuda") or {}).get("system") or {}
+        with self._lock:
+            state = progress.get("state") or {}
+            backend.busy = bool(state.get("job_count")) or progress.get("progress", 0) > 0
+            backend.vram_free = cuda["free"] / cuda["total"] if cuda.get("total") else 0.0
+            backend.checked_at = time.monotonic()
+
+    def acquire(self, exclude: Sequence[Backend] = ()) -> Backend:
+        """Выбирает наименее загруженный доступный бэкенд и резервирует его."""
+        with self._lock:
+            candidates = [b for b in self.backends if b.available() and b not in exclude]
+            if not candidates:
+                # Все исключены: пробуем тот, у которого пауза закончится раньше
+                candidates = sorted(
+                    (b for b in self.backends if b not in exclude),
+                    key=lambda b: b.open_until
+                )[:1]
+            if not candidates:
+                raise RuntimeError("No Stable Diffusion backends available")
+
+            backend = min(candidates, key=Backend.load)
+            if backend.state != "closed":
+                backend.probing = True
+            backend.in_flight += 1
+            return backend
+
+    def release(self, backend: Backend, success: bool, counted: bool = True) -> None:
+        """Освобождает бэкенд и обновляет состояние выключателя."""
+        with self._lock:
+            if counted:
+                backend.in_flight = max(0, backend.in_flight - 1)
+            backend.probing = False
+
+            if success:
+                if backend.failures >= FAILURE_THRESHOLD:
+                    logger.info("Backend {} is back online", backend.url)
+                backend.failures = 0
+                backend.cooldown = BASE_COOLDOWN
+                backend.open_until = 0.0
+                backend.completed += 1
+                return
+
+            backend.errors += 1
+            backend.failures += 1
+            if backend.failures >= FAILURE_THRESHOLD:
+                if backend.open_until:
+                    backend.cooldown = min(backend.cooldown * 2, MAX_COOLDOWN)
+                backend.open_until = time.monotonic() + backend.cooldown
+                logger.error(
+                    "Backend {} ejected for {:.0f}s after {} failures",
+                    backend.url, backend.cooldown, backend.failures
+                )
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Возвращает состояние всех бэкендов."""
+        with self._lock:
+            return [backend.snapshot() for backend in self.backends]
+
+
+_pools: Dict[Tuple[str, ...], BackendPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(urls: Sequence[str]) -> BackendPool:
+    """Возвращает общий для процесса пул для указанного набора адресов."""
+    key = tuple(url.rstrip("/") for url in urls)
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = BackendPool(key)
+        return _pools[key]
@@ -0,0 +1,161 @@
+"""
+Модуль кэша результатов Stable Diffusion
+
+Содержит:
+- Ключ кэша по каноническому хешу запроса и активного чекпоинта
+- Хранение ответов WebUI на диске с ограничением по объему
+- Вытеснение давно не использованных записей (LRU по времени доступа)
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+CACHEABLE_ENDPOINTS = {"sdapi/v1/txt2img", "sdapi/v1/img2img"}
+
+
+def is_deterministic(payload: Dict[str, Any]) -> bool:
+    """Проверяет, что результат запроса однозначно определяется его параметрами."""
+    if payload.get("seed", -1) in (-1, None):
+        return False
+    if payload.get("subseed_strength") and payload.get("subseed", -1) in (-1, None):
+        return False
+    return True
+
+
+def make_key(endpoint: str, payload: Dict[str, Any], checkpoint: str) -> str:
+    """Вычисляет ключ кэша по эндпоинту, параметрам и чекпоинту."""
+    canonical = json.dumps(
+        {"endpoint": endpoint, "payload": payload, "checkpoint": checkpoint},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class SDResultCache:
+    """Дисковый кэш ответов WebUI с ограничением по объему.
+
+    Каждая запись хранится отдельным JSON-файлом, время изменения файла
+    используется как время последнего обращения.
+
+    Args:
+        directory: Каталог для хранения записей
+        max_bytes: Максимальный суммарный объем записей
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: Dict[str, int] = {}
+        self._total = 0
+        self._scan()
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Возвращает сохраненный ответ или None."""
+        if key not in self._sizes:
+            return None
+
+        path = self._path(key)
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError) as exc:
+            logger.warning("Dropping broken SD cache entry {}: {}", key, exc)
+            self._remove(key)
+            return None
+        return data
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """Сохраняет ответ и вытесняет старые записи при превышении объема."""
+        data = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            logger.debug("SD response of {} bytes exceeds cache budget", len(data))
+            return
+
+        path = self._path(key)
+        tmp_path: Optional[Path] = None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Свой временный файл у каждого писателя: один ключ могут сохранять несколько процессов
+            with NamedTemporaryFile(dir=self.directory, prefix=f"{key}.", suffix=".tmp", delete=False) as f:
+                tmp_path = Path(f.name)
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as exc:
+            logger.warning("Failed to store SD cache entry: {}", exc)
+            if tmp_path is not None:
+                tmp_path.unlink(missing_ok=True)
+            return
+
+        with self._lock:
+            self._total += len(data) - self._sizes.get(key, 0)
+            self._sizes[key] = len(data)
+        self._evict()
+
+    def _remove(self, key: str) -> None:
+        with self._lock:
+            self._total -= self._sizes.pop(key, 0)
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        if self._total <= self.max_bytes:
+            return
+
+        entries = []
+        for key in list(self._sizes):
+            try:
+                entries.append((self._path(key).stat().st_mtime, key))
+            except OSError:
+                entries.append((0.0, key))
+        entries.sort()
+
+        evicted = 0
+        for _, key in entries:
+            if self._total <= self.max_bytes:
+                break
+            self._remove(key)
+            evicted += 1
+        logger.debug("Evicted {} SD cache entries, {} bytes used", evicted, self._total)
+
+    def _scan(self) -> None:
+        """Восстанавливает учет объема по файлам на диске."""
+        if not self.directory.exists():
+            return
+
+        started = time.perf_counter()
+        for path in self.directory.glob("*.json"):
+            try:
+                size = path.stat().st_size
+            except OSError:
+                continue
+            self._sizes[path.stem] = size
+            self._total += size
+        logger.debug(
+            "SD cache: {} entries, {} bytes (scanned in {:.3f}s)",
+            len(self._sizes), self._total, time.perf_counter() - started
+        )
+        self._evict()
@@ -3,12 +3,16 @@ from __future__ import annotations
 
 import asyncio
 import base64
+import concurrent.futures
 import json
+import threading
 import time
-from datetime import datetime
+import uuid
+from collections import OrderedDict
 from io import BytesIO
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 
 import aiohttp
 from loguru import logger
@@ -19,18 +23,81 @@ try:
 except ImportError:
     HAS_PILLOW = False
 
-from videogeneration.config import URL
+from videogeneration.metrics import SD_REQUEST_DURATION
+from videogeneration.config import SD_CACHE_DIR, SD_CACHE_MAX_BYTES, SD_PROGRESS_INSTANCES, SD_URLS
+from videogeneration.progress_stream import get_hub
+from videogeneration.sd_backends import get_pool
+from videogeneration.sd_cache import CACHEABLE_ENDPOINTS, SDResultCache, is_deterministic, make_key
+from videogeneration.tracing import span
 from videogeneration.utils import get_next_free_path
 
+CHECKPOINT_TTL = 60.0
+# Запросы, прогресс которых WebUI публикует с id задачи (force_task_id)
+PROGRESS_ENDPOINTS = {"sdapi/v1/txt2img", "sdapi/v1/img2img"}
+# Сколько последних задач клиента помнить для фильтрации событий прогресса
+PROGRESS_TASKS_KEPT = 64
+
+_metrics: Dict[str, int] = {"requests": 0, "cache_hits": 0, "cache_misses": 0, "coalesced_requests": 0}
+_metrics_lock = threading.Lock()
+
+_result_cache: Optional[SDResultCache] = None
+_result_cache_lock = threading.Lock()
+
+_checkpoints: Dict[str, Tuple[float, str]] = {}
+
+# Выполняющиеся запросы по ключу кэша. concurrent.futures.Future позволяет
+# дождаться результата из любого потока и цикла событий
+_in_flight: Dict[str, concurrent.futures.Future] = {}
+_in_flight_lock = threading.Lock()
+
+
+def _count(name: str, value: int = 1) -> None:
+    with _metrics_lock:
+        _metrics[name] = _metrics.get(name, 0) + value
+
+
+def progress_instance(url: str) -> str:
+    """Имя экземпляра WebUI (PROGRESS_INSTANCE) в событиях прогресса для адреса бэкенда."""
+    url = url.rstrip("/")
+    return SD_PROGRESS_INSTANCES.get(url) or urlparse(url).hostname or url
+
+
+def get_metrics() -> Dict[str, Any]:
+    """Возвращает счетчики запросов к Stable Diffusion и состояние бэкендов."""
+    with _metrics_lock:
+        result: Dict[str, Any] = dict(_metrics)
+    result["backends"] = get_pool(SD_URLS).snapshot()
+    if _result_cache is not None:
+        result["cache_entries"] = len(_result_cache)
+        result["cache_bytes"] = _result_cache.total_bytes
+    return result
+
+
+def get_result_cache() -> SDResultCache:
+    """Создает дисковый кэш результатов при первом обращении."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = SDResultCache(SD_CACHE_DIR, SD_CACHE_MAX_BYTES)
+    return _result_cache
+
 
 class AsyncSDClient:
-    """Асинхронный клиент для работы с Stable Diffusion API."""
+    """Асинхронный клиент для работы с Stable Diffusion API.
+
+    Args:
+        base_url: Адрес одного экземпляра WebUI (по умолчанию используется SD_URLS)
+        backends: Список адресов WebUI, между которыми распределяются генерации
+    """
     
-    def __init__(self, base_url: str = URL):
-        self.base_url = base_url
+    def __init__(self, base_url: Optional[str] = None, backends: Optional[List[str]] = None):
+        self.pool = get_pool(backends or ([base_url] if base_url else SD_URLS))
+        self.base_url = base_url or self.pool.urls[0]
         self._session: Optional[aiohttp.ClientSession] = None
         self.cmd_flags: Optional[Dict[str, Any]] = None
         self._important_flags: Dict[str, Any] = {}
+        # id задач этого клиента -> экземпляр WebUI, на котором они выполнялись
+        self._tasks: "OrderedDict[str, str]" = OrderedDict()
 
         self._api_data: Dict[str, Any] = {
             'samplers': [],
@@ -53,7 +120,7 @@ class AsyncSDClient:
             'loras': ('sdapi/v1/refresh-loras', 'hypernetworks')
         }
         
-        logger.debug("Initialized AsyncSDClient with base URL: {}", base_url)
+        logger.debug("Initialized AsyncSDClient with backends: {}", self.pool.urls)
 
     async def __aenter__(self) -> AsyncSDClient:
         """Контекстный менеджер для инициализации сессии."""
@@ -142,23 +209,24 @@ class AsyncSDClient:
                 logger.error("Failed to load {}: {}", endpoint, e)
                 self._api_data[data_key] = []
 
-    async def _get_request(self, endpoint: str) -> List[Dict]:
-        """Универсальный метод для GET-запросов"""
-        url = f"{self.base_url}/{endpoint}"
-        logger.debug("Fetching data from {}", url)
+    async def _get_request(self, endpoint: str, base_url: Optional[str] = None) -> List[Dict]:
+        """Универсальный метод для GET-запросов (по умолчанию к base_url)"""
+        with span(f"sd:{endpoint}"):
+            url = f"{base_url or self.base_url}/{endpoint}"
+            logger.debug("Fetching data from {}", url)
         
-        try:
-            async with self._session.get(url) as response:
-                response.raise_for_status()
-                data = await response.json()
-                logger.success("Successfully received data from {}", endpoint)
-                return data
-        except aiohttp.ClientResponseError as e:
-            logger.error("API error {}: {}", e.status, e.message)
-            raise
-        except Exception as e:
-            logger.exception("Unexpected error in GET request")
-            raise
+            try:
+                async with self._session.get(url) as response:
+                    response.raise_for_status()
+                    data = await response.json()
+                    logger.success("Successfully received data from {}", endpoint)
+                    return data
+            except aiohttp.ClientResponseError as e:
+                logger.error("API error {}: {}", e.status, e.message)
+                raise
+            except Exception as e:
+                logger.exception("Unexpected error in GET request")
+                raise
 
     @property
     def sd_models(self) -> List[Dict]:
@@ -311,6 +379,37 @@ class AsyncSDClient:
             logger.exception(f"Unexpected error getting progress: {str(e)}")
             return None
 
+    async def progress_events(self, source: Optional[str] = "total") -> AsyncIterator[Dict[str, Any]]:
+        """Поток событий прогресса, которые WebUI отправляет сам.
+
+        События приходят по UDP (см. stable-diffusion/progress_channel.py)
+        и содержат instance, source, kind (start/step/end), job, step,
+        total, rate и eta. Опрос API и передача изображений не нужны.
+
+        Приемник общий для процесса, поэтому выдаются только события задач,
+        отправленных этим клиентом: job совпадает с force_task_id запроса,
+        а instance - с экземпляром бэкенда, который выполнял запрос.
+        Запрос, дождавшийся чужого одинакового запроса, событий не получает.
+
+        Args:
+            source: Источник событий ("total" - общий прогресс задания), None - все
+        """
+        def predicate(event: Dict[str, Any]) -> bool:
+            if source is not None and event.get("source") != source:
+                return False
+            return self._tasks.get(event.get("job")) == event.get("instance")
+
+        async for event in get_hub().events(predicate):
+            yield event
+
+    def _track_task(self, backend_url: str) -> str:
+        """Создает id задачи для запроса и запоминает, на каком экземпляре она выполняется."""
+        task_id = f"task(bot-{uuid.uuid4().hex})"
+        self._tasks[task_id] = progress_instance(backend_url)
+        while len(self._tasks) > PROGRESS_TASKS_KEPT:
+            self._tasks.popitem(last=False)
+        return task_id
+
     async def interrupt(self) -> str:
         """Прерывание текущей генерации"""
         return await self._send_control_request("sdapi/v1/interrupt")
@@ -345,7 +444,7 @@ class AsyncSDClient:
         """Генерация изображений по тексту"""
         self._validate_required_params(kwargs, {'prompt', 'steps', 'width', 'height'})
         logger.info("Starting txt2img with params: {}", self._sanitize_log_data(kwargs))
-        response = await self._request("sdapi/v1/txt2img", kwargs)
+        response = await self._cached_request("sdapi/v1/txt2img", kwargs)
         return self._decode_images(response)
 
     async def img2img(self, init_images: List[bytes], **kwargs) -> List[bytes]:
@@ -358,7 +457,7 @@ class AsyncSDClient:
             **kwargs
         }
         logger.info("Starting img2img with {} images", len(init_images))
-        response = await self._request("sdapi/v1/img2img", payload)
+        response = await self._cached_request("sdapi/v1/img2img", payload)
         return self._decode_images(response)
 
     async def extra_single_image(
@@ -425,27 +524,178 @@ class AsyncSDClient:
         payload = {"image": self._b64_encode(image)}
         return await self._request("sdapi/v1/png-info", payload)
 
-    async def _request(self, endpoint: str, payload: Dict) -> Dict:
-        """Базовый метод для выполнения запросов"""
-        url = f"{self.base_url}/{endpoint}"
-        logger.debug("Making POST request to {}", url)
-        
+    async def get_checkpoint(self, backend_url: Optional[str] = None) -> str:
+        """Возвращает хеш активного чекпоинта бэкенда (кэшируется на CHECKPOINT_TTL секунд).
+
+        Args:
+            backend_url: Адрес бэкенда пула, по умолчанию base_url
+        """
+        url = (backend_url or self.base_url).rstrip("/")
+        cached = _checkpoints.get(url)
+        if cached and time.monotonic() - cached[0] < CHECKPOINT_TTL:
+            return cached[1]
+
+        options = await self._get_request("sdapi/v1/options", base_url=url)
+        checkpoint = options.get("sd_checkpoint_hash") or options.get("sd_model_checkpoint") or ""
+        _checkpoints[url] = (time.monotonic(), checkpoint)
+        return checkpoint
+
+    async def _pool_checkpoints(self) -> List[str]:
+        """Чекпоинты бэкендов пула без повторов (недоступные бэкенды пропускаются)."""
+        results = await asyncio.gather(
+            *(self.get_checkpoint(url) for url in self.pool.urls), return_exceptions=True
+        )
+        checkpoints = sorted({result for result in results if isinstance(result, str)})
+        if not checkpoints:
+            errors = [result for result in results if isinstance(result, BaseException)]
+            raise errors[0] if errors else RuntimeError("No checkpoint information")
+        return checkpoints
+
+    async def _cached_request(self, endpoint: str, payload: Dict) -> Dict:
+        """Выполняет запрос через кэш результатов, если запрос детерминирован.
+
+        Бэкенды пула могут работать с разными моделями. Результат ищется
+        под чекпоинтом каждого из них (любой найденный мог выдать пул),
+        а сохраняется под чекпоинтом бэкенда, который выполнил запрос.
+        """
+        if endpoint not in CACHEABLE_ENDPOINTS or not is_deterministic(payload):
+            return await self._request(endpoint, payload)
+
         try:
-            async with self._session.post(url, json=payload) as response:
-                logger.debug("Received response status: {}", response.status)
-                response.raise_for_status()
-                json_data = await response.json()
-                logger.success("Request to {} completed successfully", endpoint)
-                return json_data
-        except aiohttp.ClientResponseError as e:
-            logger.error("HTTP error {}: {}", e.status, e.message)
-            raise
-        except aiohttp.ClientError as e:
-            logger.critical("Connection error: {}", str(e))
-            raise
+            checkpoints = await self._pool_checkpoints()
         except Exception as e:
-            logger.exception("Unexpected error during request: {}", e)
+            logger.warning("SD cache disabled for this request: {}", e)
+            return await self._request(endpoint, payload)
+
+        cache = get_result_cache()
+        for checkpoint in checkpoints:
+            key = make_key(endpoint, payload, checkpoint)
+            cached = await asyncio.to_thread(cache.get, key)
+            if cached is not None:
+                _count("cache_hits")
+                logger.success("Returning cached result for {} ({})", endpoint, key[:12])
+                return cached
+
+        _count("cache_misses")
+
+        async def fetch() -> Dict:
+            response, backend_url = await self._request_on_backend(endpoint, payload)
+            try:
+                key = make_key(endpoint, payload, await self.get_checkpoint(backend_url))
+            except Exception as e:
+                logger.warning("Result from {} not cached, checkpoint unknown: {}", backend_url, e)
+                return response
+            # Параметры запроса (в том числе init_images) в кэше не нужны
+            stored = {k: v for k, v in response.items() if k != "parameters"}
+            await asyncio.to_thread(cache.put, key, stored)
+            return response
+
+        # Одинаковые запросы объединяются, пока набор моделей пула тот же
+        return await self._single_flight(make_key(endpoint, payload, ",".join(checkpoints)), fetch)
+
+    async def _single_flight(self, key: str, call: Callable[[], Awaitable[Dict]]) -> Dict:
+        """Объединяет одновременные одинаковые запросы в один запрос к GPU.
+
+        Первый вызов выполняет запрос, остальные ждут его результат.
+        Если первый вызов отменен, ожидающие повторяют запрос сами.
+        """
+        while True:
+            with _in_flight_lock:
+                future = _in_flight.get(key)
+                leader = future is None
+                if leader:
+                    future = _in_flight[key] = concurrent.futures.Future()
+
+            if leader:
+                break
+
+            logger.info("Waiting for identical in-flight request ({})", key[:12])
+            try:
+                # shield: отмена ожидающего не должна отменять общий результат
+                result = await asyncio.shield(asyncio.wrap_future(future))
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                logger.debug("Leader of {} was cancelled, retrying", key[:12])
+                continue
+            # Считаются только запросы, действительно получившие чужой результат
+            _count("coalesced_requests")
+            return result
+
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
             raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with _in_flight_lock:
+                _in_flight.pop(key, None)
+
+    async def _request(self, endpoint: str, payload: Dict) -> Dict:
+        """Базовый метод для выполнения запросов (см. _request_on_backend)."""
+        response, _ = await self._request_on_backend(endpoint, payload)
+        return response
+
+    async def _request_on_backend(self, endpoint: str, payload: Dict) -> Tuple[Dict, str]:
+        """Выполняет запрос и возвращает ответ и адрес бэкенда, который его выполнил.
+
+        Запрос отправляется на наименее загруженный бэкенд пула. При ошибке
+        соединения или 5xx бэкенд получает отметку о сбое, а запрос
+        повторяется на следующем доступном.
+        """
+        with span(f"sd:{endpoint}"):
+            _count("requests")
+            await self.pool.refresh(self._session)
+            tried = []
+
+            while True:
+                backend = self.pool.acquire(exclude=tried)
+                tried.append(backend)
+                url = f"{backend.url}/{endpoint}"
+                body = payload
+                if endpoint in PROGRESS_ENDPOINTS:
+                    body = {**payload, "force_task_id": self._track_task(backend.url)}
+                logger.debug("Making POST request to {}", url)
+
+                started = time.perf_counter()
+                status = "error"
+                try:
+                    async with self._session.post(url, json=body) as response:
+                        logger.debug("Received response status: {}", response.status)
+                        status = str(response.status)
+                        response.raise_for_status()
+                        json_data = await response.json()
+                except aiohttp.ClientResponseError as e:
+                    # 4xx означает ошибку в запросе, а не в бэкенде
+                    self.pool.release(backend, success=e.status < 500)
+                    logger.error("HTTP error {} from {}: {}", e.status, backend.url, e.message)
+                    if e.status < 500 or len(tried) >= len(self.pool):
+                        raise
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    self.pool.release(backend, success=False)
+                    logger.critical("Connection error with {}: {}", backend.url, str(e))
+                    if len(tried) >= len(self.pool):
+                        raise
+                except Exception as e:
+                    self.pool.release(backend, success=False)
+                    logger.exception("Unexpected error during request: {}", e)
+                    raise
+                else:
+                    self.pool.release(backend, success=True)
+                    logger.success("Request to {} completed successfully on {}", endpoint, backend.url)
+                    return json_data, backend.url
+                finally:
+                    SD_REQUEST_DURATION.observe(
+                        time.perf_counter() - started, endpoint=endpoint, backend=backend.url, status=status
+                    )
+
+                logger.warning("Retrying {} on another backend", endpoint)
 
     def _decode_images(self, response: Dict) -> List[bytes]:
         """Декодирование изображений из ответа"""
@@ -493,59 +743,25 @@ async def save_images(images: List[bytes], save_dir: str = "output") -> List[str
 
 async def monitor_progress(sd_client: AsyncSDClient, interval: float = 1.0) -> None:
     """Мониторинг прогресса генерации с отображением в консоли"""
-    last_valid_progress = 0.0
-    attempts = 0
-    
-    while True:
-        try:
-            progress_data = await sd_client.get_progress()
-            if not progress_data:
-                attempts += 1
-                if attempts > 3:
-                    logger.error("Progress check failed multiple times")
-                    break
-                await asyncio.sleep(2)
-                continue
-            
-            attempts = 0
-            current = progress_data.get('progress', 0.0)
-            eta = progress_data.get('eta_relative', 0.0)
-            status = progress_data.get('textinfo', 'Unknown')
-            
-            if current > last_valid_progress:
-                await _save_progress_image(progress_data)
-                last_valid_progress = current
+    last_print = 0.0
 
-            if current >= 1.0 or (current == 0.0 and last_valid_progress >= 0.5):
-                logger.info("Generation completed")
-                break
-                
-            print(f"\rProgress: {current*100:.1f}% | ETA: {eta:.1f}s | Status: {status}", end="")
-            
-        except Exception as e:
-            logger.error(f"Monitoring error: {str(e)}")
+    async for event in sd_client.progress_events():
+        if event.get("kind") == "end":
+            logger.info("Generation completed")
             break
-            
-        await asyncio.sleep(interval)
-
 
-async def _save_progress_image(data: Dict) -> None:
-    """Сохранение промежуточного изображения прогресса"""
-    if not data.get('current_image'):
-        return
-        
-    try:
-        img_dir = Path("output/progress")
-        img_dir.mkdir(exist_ok=True)
-        
-        img_data = base64.b64decode(data['current_image'])
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
-        filename = f"progress_{timestamp}_{int(data['progress']*100):03d}.png"
-        
-        (img_dir / filename).write_bytes(img_data)
-        logger.debug(f"Saved progress image: {filename}")
-    except Exception as e:
-        logger.warning(f"Failed to save progress image: {str(e)}")
+        now = time.monotonic()
+        if now - last_print < interval:
+            continue
+        last_print = now
+
+        total = event.get("total") or 0
+        current = event.get("step", 0) / total if total else 0.0
+        print(
+            f"\rProgress: {current*100:.1f}% | ETA: {event.get('eta', 0.0):.1f}s | "
+            f"Step: {event.get('step', 0)}/{total}",
+            end=""
+        )
 
 
 async def test_image_generation() -> None:
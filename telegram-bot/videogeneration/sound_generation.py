@@ -3,11 +3,14 @@ import threading
 import time
 import uuid
 import os
+from io import BytesIO
 from pathlib import Path
-from gigachat import GigaChat
-from gigachat.models import Chat, Messages, MessagesRole
 import requests
-from videogeneration.config import GIGACHAT_CREDENTIALS, SALUT_CREDENTIALS, SALUT_CLIENT_ID, VOICES
+from pydub import AudioSegment
+from videogeneration.metrics import TTS_DURATION
+from videogeneration import gigachat_client
+from videogeneration.config import (GIGACHAT_CREDENTIALS, SALUT_CREDENTIALS, SALUT_CLIENT_ID, SALUT_TOKEN_URL,
+                                    SALUT_TTS_URL, VOICES)
 from videogeneration.utils import get_next_free_path
 from loguru import logger
 import base64
@@ -16,8 +19,8 @@ import random
 class SalutWrapper:
     def __init__(self, authorization_key = SALUT_CREDENTIALS, scope='SALUTE_SPEECH_PERS'):
         self.bearer_token = None
-        self.token_url = 'https://ngw.devices.sberbank.ru:9443/api/v2/oauth'
-        self.tts_url = "https://smartspeech.sber.ru/rest/v1/text:synthesize"
+        self.token_url = SALUT_TOKEN_URL
+        self.tts_url = SALUT_TTS_URL
         self.scope = scope
         self.api_key = authorization_key
         self.uuid = str(uuid.uuid4())
@@ -101,16 +104,17 @@ class SalutWrapper:
         
         try:
             logger.debug(f"Sending request to api")
-            response = requests.post(
-                self.tts_url,
-                headers=headers,
-                params=params,
-                data = text,
-                verify=False,
-                timeout=30
-            )
-            
-            response.raise_for_status()
+            with TTS_DURATION.time(provider="salute"):
+                response = requests.post(
+                    self.tts_url,
+                    headers=headers,
+                    params=params,
+                    data = text,
+                    verify=False,
+                    timeout=30
+                )
+
+                response.raise_for_status()
             logger.debug(f"We got the answer from the API")
             
             with open(output_path, 'wb') as f:
@@ -134,12 +138,11 @@ def generate_audio_with_salut(prompt: str) -> str:
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Генерация текста через GigaChat
-    with GigaChat(credentials=GIGACHAT_CREDENTIALS, verify_ssl_certs=False) as giga:
-        response = giga.chat(
-            Chat(messages=[
-                Messages(
-                    role=MessagesRole.USER, 
-                    content="""
+    generated_text = gigachat_client.chat(
+        [
+            (
+                "user",
+                """
                             Вы профессиональный русскоязычный сценарист. Жесткие правила:
                             1. ТОЛЬКО единый связный текст без списков и пунктов
                             2. Запрещены: 
@@ -160,10 +163,10 @@ def generate_audio_with_salut(prompt: str) -> str:
                             Пример ПРАВИЛЬНОГО формата:
                             Камера медленно погружается в сердце мегаполиса будущего, где неоновые спирали танцуют в ритме с голографическими проекциями. На первом плане возникает силуэт воина, чей костюм излучает пульсирующее сияние сквозь сеть нанопроводов. С каждым шагом экзоскелет оживает: гидравлические суставы сжимаются с едва слышным шипением, а панели брони перестраиваются, адаптируясь к окружающей температуре. Вокруг нарастает симфония технологий — дроны-сканеры прочерчивают лазерные сетки над головой, пока голограммы рекламных таблоов мерцают в такт биению гигантских энергетических сердечников...
                             """
-                ),
-                Messages(
-                    role=MessagesRole.USER, 
-                    content=f"""
+            ),
+            (
+                "user",
+                f"""
                                 Сгенерируйте ЕДИНЫЙ текст для озвучки без разрывов и списков. Требования:
                                 - Плавное описание сцен как в документальном фильме
                                 - Естественные переходы между объектами (слева направо, фон->передний план)
@@ -173,11 +176,13 @@ def generate_audio_with_salut(prompt: str) -> str:
 
                                 Начни сразу с описания первого кадра. Используй сложносочиненные предложения с союзами "в то время как", "по мере того как", "вслед за".
                             """
-                )
-            ])
-        )
-        generated_text = response.choices[0].message.content
-        logger.success(f"Сгенерированный текст: {generated_text}")
+            )
+        ],
+        call_site="voiceover",
+        credentials=GIGACHAT_CREDENTIALS,
+        verify_ssl_certs=False
+    )
+    logger.success(f"Сгенерированный текст: {generated_text}")
 
     generator = SalutWrapper()
 
@@ -188,6 +193,19 @@ def generate_audio_with_salut(prompt: str) -> str:
     return str(audio_path), generated_text
 
 
+def convert_wav_to_ogg(wav_path: str) -> BytesIO:
+    """Конвертирует WAV в OGG/OPUS формате для Telegram Voice"""
+    # Загружаем WAV файл
+    audio = AudioSegment.from_wav(wav_path)
+
+    # Конвертируем в OGG с кодеком OPUS
+    ogg_buffer = BytesIO()
+    audio.export(ogg_buffer, format="ogg", codec="libopus")
+    ogg_buffer.seek(0)
+
+    return ogg_buffer
+
+
 def generate_audio_file(text, voice =None):
     generator = SalutWrapper()
 
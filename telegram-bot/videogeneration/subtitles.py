@@ -146,6 +146,7 @@ def add_subtitles_from_text(input_video, text, output_video=None,
     # Определяем путь для выходного файла
     if not output_video:
         output_video = get_next_free_path('output/video_with_subtitles', prefix='video_', suffix='.mp4')
+    os.makedirs(os.path.dirname(output_video) or '.', exist_ok=True)
 
     # Загружаем видео
     video = VideoFileClip(input_video)
@@ -0,0 +1,246 @@
+"""
+Модуль трассировки этапов генерации
+
+Содержит:
+- Спаны-контекстные менеджеры с вложенностью через contextvars
+- Замер времени (wall и CPU потока) и памяти (RSS в начале, в конце и пик внутри спана)
+- Сохранение трассы в формате Chrome Trace (chrome://tracing, Perfetto)
+- Краткую текстовую сводку по этапам для сообщения в Telegram
+
+Контекст трассы переживает asyncio.to_thread и asyncio.run, поэтому спаны
+этапов, выполняемых в отдельном потоке, и запросов к Stable Diffusion
+внутри этих этапов попадают в одну трассу.
+
+Пик памяти спана - максимум RSS процесса, замеренного в начале, в конце
+и фоновым потоком каждые SAMPLE_INTERVAL секунд, пока спан открыт.
+Более короткие всплески между замерами не видны. RSS общий для процесса,
+поэтому у параллельных спанов пик включает память друг друга.
+"""
+
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+import psutil
+
+TRACES_DIR = Path("output/traces")
+SAMPLE_INTERVAL = 0.05
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("span", default=None)
+_process = psutil.Process()
+
+
+def _rss_mb() -> float:
+    return _process.memory_info().rss / 2 ** 20
+
+
+class _RssSampler:
+    """Фоновый замер RSS для открытых спанов.
+
+    Поток работает, только пока есть открытые спаны, и обновляет их пик.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._open: Set["Span"] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, span: "Span") -> None:
+        with self._lock:
+            self._open.add(span)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-rss-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, span: "Span") -> None:
+        with self._lock:
+            self._open.discard(span)
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._open:
+                    self._thread = None
+                    return
+                spans = list(self._open)
+            rss = _rss_mb()
+            for span in spans:
+                if rss > span.peak_rss_mb:
+                    span.peak_rss_mb = rss
+            time.sleep(self.interval)
+
+
+_sampler = _RssSampler()
+
+
+class Span:
+    """Отрезок работы внутри трассы.
+
+    Память в МБ: start_rss_mb и rss_mb - RSS процесса в начале и в конце,
+    peak_rss_mb - пик RSS за время спана, peak_delta_mb - рост пика над началом.
+    """
+
+    __slots__ = (
+        "id", "name", "parent_id", "attrs", "start", "wall", "cpu",
+        "start_rss_mb", "rss_mb", "peak_rss_mb", "tid", "error"
+    )
+
+    def __init__(self, span_id: int, name: str, parent_id: Optional[int], attrs: Dict[str, Any]):
+        self.id = span_id
+        self.name = name
+        self.parent_id = parent_id
+        self.attrs = attrs
+        self.start = 0.0
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.start_rss_mb = 0.0
+        self.rss_mb = 0.0
+        self.peak_rss_mb = 0.0
+        self.tid = threading.get_ident()
+        self.error: Optional[str] = None
+
+    @property
+    def peak_delta_mb(self) -> float:
+        return max(0.0, self.peak_rss_mb - self.start_rss_mb)
+
+
+class Trace:
+    """Трасса одного запуска: набор спанов и их сохранение.
+
+    Args:
+        name: Имя трассы (используется в имени файла)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started_at = datetime.now()
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.path: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def _new_span(self, name: str, parent: Optional[Span], attrs: Dict[str, Any]) -> Span:
+        with self._lock:
+            self._next_id += 1
+            span = Span(self._next_id, name, parent.id if parent else None, attrs)
+            self.spans.append(span)
+        return span
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Трасса в формате Chrome Trace Event (события "X" в микросекундах)."""
+        pid = os.getpid()
+        events = []
+        for span in list(self.spans):
+            args = {
+                "span_id": span.id,
+                "parent_id": span.parent_id,
+                "cpu_ms": round(span.cpu * 1000, 3),
+                "start_rss_mb": round(span.start_rss_mb, 1),
+                "rss_mb": round(span.rss_mb, 1),
+                "peak_rss_mb": round(span.peak_rss_mb, 1),
+                "peak_delta_mb": round(span.peak_delta_mb, 1),
+                **{key: str(value) for key, value in span.attrs.items()},
+            }
+            if span.error:
+                args["error"] = span.error
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(":", 1)[0],
+                "ph": "X",
+                "ts": round(span.start * 1e6),
+                "dur": round(span.wall * 1e6),
+                "pid": pid,
+                "tid": span.tid,
+                "args": args,
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {"name": self.name, "started_at": self.started_at.isoformat()},
+        }
+
+    def save(self, directory: Path = TRACES_DIR) -> Path:
+        """Сохраняет трассу в JSON и возвращает путь к файлу."""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f"{self.name}_{self.started_at:%Y%m%d_%H%M%S}.json"
+        with self.path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f, ensure_ascii=False)
+        return self.path
+
+    def summary(self, limit: int = 12) -> str:
+        """Текстовая сводка: время этапов верхнего уровня и агрегаты повторяющихся спанов."""
+        spans = [span for span in list(self.spans) if span.wall]
+        if not spans:
+            return ""
+        roots = {span.id for span in spans if span.parent_id is None}
+        top_level = [span for span in spans if span.parent_id in roots]
+
+        lines = []
+        for span in sorted(top_level, key=lambda s: s.start)[:limit]:
+            mark = " ❌" if span.error else ""
+            lines.append(
+                f"• {span.name}: {span.wall:.1f}s (CPU {span.cpu:.1f}s, "
+                f"пик {span.peak_rss_mb:.0f} МБ, +{span.peak_delta_mb:.0f} МБ){mark}"
+            )
+
+        nested: Dict[str, List[float]] = {}
+        for span in spans:
+            if span.parent_id not in roots and span.id not in roots:
+                nested.setdefault(span.name, []).append(span.wall)
+        for name, walls in sorted(nested.items(), key=lambda item: -sum(item[1]))[:5]:
+            lines.append(f"  ↳ {name}: {len(walls)}× всего {sum(walls):.1f}s, ср. {sum(walls) / len(walls):.2f}s")
+        return "\n".join(lines)
+
+
+@contextmanager
+def trace(name: str) -> Iterator[Trace]:
+    """Открывает трассу и корневой спан. Вложенные span() попадают в нее."""
+    current = Trace(name)
+    trace_token = _current_trace.set(current)
+    try:
+        with span(name):
+            yield current
+    finally:
+        _current_trace.reset(trace_token)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+    """Измеряет блок кода как спан текущей трассы. Вне трассы ничего не делает."""
+    current_trace = _current_trace.get()
+    if current_trace is None:
+        yield None
+        return
+
+    current = current_trace._new_span(name, _current_span.get(), attrs)
+    span_token = _current_span.set(current)
+    current.start_rss_mb = current.peak_rss_mb = _rss_mb()
+    _sampler.add(current)
+    current.start = time.perf_counter() - current_trace.origin
+    cpu_started = time.thread_time()
+    try:
+        yield current
+    except BaseException as exc:
+        current.error = type(exc).__name__
+        raise
+    finally:
+        current.wall = time.perf_counter() - current_trace.origin - current.start
+        current.cpu = time.thread_time() - cpu_started
+        _sampler.remove(current)
+        current.rss_mb = _rss_mb()
+        current.peak_rss_mb = max(current.peak_rss_mb, current.rss_mb)
+        _current_span.reset(span_token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
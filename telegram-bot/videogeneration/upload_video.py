@@ -20,6 +20,7 @@ from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload
 
+from videogeneration.metrics import UPLOAD_BYTES, UPLOAD_DURATION
 from videogeneration.config import TOKEN_FILE, SCOPES
 RETRIABLE_EXCEPTIONS = (httplib2.HttpLib2Error, IOError, httplib2.ServerNotFoundError,)
 RETRIABLE_STATUS_CODES = [500, 502, 503, 504]
@@ -80,28 +81,31 @@ def upload_video(file_path, title, category="1", privacy="public", madeForKids=F
     response = None
     error = None
     retry = 0
-    while response is None:
-        try:
-            _, response = request.next_chunk()
-        except HttpError as e:
-            if e.resp.status in RETRIABLE_STATUS_CODES:
-                error = "A retriable HTTP error %d occurred:\n%s" % (e.resp.status, e.content)
-            else:
-                raise
-        except RETRIABLE_EXCEPTIONS as e:
-            error = "A retriable error occurred: %s" % e
+    # Ошибка (в том числе исчерпание повторов) учитывается со status="error"
+    with UPLOAD_DURATION.time(target="youtube"):
+        while response is None:
+            try:
+                _, response = request.next_chunk()
+            except HttpError as e:
+                if e.resp.status in RETRIABLE_STATUS_CODES:
+                    error = "A retriable HTTP error %d occurred:\n%s" % (e.resp.status, e.content)
+                else:
+                    raise
+            except RETRIABLE_EXCEPTIONS as e:
+                error = "A retriable error occurred: %s" % e
 
-        if error is not None:
-            print(error)
-            retry += 1
-            if retry > MAX_RETRIES:
-                exit("No longer attempting to retry.")
+            if error is not None:
+                print(error)
+                retry += 1
+                if retry > MAX_RETRIES:
+                    exit("No longer attempting to retry.")
 
-            max_sleep = 2 ** retry
-            sleep_seconds = random.random() * max_sleep
-            print(f"Sleeping {sleep_seconds} seconds and then retrying...")
-            time.sleep(sleep_seconds)
+                max_sleep = 2 ** retry
+                sleep_seconds = random.random() * max_sleep
+                print(f"Sleeping {sleep_seconds} seconds and then retrying...")
+                time.sleep(sleep_seconds)
 
+    UPLOAD_BYTES.inc(os.path.getsize(file_path), target="youtube")
     logger.success(f"Video id '{response['id']}' was successfully uploaded.")
     return response["id"]
 
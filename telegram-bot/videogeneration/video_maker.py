@@ -1,9 +1,131 @@
+import bisect
+import itertools
 import os
-from typing import List
-from moviepy.editor import ImageClip, concatenate_videoclips, AudioFileClip
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from PIL import Image
+from moviepy.editor import AudioFileClip, VideoClip
 from videogeneration.utils import get_next_free_path
 from loguru import logger
-from bot.logger_setup import LoguruMoviePyLogger
+
+FRAME_CACHE_SIZE = 8     # Сколько декодированных кадров держать в памяти
+READ_AHEAD = 4           # Сколько следующих кадров декодировать заранее
+
+
+class LazyImageSequenceClip(VideoClip):
+    """Клип из последовательности изображений, декодируемых по мере показа.
+
+    ImageClip декодирует изображение в массив при создании, поэтому сотни
+    кадров занимают память еще до начала кодирования. Здесь изображение
+    читается с диска, когда до него доходит очередь, последние кадры
+    хранятся в небольшом LRU-кэше, а следующие read_ahead кадров
+    декодируются заранее в фоновом потоке. Память не зависит от числа кадров.
+
+    Изображения меньшего размера или с прозрачностью выводятся по центру
+    на черном фоне наибольшего размера, как в concatenate_videoclips(method="compose").
+
+    Args:
+        paths: Пути к изображениям
+        durations: Длительность показа каждого изображения (секунды)
+        cache_size: Размер LRU-кэша декодированных кадров
+        read_ahead: Сколько следующих кадров декодировать заранее (0 - не декодировать)
+    """
+
+    def __init__(
+        self,
+        paths: Sequence[str],
+        durations: Sequence[float],
+        cache_size: int = FRAME_CACHE_SIZE,
+        read_ahead: int = READ_AHEAD
+    ):
+        if not paths or len(paths) != len(durations):
+            raise ValueError("paths and durations must be non-empty and of equal length")
+        super().__init__(duration=sum(durations))
+
+        self.paths = list(paths)
+        self.starts = list(itertools.accumulate([0.0, *durations[:-1]]))
+        # Размер читается из заголовка, пиксели не декодируются
+        sizes = []
+        for path in self.paths:
+            with Image.open(path) as img:
+                sizes.append(img.size)
+        self.size = (max(w for w, _ in sizes), max(h for _, h in sizes))
+
+        self.cache_size = max(1, cache_size)
+        self.read_ahead = read_ahead
+        self._cache: "OrderedDict[int, np.ndarray]" = OrderedDict()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = (
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix="frame-reader") if read_ahead > 0 else None
+        )
+        self.make_frame = self._make_frame
+
+    def index_at(self, t: float) -> int:
+        """Номер изображения, показываемого в момент t."""
+        return min(max(bisect.bisect_right(self.starts, t) - 1, 0), len(self.paths) - 1)
+
+    def _make_frame(self, t: float) -> np.ndarray:
+        index = self.index_at(t)
+        frame = self._get(index)
+        self._prefetch(index)
+        return frame
+
+    def _get(self, index: int) -> np.ndarray:
+        with self._lock:
+            frame = self._cache.get(index)
+            if frame is not None:
+                self._cache.move_to_end(index)
+                return frame
+            future = self._pending.pop(index, None)
+
+        frame = future.result() if future is not None else self._decode(index)
+        with self._lock:
+            self._cache[index] = frame
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return frame
+
+    def _prefetch(self, index: int) -> None:
+        if self._executor is None:
+            return
+        window = range(index + 1, min(index + 1 + self.read_ahead, len(self.paths)))
+        with self._lock:
+            # Перемотка: заранее запрошенные кадры вне окна больше не нужны
+            for stale in [i for i in self._pending if i not in window]:
+                self._pending.pop(stale).cancel()
+            for i in window:
+                if i not in self._cache and i not in self._pending:
+                    self._pending[i] = self._executor.submit(self._decode, i)
+
+    def _decode(self, index: int) -> np.ndarray:
+        with Image.open(self.paths[index]) as img:
+            has_alpha = img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info)
+            if img.size == self.size and not has_alpha:
+                return np.asarray(img.convert("RGB"))
+
+            canvas = Image.new("RGB", self.size, (0, 0, 0))
+            offset = ((self.size[0] - img.width) // 2, (self.size[1] - img.height) // 2)
+            if has_alpha:
+                rgba = img.convert("RGBA")
+                canvas.paste(rgba.convert("RGB"), offset, rgba)
+            else:
+                canvas.paste(img.convert("RGB"), offset)
+            return np.asarray(canvas)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        with self._lock:
+            self._pending.clear()
+            self._cache.clear()
+        super().close()
+
 
 def compile_video(first_page: str, photos: List[str], audio: str) -> str:
     # Константы для настройки длительности и FPS
@@ -17,26 +139,27 @@ def compile_video(first_page: str, photos: List[str], audio: str) -> str:
     output_dir = os.path.dirname(OUTPUT_PATH)
     os.makedirs(output_dir, exist_ok=True)
 
-    logger.info(f"Compile videoclips from photos")
-    # Создаем видеоклипы из изображений с указанием длительности
-    clips = [ImageClip(first_page).set_duration(FIRST_DURATION)]
-    for photo in photos:
-        clips.append(ImageClip(photo).set_duration(OTHER_DURATION))
-
-
-    logger.info(f"Concating videoclips")
-    # Собираем все клипы в один видеофайл
-    video = concatenate_videoclips(clips, method="compose")
-
-    # Добавляем аудиодорожку
+    # Аудио открывается первым: если файл битый, поток чтения кадров еще не создан
     logger.info(f"Adding audio clip")
     audio_clip = AudioFileClip(audio)
-    video = video.set_audio(audio_clip)
-
-    logger.info(f"Saving video into path : {OUTPUT_PATH}")
-    # Сохраняем результат
-    video.write_videofile(OUTPUT_PATH, fps=FPS, verbose=True, logger="bar")
+    video: Optional[VideoClip] = None
+    try:
+        logger.info(f"Compile videoclip from photos")
+        # Изображения декодируются по мере кодирования видео, а не все сразу
+        video = LazyImageSequenceClip(
+            [first_page, *photos],
+            [FIRST_DURATION] + [OTHER_DURATION] * len(photos)
+        )
+        # set_audio возвращает копию клипа, поток чтения кадров у них общий
+        output = video.set_audio(audio_clip)
 
+        logger.info(f"Saving video into path : {OUTPUT_PATH}")
+        # Сохраняем результат
+        output.write_videofile(OUTPUT_PATH, fps=FPS, verbose=True, logger="bar")
+    finally:
+        if video is not None:
+            video.close()
+        audio_clip.close()
 
-    logger.success(f"Compiled video!") 
-    return OUTPUT_PATH
\ No newline at end of file
+    logger.success(f"Compiled video!")
+    return OUTPUT_PATH